@@ -1,66 +1,98 @@
 """
 Function decorators for assets
+
+These work for both sync and async views, for async views
+the checks (which use the database) are run in a thread.
 """
 
+from asgiref.sync import iscoroutinefunction, sync_to_async
 from django.shortcuts import get_object_or_404
 from django.http import HttpResponseForbidden, HttpResponseNotAllowed
+from django.http.response import HttpResponseBase
 
-from organization.helpers import organization_user_is_asset_recorder, organization_user_is_asset_radio_operator
+from organization.helpers import organization_user_asset_capabilities, ASSET_RECORDER, ASSET_RADIO_OPERATOR
 
 from .models import Asset
 
 
+def asset_view(view_func, asset_check):
+    """
+    Wrap view_func so it is passed the asset found by asset_check(request, kwargs)
+
+    asset_check returns the asset, or a response when the view shouldn't be run.
+    """
+    if iscoroutinefunction(view_func):
+        async def async_asset_view(*args, **kwargs):
+            asset = await sync_to_async(asset_check)(args[0], kwargs)
+            if isinstance(asset, HttpResponseBase):
+                return asset
+            return await view_func(*args, asset=asset, **kwargs)
+        return async_asset_view
+
+    def sync_asset_view(*args, **kwargs):
+        asset = asset_check(args[0], kwargs)
+        if isinstance(asset, HttpResponseBase):
+            return asset
+        return view_func(*args, asset=asset, **kwargs)
+    return sync_asset_view
+
+
+def asset_user_is_recorder(user, asset):
+    """
+    Check if the user is allowed to record (positions) for this asset.
+    """
+    return asset.owner_id == user.pk or ASSET_RECORDER in organization_user_asset_capabilities(user, asset)
+
+
+def asset_user_is_operator(user, asset):
+    """
+    Check if the user is allowed to act on behalf of this asset.
+    """
+    return asset.owner_id == user.pk or ASSET_RADIO_OPERATOR in organization_user_asset_capabilities(user, asset)
+
+
 def asset_is_recorder(view_func):
     """
     Make sure the current user is allowed to record (positions) for this asset.
     """
-    def recorder_check(*args, **kwargs):
-        allowed = False
-        asset = get_object_or_404(Asset, pk=kwargs['asset_id'])
-        if asset.owner == args[0].user or organization_user_is_asset_recorder(args[0].user, asset):
-            allowed = True
-        if not allowed:
+    def recorder_check(request, kwargs):
+        asset = get_object_or_404(Asset, pk=kwargs.pop('asset_id'))
+        if not asset_user_is_recorder(request.user, asset):
             return HttpResponseForbidden("Not Authorized to record the position of this asset")
-        kwargs.pop('asset_id')
-        return view_func(*args, asset=asset, **kwargs)
-    return recorder_check
+        return asset
+    return asset_view(view_func, recorder_check)
 
 
 def asset_is_operator(view_func):
     """
     Make sure the current user is allowed to act on behalf of this asset.
     """
-    def recorder_check(*args, **kwargs):
-        allowed = False
-        asset = get_object_or_404(Asset, pk=kwargs['asset_id'])
-        if asset.owner == args[0].user or organization_user_is_asset_radio_operator(args[0].user, asset):
-            allowed = True
-        if not allowed:
+    def operator_check(request, kwargs):
+        asset = get_object_or_404(Asset, pk=kwargs.pop('asset_id'))
+        if not asset_user_is_operator(request.user, asset):
             return HttpResponseForbidden("Not Authorized to record the position of this asset")
-        kwargs.pop('asset_id')
-        return view_func(*args, asset=asset, **kwargs)
-    return recorder_check
+        return asset
+    return asset_view(view_func, operator_check)
 
 
 def asset_is_owner(view_func):
     """
     Make sure the current user is the owner of this asset.
     """
-    def asset_owner_check(*args, **kwargs):
-        asset = get_object_or_404(Asset, pk=kwargs['asset_id'])
-        if asset.owner != args[0].user:
+    def asset_owner_check(request, kwargs):
+        asset = get_object_or_404(Asset, pk=kwargs.pop('asset_id'))
+        if asset.owner != request.user:
             return HttpResponseForbidden("Not Authorized, this is not your asset")
-        kwargs.pop('asset_id')
-        return view_func(*args, asset=asset, **kwargs)
-    return asset_owner_check
+        return asset
+    return asset_view(view_func, asset_owner_check)
 
 
 def asset_id_in_get_post(view_func):
     """
     Make sure the asset_id in the GET/POST is a valid asset and this user can act as them.
     """
-    def asset_id_check(*args, **kwargs):
-        request = args[0]
+    def asset_id_check(request, kwargs):
+        # pylint: disable=W0613
         if request.method == 'GET':
             asset_id = request.GET.get('asset_id')
         elif request.method == 'POST':
@@ -68,11 +100,7 @@ def asset_id_in_get_post(view_func):
         else:
             return HttpResponseNotAllowed("Only GET and POST are supported")
         asset = get_object_or_404(Asset, pk=asset_id)
-        allowed = False
-        if asset.owner == request.user or organization_user_is_asset_radio_operator(args[0].user, asset):
-            allowed = True
-        if not allowed:
+        if not asset_user_is_operator(request.user, asset):
             return HttpResponseForbidden("Wrong User for Asset")
-
-        return view_func(*args, asset=asset, **kwargs)
-    return asset_id_check
+        return asset
+    return asset_view(view_func, asset_id_check)
@@ -148,8 +148,22 @@ class AssetCommand(models.Model):
         Find the current command that applies to an asset
         Return in the a structure for json
         """
+        return AssetCommand.command_to_json(AssetCommand.last_command_for_asset(asset))
+
+    @staticmethod
+    async def alast_command_for_asset_to_json(asset):
+        """
+        Async version of last_command_for_asset_to_json
+        """
+        asset_command = await AssetCommand.objects.filter(asset=asset).select_related('issued_by', 'responded_by').order_by('-issued').afirst()
+        return AssetCommand.command_to_json(asset_command)
+
+    @staticmethod
+    def command_to_json(asset_command):
+        """
+        Convert an asset command (or None) into the structure for json
+        """
         last_command = {}
-        asset_command = AssetCommand.last_command_for_asset(asset)
         if asset_command:
             last_command = {
                 'action': asset_command.command,
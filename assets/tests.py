@@ -2,13 +2,17 @@
 Tests for the assets API
 """
 
-from django.test import TestCase
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.test import AsyncClient, TestCase, TransactionTestCase
 
 from smm.tests import SMMTestUsers
 
 from mission.models import Mission, MissionUser, MissionAsset
 
-from .models import AssetType, Asset
+from .models import AssetType, Asset, AssetStatus, AssetStatusValue
 
 
 class AssetsHelpers:
@@ -337,3 +341,116 @@ class AssetTestCase(TestCase):
             'longitude': 'East',
         })
         self.assertEqual(response.status_code, 400)
+
+    def test_asset_details_conditional(self):
+        """
+        Check the asset details are only sent again when they change
+        """
+        asset = self.assets.create_asset()
+        asset_details_url = f'/assets/{asset.pk}/'
+        self.add_asset_to_mission(asset=asset)
+        response = self.smm.client1.get(asset_details_url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        response = self.smm.client1.get(asset_details_url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # The html page isn't conditional
+        response = self.smm.client1.get(asset_details_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        # Queuing a search for the asset changes the details
+        self.queue_search_for_asset(asset=asset)
+        response = self.smm.client1.get(asset_details_url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue('queued_search_id' in response.json())
+        etag = response['ETag']
+        # So does a command
+        response = self.smm.client1.post(f'/mission/{self.mission.pk}/assets/command/set/', {
+            'asset': asset.pk,
+            'command': 'RON',
+            'reason': 'testing',
+        })
+        self.assertEqual(response.status_code, 200)
+        response = self.smm.client1.get(asset_details_url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['last_command']['action'], 'RON')
+        etag = response['ETag']
+        # and a status change
+        status_value = AssetStatusValue.objects.create(name='Ready')
+        AssetStatus.objects.create(asset=asset, status=status_value)
+        response = self.smm.client1.get(asset_details_url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status']['status'], 'Ready')
+        # Nothing else has changed
+        response = self.smm.client1.get(asset_details_url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_asset_command_wait(self):
+        """
+        Check waiting for a new asset command
+        """
+        asset = self.assets.create_asset()
+        asset_command_wait_url = f'/assets/{asset.pk}/command/wait/'
+        self.add_asset_to_mission(asset=asset)
+        # There aren't any commands, so this waits until the timeout
+        response = self.smm.client1.get(asset_command_wait_url, {'timeout': 0.1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['command'], {})
+        response = self.smm.client1.post(f'/mission/{self.mission.pk}/assets/command/set/', {
+            'asset': asset.pk,
+            'command': 'RON',
+            'reason': 'testing',
+        })
+        self.assertEqual(response.status_code, 200)
+        # A newer command is returned straight away
+        response = self.smm.client1.get(asset_command_wait_url, {'after': 0, 'timeout': 60})
+        self.assertEqual(response.status_code, 200)
+        command = response.json()['command']
+        self.assertEqual(command['action'], 'RON')
+        # Waiting for commands after that one times out
+        response = self.smm.client1.get(asset_command_wait_url, {'after': command['id'], 'timeout': 0.1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['command']['id'], command['id'])
+        self.assertEqual(self.smm.client1.get(asset_command_wait_url, {'after': 'last'}).status_code, 400)
+        # Only the asset operators can wait for commands
+        self.assertEqual(self.smm.client2.get(asset_command_wait_url, {'timeout': 0}).status_code, 403)
+        self.assertEqual(self.smm.unauth_client.get(asset_command_wait_url).status_code, 302)
+
+
+class AssetCommandWaitTestCase(TransactionTestCase):
+    """
+    Tests for devices waiting for asset commands
+    """
+    def setUp(self):
+        """
+        Create the asset to wait for
+        """
+        self.smm = SMMTestUsers()
+        self.asset = AssetsHelpers(self.smm).create_asset()
+
+    async def test_waiting_releases_connections(self):
+        """
+        Check devices waiting for commands don't hold database connections
+        """
+        client = AsyncClient()
+        await client.aforce_login(self.smm.user1)
+        asset_command_wait_url = f'/assets/{self.asset.pk}/command/wait/'
+
+        def other_connections():
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT count(*) FROM pg_stat_activity WHERE datname = current_database() AND pid <> pg_backend_pid()')
+                    return cursor.fetchone()[0]
+            finally:
+                connection.close()
+
+        async def connections_while_waiting():
+            await asyncio.sleep(0.5)
+            return await sync_to_async(other_connections, thread_sensitive=False)()
+
+        *responses, waiting_connections = await asyncio.gather(
+            *[client.get(asset_command_wait_url, {'timeout': 2}) for _ in range(20)],
+            connections_while_waiting())
+        self.assertEqual(waiting_connections, 0)
+        for response in responses:
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['command'], {})
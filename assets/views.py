@@ -1,6 +1,8 @@
 """
 Views for assets
 """
+import time
+
 from django.http import JsonResponse, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, HttpResponseNotFound
 from django.contrib.auth.decorators import login_required
 from django.contrib.gis.geos import Point
@@ -9,19 +11,24 @@ from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views import View
 
+from data.decorators import data_conditional
+from data.models import ChangeVersion
 from mission.decorators import mission_is_member, mission_asset_get
-
-from organization.helpers import organization_user_is_asset_recorder
-
+from mission.events import arelease_db_connection, asset_channel, get_broker
 from organization.models import OrganizationAsset, OrganizationMember
 from search.models import Search
 from search.view_helpers import check_searches_in_progress
 
-from .decorators import asset_is_operator
+from .decorators import asset_is_operator, asset_user_is_recorder
 from .models import AssetType, Asset, AssetCommand, AssetStatusValue, AssetStatus
 from .forms import AssetCommandForm
 
 
+# How long (in seconds) to wait for a new asset command, by default and at most
+ASSET_COMMAND_WAIT = 25
+ASSET_COMMAND_WAIT_MAX = 60
+
+
 @login_required
 def assets_status_value_list(request):
     """
@@ -58,8 +65,27 @@ def asset_command_set(request, mission_user):
     return render(request, 'asset-command-form.html', {'form': form})
 
 
+def asset_version_keys(request, asset):
+    """
+    The change versions that cover the json details of an asset
+    """
+    if "application/json" not in request.META.get('HTTP_ACCEPT', ''):
+        return None
+    return [ChangeVersion.asset_key(asset.pk)]
+
+
+def assets_version_keys(request):
+    """
+    The change versions that cover the json list of assets
+    """
+    if "application/json" not in request.META.get('HTTP_ACCEPT', ''):
+        return None
+    return [ChangeVersion.ASSETS_KEY]
+
+
 @method_decorator(login_required, name="dispatch")
 @method_decorator(asset_is_operator, name="dispatch")
+@method_decorator(data_conditional(asset_version_keys), name="get")
 class AssetView(View):
     """
     View of a specific asset
@@ -85,7 +111,7 @@ class AssetView(View):
             current_search = check_searches_in_progress(mission_asset.mission, asset)
             if current_search is not None:
                 data['current_search_id'] = current_search.pk
-            queued_search = Search.oldest_queued_for_asset(mission_asset.mission, asset)
+            queued_search = Search.all_queued_for_asset(mission_asset.mission, asset).first()
             if queued_search is not None:
                 data['queued_search_id'] = queued_search.pk
 
@@ -126,6 +152,7 @@ class AssetsTypeView(View):
 
 
 @method_decorator(login_required, name="dispatch")
+@method_decorator(data_conditional(assets_version_keys), name="get")
 class AssetsView(View):
     """
     View for all assets this user can see
@@ -200,6 +227,34 @@ class AssetCommandView(View):
         return self.as_json(request, asset)
 
 
+@login_required
+@asset_is_operator
+async def asset_command_wait(request, asset):
+    """
+    Wait for a new asset command (long-poll)
+
+    Returns the current asset command (as AssetCommandView does) once there is
+    a command newer than ?after=<command id>, or ?timeout=<seconds> has passed.
+    It waits for the command to be published (see mission.events), so under ASGI
+    a waiting device doesn't hold a worker thread, or a database connection.
+    """
+    try:
+        after = int(request.GET.get('after', 0))
+        timeout = max(0.0, min(float(request.GET.get('timeout', ASSET_COMMAND_WAIT)), ASSET_COMMAND_WAIT_MAX))
+    except ValueError:
+        return HttpResponseBadRequest("Invalid after or timeout")
+    # Subscribe before checking, so a command issued in between isn't missed
+    subscription = await get_broker().asubscribe(asset_channel(asset.pk))
+    try:
+        end = time.monotonic() + timeout
+        while (remaining := end - time.monotonic()) > 0 and not await AssetCommand.objects.filter(asset=asset, pk__gt=after).aexists():
+            await arelease_db_connection()
+            await subscription.get(timeout=remaining)
+    finally:
+        await subscription.close()
+    return JsonResponse({'command': await AssetCommand.alast_command_for_asset_to_json(asset)})
+
+
 @login_required
 def asset_status(request, asset_id):
     """
@@ -213,7 +268,7 @@ def asset_status(request, asset_id):
             return JsonResponse(status.as_object())
         return JsonResponse({})
     if request.method == 'POST':
-        if not (asset.owner == request.user or organization_user_is_asset_recorder(request.user, asset)):
+        if not asset_user_is_recorder(request.user, asset):
             return HttpResponseForbidden()
         value_id = request.POST.get('value_id')
         status_value = get_object_or_404(AssetStatusValue, pk=value_id)
@@ -10,3 +10,7 @@ class DataConfig(AppConfig):
     Define the data app
     """
     name = 'data'
+
+    def ready(self):
+        # Connect the signal handlers that keep the change versions up to date
+        from . import signals  # pylint: disable=C0415,W0611
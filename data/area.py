@@ -0,0 +1,135 @@
+"""
+Limiting GeoTime objects to an area and/or time window
+
+Used by the list views so a map only has to fetch the objects in its
+viewport, see GeoTime.all_current
+"""
+
+import math
+
+from django.contrib.gis.geos import Polygon
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+# Widest bounding box (in degrees of longitude) that is used as a single polygon,
+# wider boxes are split as geography edges are great circles
+AREA_MAX_WIDTH = 90.0
+# Longest edge (in degrees of longitude) along the north and south of a bbox. Geography
+# edges are great circles, which bow towards the pole, so the edges are split into short
+# steps that stay within about 10m of the line of latitude
+AREA_EDGE_STEP = 0.25
+
+
+def parse_bbox(value):
+    """
+    Parse a bbox (west,south,east,north in degrees)
+
+    east can be more than 180 for boxes that cross the antimeridian (as leaflet does).
+    Raises ValueError if it isn't valid
+    """
+    try:
+        west, south, east, north = [float(part) for part in value.split(',')]
+    except (TypeError, ValueError) as error:
+        raise ValueError("Invalid bbox") from error
+    if not (-90 <= south < north <= 90) or not -540 <= west < east <= 540:
+        raise ValueError("Invalid bbox")
+    return (west, south, east, north)
+
+
+def parse_time(value, name):
+    """
+    Parse a time that includes the timezone
+
+    Raises ValueError if it isn't valid
+    """
+    try:
+        time = parse_datetime(value)
+    except ValueError:
+        time = None
+    if time is None or timezone.is_naive(time):
+        raise ValueError(f"Invalid {name}")
+    return time
+
+
+def bbox_polygons(bbox):
+    """
+    Convert a bbox into polygons (in lon/lat) that cover it
+
+    Boxes that cross the antimeridian are split in two, and wide boxes
+    are split so none of the polygons are wider than AREA_MAX_WIDTH.
+    The north and south edges have a point every AREA_EDGE_STEP degrees,
+    so they follow the lines of latitude.
+    """
+    west, south, east, north = bbox
+    if east - west >= 360:
+        west, east = -180.0, 180.0
+    else:
+        west = (west + 180) % 360 - 180
+        east = (east + 180) % 360 - 180
+    if east <= west:
+        ranges = [(west, 180.0), (-180.0, east)]
+    else:
+        ranges = [(west, east)]
+    polygons = []
+    for start, end in ranges:
+        while start < end:
+            step_end = min(end, start + AREA_MAX_WIDTH)
+            polygons.append(edge_polygon(start, south, step_end, north))
+            start = step_end
+    return polygons
+
+
+def edge_polygon(west, south, east, north):
+    """
+    A polygon (in lon/lat) of a bbox, with points along the north and south edges
+    """
+    steps = max(1, math.ceil((east - west) / AREA_EDGE_STEP))
+    lons = [west + (east - west) * i / steps for i in range(steps)] + [east]
+    ring = [(lon, south) for lon in lons] + [(lon, north) for lon in reversed(lons)]
+    return Polygon(ring + [ring[0]], srid=4326)
+
+
+class AreaTimeFilter:
+    """
+    A bounding box and/or time window to limit objects to
+
+    The time window is when the objects were created.
+    """
+    def __init__(self, bbox=None, start=None, end=None):
+        self.bbox = bbox
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def from_request(cls, request):
+        """
+        Create the filter from the bbox/from/to query parameters of request
+
+        Returns None if there are no parameters, and raises ValueError if any are invalid
+        """
+        bbox = request.GET.get('bbox')
+        start = request.GET.get('from')
+        end = request.GET.get('to')
+        if bbox is None and start is None and end is None:
+            return None
+        return cls(
+            bbox=parse_bbox(bbox) if bbox is not None else None,
+            start=parse_time(start, 'from') if start is not None else None,
+            end=parse_time(end, 'to') if end is not None else None)
+
+    def apply(self, objects, geofield='geo'):
+        """
+        Limit objects to this area and time window
+        """
+        if self.bbox is not None:
+            inside = Q()
+            for polygon in bbox_polygons(self.bbox):
+                inside |= Q(**{f'{geofield}__intersects': polygon})
+            objects = objects.filter(inside)
+        if self.start is not None:
+            objects = objects.filter(created_at__gt=self.start)
+        if self.end is not None:
+            objects = objects.filter(created_at__lte=self.end)
+        return objects
@@ -2,9 +2,15 @@
 Function decorators to make dealing with data models easier
 """
 
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.http import HttpResponseBadRequest
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.views.decorators.http import condition
 
-from .models import GeoTimeLabel
+from mission.models import Mission
+from .area import AreaTimeFilter
+from .models import ChangeVersion, GeoTimeLabel
 
 
 def geotimelabel_from_type_id(view_func):
@@ -36,7 +42,93 @@ def data_get_mission_id(arg_name=None):
     """
     def inner(view_func):
         def wrapper_get_mission_id(*args, **kwargs):
-            mission_id = kwargs[arg_name].mission.id
+            mission_id = kwargs[arg_name].mission_id
             return view_func(*args, mission_id=mission_id, **kwargs)
         return wrapper_get_mission_id
     return inner
+
+
+def data_area_time(view_func):
+    """
+    Convert the bbox/from/to query parameters into an area (an AreaTimeFilter, or None)
+    """
+    if iscoroutinefunction(view_func):
+        async def async_wrapper_area_time(*args, **kwargs):
+            try:
+                area = AreaTimeFilter.from_request(args[0])
+            except ValueError as error:
+                return HttpResponseBadRequest(str(error))
+            return await view_func(*args, area=area, **kwargs)
+        return async_wrapper_area_time
+
+    def wrapper_area_time(*args, **kwargs):
+        try:
+            area = AreaTimeFilter.from_request(args[0])
+        except ValueError as error:
+            return HttpResponseBadRequest(str(error))
+        return view_func(*args, area=area, **kwargs)
+    return wrapper_area_time
+
+
+def data_conditional(version_keys):
+    """
+    Answer conditional requests (If-None-Match) with 304 when nothing the view depends on has changed
+
+    version_keys(request, **kwargs) returns the keys of the ChangeVersions that cover the response,
+    or None if the response can't be conditional (i.e. an html page).
+    The since parameter isn't part of the etag, if there have been no changes since the
+    response the client has, then there is nothing new since its cursor either.
+    For async views the etag is found in a thread, as it uses the database.
+    """
+    def inner(view_func):
+        def etag(request, *args, **kwargs):
+            keys = version_keys(request, *args, **kwargs)
+            if keys is None:
+                return None
+            params = sorted((key, values) for key, values in request.GET.lists() if key != 'since')
+            return ChangeVersion.etag(keys, request.user.pk, request.path, params, 'since' in request.GET)
+
+        if iscoroutinefunction(view_func):
+            async def async_wrapper_conditional(request, *args, **kwargs):
+                response_etag = await sync_to_async(etag)(request, *args, **kwargs)
+                if response_etag is None:
+                    return await view_func(request, *args, **kwargs)
+                response_etag = quote_etag(response_etag)
+                response = get_conditional_response(request, etag=response_etag)
+                if response is None:
+                    response = await view_func(request, *args, **kwargs)
+                if request.method in ('GET', 'HEAD'):
+                    response.headers.setdefault('ETag', response_etag)
+                if response.has_header('ETag'):
+                    patch_cache_control(response, private=True, no_cache=True)
+                return response
+            return async_wrapper_conditional
+
+        conditional_view = condition(etag_func=etag)(view_func)
+
+        def wrapper_conditional(*args, **kwargs):
+            response = conditional_view(*args, **kwargs)
+            if response.has_header('ETag'):
+                # Always check with the server, it is cheap to answer
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper_conditional
+    return inner
+
+
+def mission_layers(*objecttypes):
+    """
+    version_keys (for data_conditional) of views of objecttypes in a mission,
+    or in all of the users missions (when there is no mission_user)
+    """
+    def version_keys(request, *args, mission_user=None, current_only=False, **kwargs):
+        # pylint: disable=W0613
+        if mission_user is not None:
+            mission_ids = [mission_user.mission.pk]
+        else:
+            missions = Mission.all_user_missions(request.user)
+            if current_only:
+                missions = missions.filter(closed__isnull=True)
+            mission_ids = missions.values_list('pk', flat=True)
+        return [ChangeVersion.mission_key(mission_id, objecttype._meta.label_lower) for mission_id in mission_ids for objecttype in objecttypes]
+    return version_keys
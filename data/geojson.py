@@ -0,0 +1,152 @@
+"""
+Fast GeoJSON serialization for GeoTime models
+
+This produces the same features as the django geojson serializer
+(with use_natural_foreign_keys=True, as to_geojson used to), without
+creating model objects. The rows are read with values(), with the
+natural keys of related objects joined in, and the geometry is converted
+to geojson by PostGIS. The document is generated in chunks so it can be
+streamed to the client while the rows are still being read.
+
+The coordinates are written by PostGIS (ST_AsGeoJSON) rather than GDAL,
+so they aren't always formatted the same way as the django serializer
+writes them (i.e. the number of digits, or exponents), but they are the
+same numbers to within GEOJSON_PRECISION decimal places.
+"""
+
+import json
+
+from django.contrib.auth import get_user_model
+from django.contrib.gis.db.models.functions import AsGeoJSON
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.encoding import is_protected_type
+
+
+GEOJSON_HEADER = '{"type": "FeatureCollection", "crs": {"type": "name", "properties": {"name": "EPSG:4326"}}, "features": ['
+
+# Number of decimal places PostGIS writes the coordinates with
+GEOJSON_PRECISION = 15
+
+# Number of features to include in each chunk of the stream
+GEOJSON_CHUNK_SIZE = 500
+
+
+def natural_key_field(model):
+    """
+    Find the field that is used as the natural key of model, and if the key is a list
+
+    This must match natural_key() of each model
+    """
+    natural_keys = {
+        get_user_model()._meta.label_lower: (get_user_model().USERNAME_FIELD, True),
+        'assets.asset': ('pk', False),
+        'assets.assettype': ('name', False),
+    }
+    try:
+        return natural_keys[model._meta.label_lower]
+    except KeyError as error:
+        raise KeyError(f"Unknown natural key for {model._meta.label}, add it to natural_key_field") from error
+
+
+def geojson_properties(model, fields):
+    """
+    Work out how to find each of the properties of the features for model
+
+    Returns a list of (property, values() lookup, natural key is a list)
+    in the same order as the django serializer.
+    """
+    properties = []
+    for field in model._meta.concrete_model._meta.local_fields:
+        if not field.serialize or field.name == model.GEOFIELD:
+            continue
+        if field.remote_field is None:
+            if field.attname in fields:
+                properties.append((field.name, field.attname, False))
+        elif field.name in fields:
+            if hasattr(field.remote_field.model, 'natural_key'):
+                key, as_list = natural_key_field(field.remote_field.model)
+                lookup = field.attname if key == 'pk' else f'{field.name}__{key}'
+                properties.append((field.name, lookup, as_list))
+            else:
+                properties.append((field.name, field.attname, False))
+    return properties
+
+
+def geojson_feature(row, properties, include_pk):
+    """
+    Convert a row from values() into a geojson feature (as a string)
+    """
+    feature_properties = {}
+    for name, lookup, as_list in properties:
+        value = row[lookup]
+        if as_list and value is not None:
+            value = [value]
+        elif not is_protected_type(value):
+            value = str(value)
+        feature_properties[name] = value
+    if include_pk:
+        feature_properties['pk'] = str(row['pk'])
+    feature = {
+        'type': 'Feature',
+        'id': row['pk'],
+        'properties': feature_properties,
+        'geometry': json.loads(row['geojson_geometry']) if row['geojson_geometry'] else None,
+    }
+    return json.dumps(feature, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def geojson_footer(extra=None):
+    """
+    Finish the document, adding extra as members of the FeatureCollection
+    """
+    if extra:
+        return '], ' + json.dumps(extra, cls=DjangoJSONEncoder)[1:]
+    return ']}'
+
+
+def geojson_rows(objecttype, objects):
+    """
+    Find the rows (from values()) for the objects (a queryset of objecttype), and a function to convert each row into a feature
+    """
+    properties = geojson_properties(objecttype, objecttype.GEOJSON_FIELDS)
+    rows = objects.values('pk', *[lookup for _, lookup, _ in properties], geojson_geometry=AsGeoJSON(objecttype.GEOFIELD, precision=GEOJSON_PRECISION))
+    include_pk = 'pk' in objecttype.GEOJSON_FIELDS
+    return rows, lambda row: geojson_feature(row, properties, include_pk)
+
+
+def geojson_stream(objecttype, objects, extra=None):
+    """
+    Generate the geojson document for the objects (a queryset of objecttype) in chunks
+    """
+    rows, feature = geojson_rows(objecttype, objects)
+
+    chunk = [GEOJSON_HEADER]
+    separator = ''
+    for row in rows.iterator(chunk_size=GEOJSON_CHUNK_SIZE):
+        chunk.append(separator)
+        chunk.append(feature(row))
+        separator = ', '
+        if len(chunk) >= GEOJSON_CHUNK_SIZE * 2:
+            yield ''.join(chunk)
+            chunk = []
+    chunk.append(geojson_footer(extra))
+    yield ''.join(chunk)
+
+
+async def ageojson_stream(objecttype, objects, extra=None):
+    """
+    Async version of geojson_stream, the rows are read with the async ORM
+    """
+    rows, feature = geojson_rows(objecttype, objects)
+
+    chunk = [GEOJSON_HEADER]
+    separator = ''
+    async for row in rows.aiterator(chunk_size=GEOJSON_CHUNK_SIZE):
+        chunk.append(separator)
+        chunk.append(feature(row))
+        separator = ', '
+        if len(chunk) >= GEOJSON_CHUNK_SIZE * 2:
+            yield ''.join(chunk)
+            chunk = []
+    chunk.append(geojson_footer(extra))
+    yield ''.join(chunk)
@@ -0,0 +1,102 @@
+"""
+Incremental KML writer for GeoTime models
+
+The document is generated in chunks so it can be streamed to the
+client while the rows are still being read. The geometry of each object
+is converted to kml by PostGIS in the same query that reads the objects.
+
+Placemarks can be grouped into folders, each with their own style, so
+several types of objects can be exported in a single document.
+"""
+
+from xml.sax.saxutils import escape
+
+from django.contrib.gis.db.models.functions import AsKML
+from django.contrib.gis.geos import GEOSGeometry
+from django.db.models import QuerySet
+
+
+KML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n' + \
+             '<kml xmlns="http://www.opengis.net/kml/2.2">\n' + \
+             '\t<Document>\n'
+
+KML_FOOTER = '\t</Document>\n</kml>'
+
+# Number of digits after the decimal point in coordinates
+KML_PRECISION = 15
+
+# Number of placemarks to include in each chunk of the stream
+KML_CHUNK_SIZE = 500
+
+# Styles that can be used by folders, colours are aabbggrr
+KML_STYLES = {
+    'poi': '<IconStyle><Icon><href>https://maps.google.com/mapfiles/kml/pushpin/ylw-pushpin.png</href></Icon></IconStyle>',
+    'line': '<LineStyle><color>ff0000ff</color><width>2</width></LineStyle>',
+    'polygon': '<LineStyle><color>ff0000ff</color><width>2</width></LineStyle><PolyStyle><color>400000ff</color></PolyStyle>',
+    'search_notstarted': '<LineStyle><color>ff00ffff</color><width>2</width></LineStyle>',
+    'search_inprogress': '<LineStyle><color>ff00a5ff</color><width>2</width></LineStyle>',
+    'search_completed': '<LineStyle><color>ff00ff00</color><width>2</width></LineStyle>',
+}
+
+
+def kml_cdata(text):
+    """
+    Wrap text in a CDATA section, splitting any ]]> in the text
+    """
+    return '<![CDATA[' + text.replace(']]>', ']]]]><![CDATA[>') + ']]>'
+
+
+def kml_style(style):
+    """
+    The definition of style, to be included in the document
+    """
+    return f'\t\t<Style id="{escape(style)}">{KML_STYLES[style]}</Style>\n'
+
+
+def kml_geometries(objecttype, objects):
+    """
+    Iterate over (object, geometry as kml) for the objects
+    """
+    if isinstance(objects, QuerySet):
+        for obj in objects.annotate(kml_geometry=AsKML(objecttype.GEOFIELD, precision=KML_PRECISION)).iterator(chunk_size=KML_CHUNK_SIZE):
+            yield obj, obj.kml_geometry
+    else:
+        for obj in objects:
+            yield obj, GEOSGeometry(getattr(obj, objecttype.GEOFIELD)).kml
+
+
+def kml_placemarks(objecttype, objects, style=None, indent='\t\t'):
+    """
+    Generate a placemark for each of the objects
+    """
+    style_url = f'{indent}\t<styleUrl>#{escape(style)}</styleUrl>\n' if style else ''
+    for obj, geometry in kml_geometries(objecttype, objects):
+        name = kml_cdata(str(obj))
+        yield f'{indent}<Placemark>\n{indent}\t<name>{name}</name>\n{indent}\t<description>{name}</description>\n{style_url}{indent}\t{geometry}\n{indent}</Placemark>\n'
+
+
+def kml_folder(name, objecttype, objects, style=None):
+    """
+    Generate a folder containing a placemark for each of the objects
+    """
+    yield f'\t\t<Folder>\n\t\t\t<name>{kml_cdata(name)}</name>\n'
+    yield from kml_placemarks(objecttype, objects, style=style, indent='\t\t\t')
+    yield '\t\t</Folder>\n'
+
+
+def kml_stream(parts, styles=()):
+    """
+    Generate a kml document in chunks
+
+    parts is an iterable of the strings that make up the body of the document
+    (from kml_placemarks/kml_folder), styles are the names of any KML_STYLES used.
+    """
+    chunk = [KML_HEADER]
+    chunk.extend(kml_style(style) for style in styles)
+    for part in parts:
+        chunk.append(part)
+        if len(chunk) >= KML_CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    chunk.append(KML_FOOTER)
+    yield ''.join(chunk)
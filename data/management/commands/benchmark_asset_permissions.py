@@ -0,0 +1,91 @@
+"""
+Benchmark checking if a user can record/operate for an asset
+
+Compares the original check (a query per organization the asset is in),
+the single EXISTS query, and the cached capabilities, for a user that
+is in many organizations which all have the asset.
+
+All the data is created inside a transaction that is rolled back.
+"""
+
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from assets.models import Asset, AssetType
+from organization.helpers import organization_user_asset_capabilities, organization_user_is_asset_recorder, ASSET_RECORDER
+from organization.models import Organization, OrganizationAsset, OrganizationMember
+
+
+def loop_is_asset_recorder(user, asset):
+    """
+    The original implementation, checking each organization the asset is in
+    """
+    for org in OrganizationAsset.objects.filter(asset=asset, removed__isnull=True):
+        for org_user in OrganizationMember.objects.filter(user=user, organization=org.organization, removed__isnull=True):
+            if org_user.is_asset_recorder():
+                return True
+    return False
+
+
+def exists_is_asset_recorder(user, asset):
+    """
+    The single query implementation
+    """
+    return organization_user_is_asset_recorder(user, asset)
+
+
+def cached_is_asset_recorder(user, asset):
+    """
+    The cached capabilities
+    """
+    return ASSET_RECORDER in organization_user_asset_capabilities(user, asset)
+
+
+def create_organizations(organizations):
+    """
+    Create a user and an asset that are both in organizations organizations
+
+    The user is only an asset recorder in the last one, so the original implementation checks them all.
+    """
+    user = get_user_model().objects.create_user(f'benchmark-{organizations}')
+    asset_type = AssetType.objects.create(name='benchmark', description='benchmark')
+    asset = Asset.objects.create(name=f'benchmark-{organizations}', asset_type=asset_type, owner=user)
+    for i in range(organizations):
+        organization = Organization.objects.create(name=f'benchmark-{i}', creator=user)
+        OrganizationAsset.objects.create(organization=organization, asset=asset, added_by=user)
+        OrganizationMember.objects.create(organization=organization, user=user, added_by=user, role='b' if i == organizations - 1 else 'M')
+    return user, asset
+
+
+class Command(BaseCommand):
+    """
+    Benchmark the asset permission checks
+    """
+    help = 'Benchmark checking if a user can record for an asset, for users in many organizations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organizations', default='1,10,100', help='Comma separated list of the number of organizations')
+        parser.add_argument('--repeat', type=int, default=100, help='Number of times to run each check')
+
+    @staticmethod
+    def time_function(func, user, asset, repeat):
+        """
+        Return the mean time (in ms) func took
+        """
+        start = perf_counter()
+        for _ in range(repeat):
+            if not func(user, asset):
+                raise ValueError(f'{func.__name__} returned the wrong answer')
+        return (perf_counter() - start) * 1000 / repeat
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"organizations":>13} {"loop ms":>10} {"exists ms":>10} {"cached ms":>10}')
+        for organizations in [int(v) for v in options['organizations'].split(',')]:
+            with transaction.atomic():
+                user, asset = create_organizations(organizations)
+                times = [self.time_function(func, user, asset, options['repeat']) for func in (loop_is_asset_recorder, exists_is_asset_recorder, cached_is_asset_recorder)]
+                self.stdout.write(f'{organizations:>13} {times[0]:>10.3f} {times[1]:>10.3f} {times[2]:>10.3f}')
+                transaction.set_rollback(True)
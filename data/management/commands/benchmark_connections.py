@@ -0,0 +1,71 @@
+"""
+Benchmark recording a position with and without the connection pool
+
+Without the pool, every request opens a new connection to PostgreSQL
+(and sets it up for PostGIS), which is closed again when the request
+finishes. With the pool, the connection is borrowed and returned.
+
+The requests are made through the django test client, so they include
+the full request handling (middleware, the decorators, the view and the
+request_finished signal that closes/returns the connection), but not the server.
+The positions are recorded for the benchmark-servers asset (see benchmark_servers),
+so only run this against a development database.
+"""
+
+import statistics
+from time import perf_counter
+
+from django.db import connection
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from smm.database import pool_options
+from .benchmark_servers import create_data
+
+
+class Command(BaseCommand):
+    """
+    Benchmark the position ingest endpoint with and without the connection pool
+    """
+    help = 'Benchmark recording a position with and without the connection pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Number of positions to record for each mode')
+
+    @staticmethod
+    def time_requests(client, url, requests):
+        """
+        Return the time (in ms) each request took
+        """
+        times = []
+        for i in range(requests):
+            start = perf_counter()
+            response = client.get(url, {'lat': -43.5, 'lon': 172.5 + i / 10000, 'fix': 3})
+            times.append((perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                raise ValueError(f'Recording a position failed with {response.status_code}')
+        return times
+
+    def handle(self, *args, **options):
+        user, _, asset = create_data(0)
+        client = Client()
+        client.force_login(user)
+        url = f'/data/assets/{asset.pk}/position/add/'
+        configured = connection.settings_dict['OPTIONS'].get('pool')
+
+        self.stdout.write(f'{"mode":>8} {"mean ms":>8} {"p50 ms":>8} {"p99 ms":>8}')
+        results = {}
+        try:
+            for mode, pool in (('no pool', False), ('pool', configured or pool_options())):
+                connection.close()
+                connection.settings_dict['OPTIONS']['pool'] = pool
+                # Warm up (i.e. fill the pool)
+                self.time_requests(client, url, 10)
+                times = self.time_requests(client, url, options['requests'])
+                percentiles = statistics.quantiles(times, n=100)
+                results[mode] = statistics.mean(times)
+                self.stdout.write(f'{mode:>8} {results[mode]:>8.2f} {percentiles[49]:>8.2f} {percentiles[98]:>8.2f}')
+        finally:
+            connection.close()
+            connection.settings_dict['OPTIONS']['pool'] = configured
+        self.stdout.write(f'The pool saves {results["no pool"] - results["pool"]:.2f} ms per request')
@@ -0,0 +1,59 @@
+"""
+Benchmark creating the creeping line over a convex polygon
+
+Compares intersecting each stripe with the polygon in GEOS (creep_line_geos)
+with finding all the stripes' crossings at once with numpy (creep_line),
+for a polygon about 50km across at different sweep widths.
+
+This doesn't use the database.
+"""
+
+import math
+import statistics
+from time import perf_counter
+
+from django.contrib.gis.geos import LinearRing
+from django.core.management.base import BaseCommand
+
+from search.polygon.convex import creep_line, creep_line_geos
+
+
+def area_polygon(size, points=12):
+    """
+    A convex polygon with points points, size (m) across
+    """
+    pts = [(size / 2 * math.cos(2 * math.pi * i / points + 0.1), size / 2 * math.sin(2 * math.pi * i / points + 0.1)) for i in range(points)]
+    return LinearRing(pts + [pts[0]])
+
+
+def time_ms(func, lrng, width, repeats):
+    """
+    Time creating the creeping line (in ms, the median of repeats)
+    """
+    times = []
+    for _ in range(repeats):
+        start = perf_counter()
+        func(lrng, width)
+        times.append((perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+class Command(BaseCommand):
+    """
+    Benchmark the creeping line over a convex polygon
+    """
+    help = 'Benchmark creating the creeping line over a convex polygon, with GEOS and numpy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=50000, help='How far across (m) the polygon is')
+        parser.add_argument('--widths', default='10,100,1000', help='Comma separated list of the sweep widths (m)')
+        parser.add_argument('--repeats', type=int, default=5, help='Number of times to create each creeping line')
+
+    def handle(self, *args, **options):
+        lrng = area_polygon(options['size'])
+        self.stdout.write(f'{"width m":>8} {"stripes":>8} {"geos ms":>9} {"numpy ms":>9} {"speedup":>8}')
+        for width in [int(width) for width in options['widths'].split(',')]:
+            geos_ms = time_ms(creep_line_geos, lrng, width, options['repeats'])
+            numpy_ms = time_ms(creep_line, lrng, width, options['repeats'])
+            stripes = math.ceil(options['size'] / width)
+            self.stdout.write(f'{width:>8} {stripes:>8} {geos_ms:>9.1f} {numpy_ms:>9.1f} {geos_ms / numpy_ms:>7.1f}x')
@@ -0,0 +1,70 @@
+"""
+Benchmark decomposing polygons into convex pieces, against the number of points
+
+Polygon (parallel line) searches decompose the polygon into convex pieces
+before creating the creeping line over each piece. This times the decomposition
+(and the whole creeping line) for random star shaped polygons, where around
+half of the points are concave, like a hand drawn coastline.
+
+This doesn't use the database.
+"""
+
+import math
+import random
+import statistics
+from time import perf_counter
+
+from django.contrib.gis.geos import LinearRing
+from django.core.management.base import BaseCommand
+
+from search.polygon.convex import creep_line_concave, decomp, lrng_concave_points
+
+
+def random_polygon(rnd, points, radius):
+    """
+    A random simple polygon, with points points up to radius (m) from the origin
+    """
+    angles = [(i + rnd.uniform(0, 0.8)) * 2 * math.pi / points for i in range(points)]
+    pts = [(math.cos(angle) * length, math.sin(angle) * length) for angle in angles for length in [rnd.uniform(radius / 10, radius)]]
+    return LinearRing(pts + [pts[0]])
+
+
+def time_ms(func, *args):
+    """
+    Time calling func (in ms), returning the time and the result
+    """
+    start = perf_counter()
+    result = func(*args)
+    return (perf_counter() - start) * 1000, result
+
+
+class Command(BaseCommand):
+    """
+    Benchmark the convex decomposition
+    """
+    help = 'Benchmark decomposing polygons into convex pieces, against the number of points'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', default='8,16,32,64,128,256', help='Comma separated list of the number of points in each polygon')
+        parser.add_argument('--polygons', type=int, default=5, help='Number of polygons of each size')
+        parser.add_argument('--sweep-width', type=int, default=200, help='Sweep width (m) of the creeping line, in a polygon up to 5km across')
+        parser.add_argument('--seed', type=int, default=1, help='Seed for the random polygons')
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        self.stdout.write(f'{"points":>7} {"concave":>8} {"pieces":>7} {"decomp ms":>10} {"creep line ms":>14}')
+        for points in [int(points) for points in options['points'].split(',')]:
+            concave = []
+            pieces = []
+            decomp_times = []
+            creep_times = []
+            for _ in range(options['polygons']):
+                lrng = random_polygon(rnd, points, 2500)
+                concave.append(len(lrng_concave_points(lrng)))
+                decomp_time, result = time_ms(decomp, lrng)
+                decomp_times.append(decomp_time)
+                pieces.append(len(result))
+                creep_times.append(time_ms(creep_line_concave, lrng, options['sweep_width'])[0])
+            self.stdout.write(
+                f'{points:>7} {statistics.mean(concave):>8.1f} {statistics.mean(pieces):>7.1f} '
+                f'{statistics.mean(decomp_times):>10.1f} {statistics.mean(creep_times):>14.1f}')
@@ -0,0 +1,200 @@
+"""
+Benchmark the endpoints the map and field devices use, against a (synthetic) mission
+
+Every endpoint is requested as the mission's admin, either through the
+django test client (in this process, which also reports the number of
+queries, see smm.metrics), or from a server that is already running (--port).
+The throughput and latency percentiles of each endpoint are reported, and
+can be saved as json (--output) and compared with an earlier run (--compare),
+i.e. from before a change.
+
+Use generate_mission to create the mission first. Recording positions adds
+to the mission, so only run this against a development database.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import itertools
+import json
+import statistics
+import subprocess
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+
+from assets.models import Asset
+from mission.models import Mission, MissionUser
+
+from .benchmark_servers import load
+
+
+# The endpoints to request (name, path), formatted with the mission, an asset and a user
+ENDPOINTS = (
+    ('mission list', '/mission/list/'),
+    ('mission assets', '/mission/{mission}/assets/'),
+    ('mission timeline', '/mission/{mission}/timeline/'),
+    ('assets latest', '/mission/{mission}/data/assets/positions/latest/'),
+    ('users latest', '/mission/{mission}/data/users/positions/latest/'),
+    ('asset history', '/mission/{mission}/data/assets/{asset}/position/history/?zoom=12'),
+    ('user history', '/mission/{mission}/data/user/{user}/position/history/'),
+    ('pois', '/mission/{mission}/data/pois/current/'),
+    ('pois bbox', '/mission/{mission}/data/pois/current/?bbox=172.4,-43.6,172.6,-43.4'),
+    ('lines', '/mission/{mission}/data/userlines/current/'),
+    ('polygons', '/mission/{mission}/data/userpolygons/current/'),
+    ('pois tile', '/mission/{mission}/tiles/pois/10/1002/632.mvt'),
+    ('searches notstarted', '/mission/{mission}/search/notstarted/'),
+    ('searches inprogress', '/mission/{mission}/search/inprogress/'),
+    ('searches completed', '/mission/{mission}/search/completed/'),
+    ('images', '/mission/{mission}/image/list/all/'),
+    ('drift vectors', '/mission/{mission}/sar/marine/vectors/current/'),
+    ('all missions pois', '/mission/all/data/pois/current/'),
+    ('all missions assets', '/mission/all/data/assets/positions/latest/'),
+    ('find next search', '/search/find/closest/?asset_id={asset}&latitude=-43.5&longitude=172.5'),
+    ('record position', '/data/assets/{asset}/position/add/?lat=-43.5&lon=172.5&fix=3&alt=100&heading=90'),
+)
+
+
+def client_load(user, path, requests, concurrency):
+    """
+    Make requests to path through the test client from concurrency threads
+
+    Returns the requests/s, the latencies (in ms), the number of errors and the queries for each request
+    """
+    counter = itertools.count()
+    latencies = []
+    queries = []
+    errors = []
+
+    def client():
+        test_client = Client(HTTP_ACCEPT='application/json')
+        test_client.force_login(user)
+        try:
+            while next(counter) < requests:
+                start = perf_counter()
+                response = test_client.get(path)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                latencies.append((perf_counter() - start) * 1000)
+                queries.append(response.wsgi_request.metrics.queries)
+                if response.status_code >= 400:
+                    errors.append(response.status_code)
+        finally:
+            connection.close()
+
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(client) for _ in range(concurrency)]:
+            future.result()
+    return requests / (perf_counter() - start), latencies, len(errors), queries
+
+
+def git_commit():
+    """
+    The commit that is checked out (if it can be found)
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    """
+    Benchmark the endpoints against a mission
+    """
+    help = 'Benchmark the throughput and latency of the endpoints against a (synthetic) mission'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mission', default='synthetic', help='Name of the mission to use (see generate_mission)')
+        parser.add_argument('--endpoints', default=None, help='Comma separated list of the endpoints to benchmark (default all)')
+        parser.add_argument('--requests', type=int, default=100, help='Number of requests to make to each endpoint')
+        parser.add_argument('--concurrency', type=int, default=1, help='Number of clients making requests at once')
+        parser.add_argument('--port', type=int, default=None, help='Request from the server running on this port, instead of the test client')
+        parser.add_argument('--output', default=None, help='Save the results (as json) to this file')
+        parser.add_argument('--compare', default=None, help='Compare with results saved (with --output) by an earlier run')
+
+    @staticmethod
+    def endpoints(mission, names):
+        """
+        The (name, path) of the endpoints to benchmark for the mission
+        """
+        asset = Asset.objects.filter(missionasset__mission=mission, missionasset__removed__isnull=True).order_by('pk').first()
+        user = MissionUser.objects.filter(mission=mission).exclude(user=mission.creator).select_related('user').order_by('pk').first()
+        if asset is None or user is None:
+            raise CommandError(f'Mission {mission.mission_name} needs an asset and a user, use generate_mission to create it')
+        selected = names.split(',') if names else [name for name, _ in ENDPOINTS]
+        unknown = set(selected) - {name for name, _ in ENDPOINTS}
+        if unknown:
+            raise CommandError(f'Unknown endpoints: {", ".join(sorted(unknown))}')
+        return [(name, path.format(mission=mission.pk, asset=asset.pk, user=user.user.username)) for name, path in ENDPOINTS if name in selected]
+
+    def benchmark(self, mission, path, options):
+        """
+        Request the endpoint, returning the results
+        """
+        if options['port'] is None:
+            # Warm up (the caches, and the connections)
+            client_load(mission.creator, path, options['concurrency'], options['concurrency'])
+            rate, latencies, errors, queries = client_load(mission.creator, path, options['requests'], options['concurrency'])
+        else:
+            test_client = Client()
+            test_client.force_login(mission.creator)
+            cookie = f'{settings.SESSION_COOKIE_NAME}={test_client.cookies[settings.SESSION_COOKIE_NAME].value}'
+            load(options['port'], path, cookie, options['concurrency'], options['concurrency'])
+            rate, latencies, errors = load(options['port'], path, cookie, options['requests'], options['concurrency'])
+            queries = None
+        percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        return {
+            'path': path,
+            'requests': options['requests'],
+            'requests_per_s': rate,
+            'p50_ms': percentiles[49],
+            'p90_ms': percentiles[89],
+            'p99_ms': percentiles[98],
+            'errors': errors,
+            'queries': statistics.mean(queries) if queries else None,
+        }
+
+    def compare(self, results, filename):
+        """
+        Show how the results changed since the earlier run saved in filename
+        """
+        with open(filename, encoding='utf-8') as previous_file:
+            previous = json.load(previous_file)
+        self.stdout.write(f'Compared with {previous.get("commit") or filename}')
+        self.stdout.write(f'{"endpoint":>20} {"requests/s":>11} {"p50":>8} {"p99":>8}')
+        for name, result in results['endpoints'].items():
+            before = previous['endpoints'].get(name)
+            if before is None:
+                continue
+            changes = [(result[field] - before[field]) / before[field] * 100 if before[field] else 0.0 for field in ('requests_per_s', 'p50_ms', 'p99_ms')]
+            self.stdout.write(f'{name:>20} {changes[0]:>+10.1f}% {changes[1]:>+7.1f}% {changes[2]:>+7.1f}%')
+
+    def handle(self, *args, **options):
+        mission = Mission.objects.filter(mission_name=options['mission']).order_by('-pk').first()
+        if mission is None:
+            raise CommandError(f'There is no mission called {options["mission"]}, use generate_mission to create it')
+        results = {
+            'commit': git_commit(),
+            'created': datetime.now(timezone.utc).isoformat(),
+            'mission': mission.mission_name,
+            'server': f'port {options["port"]}' if options['port'] else 'test client',
+            'concurrency': options['concurrency'],
+            'endpoints': {},
+        }
+
+        self.stdout.write(f'{"endpoint":>20} {"requests/s":>10} {"p50 ms":>8} {"p90 ms":>8} {"p99 ms":>8} {"errors":>7} {"queries":>8}')
+        for name, path in self.endpoints(mission, options['endpoints']):
+            result = self.benchmark(mission, path, options)
+            results['endpoints'][name] = result
+            queries = f'{result["queries"]:.1f}' if result['queries'] is not None else '-'
+            self.stdout.write(f'{name:>20} {result["requests_per_s"]:>10.1f} {result["p50_ms"]:>8.1f} {result["p90_ms"]:>8.1f} {result["p99_ms"]:>8.1f} {result["errors"]:>7} {queries:>8}')
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output_file:
+                json.dump(results, output_file, indent=2)
+        if options['compare']:
+            self.compare(results, options['compare'])
@@ -0,0 +1,94 @@
+"""
+Benchmark generating geojson for an asset track
+
+Compares the django geojson serializer (which creates a model object
+and a GDAL geometry for every row) against the streaming serializer
+in data.geojson, for an asset with a long position history.
+
+All the data is created inside a transaction that is rolled back.
+"""
+
+from datetime import timedelta
+import math
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Point
+from django.core.management.base import BaseCommand
+from django.core.serializers import serialize
+from django.db import transaction
+from django.utils import timezone
+
+from assets.models import Asset, AssetType
+from data.geojson import geojson_stream
+from data.models import AssetPointTime
+from mission.models import Mission
+
+
+def serializer_geojson(objects):
+    """
+    The original implementation, using the django serializer
+    """
+    return serialize('geojson', objects, geometry_field=AssetPointTime.GEOFIELD, fields=AssetPointTime.GEOJSON_FIELDS, use_natural_foreign_keys=True)
+
+
+def stream_geojson(objects):
+    """
+    The streaming implementation
+    """
+    return ''.join(geojson_stream(AssetPointTime, objects))
+
+
+def create_track(points, wiggle=0.0):
+    """
+    Create an asset in a mission with a track of points positions, one per second
+
+    The track heads east, wiggling north/south by wiggle degrees.
+    """
+    user = get_user_model().objects.create_user(f'benchmark-{points}')
+    asset_type = AssetType.objects.create(name='benchmark', description='benchmark')
+    mission = Mission.objects.create(creator=user, mission_name='benchmark')
+    asset = Asset.objects.create(name='benchmark', asset_type=asset_type, owner=user)
+    now = timezone.now()
+    AssetPointTime.objects.bulk_create([
+        AssetPointTime(asset=asset, mission=mission, created_by=user, geo=Point(172.5 + i * 0.0001, -43.5 + wiggle * math.sin(i / 300)), alt=100, heading=90, fix=3,
+                       created_at=now - timedelta(seconds=points - i))
+        for i in range(points)], batch_size=5000)
+    return mission, asset
+
+
+class Command(BaseCommand):
+    """
+    Benchmark the geojson serializers
+    """
+    help = 'Benchmark generating geojson for an asset track'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', default='1000,10000', help='Comma separated list of track lengths')
+        parser.add_argument('--repeat', type=int, default=3, help='Number of times to run each serializer')
+
+    @staticmethod
+    def time_function(func, objects, repeat):
+        """
+        Return the best time (in ms) and the size of the output for func
+        """
+        best = None
+        size = 0
+        for _ in range(repeat):
+            start = perf_counter()
+            size = len(func(objects))
+            elapsed = (perf_counter() - start) * 1000
+            if best is None or elapsed < best:
+                best = elapsed
+        return best, size
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"points":>8} {"serializer ms":>14} {"stream ms":>10} {"bytes":>10}')
+        for points in [int(v) for v in options['points'].split(',')]:
+            with transaction.atomic():
+                mission, asset = create_track(points)
+                objects = AssetPointTime.objects.filter(mission=mission, asset=asset).order_by('created_at')
+                serializer_time, size = self.time_function(serializer_geojson, objects, options['repeat'])
+                stream_time, _ = self.time_function(stream_geojson, objects, options['repeat'])
+                self.stdout.write(f'{points:>8} {serializer_time:>14.2f} {stream_time:>10.2f} {size:>10}')
+                transaction.set_rollback(True)
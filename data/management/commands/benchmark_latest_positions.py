@@ -0,0 +1,105 @@
+"""
+Benchmark finding the latest position of each asset in a mission
+
+Compares the original per-asset loop against the single query
+in AssetPointTime.latest_for_mission as the number of assets in
+the system and the depth of their position history grows.
+
+All the data is created inside a transaction that is rolled back.
+"""
+
+from datetime import timedelta
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Point
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from assets.models import Asset, AssetType
+from data.models import AssetPointTime
+from mission.models import Mission, MissionAsset
+
+
+def latest_per_asset_loop(mission):
+    """
+    The original implementation, one query per asset in the system
+    """
+    positions = []
+    for asset in Asset.objects.all():
+        points = AssetPointTime.objects.filter(mission=mission, asset=asset).order_by('-created_at')[:1]
+        for point in points:
+            positions.append(point)
+    return positions
+
+
+def latest_per_asset_query(mission):
+    """
+    The single query implementation
+    """
+    return list(AssetPointTime.latest_for_mission(mission))
+
+
+class Command(BaseCommand):
+    """
+    Benchmark the latest position queries
+    """
+    help = 'Benchmark finding the latest position of each asset in a mission'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--assets', default='10,100,1000', help='Comma separated list of total assets in the system')
+        parser.add_argument('--depth', default='10,100', help='Comma separated list of positions per mission asset')
+        parser.add_argument('--mission-assets', type=int, default=3, help='Number of assets in the mission')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of times to run each query')
+
+    def time_function(self, func, mission, repeat):
+        """
+        Return the best time (in ms) and the number of queries for func
+        """
+        best = None
+        with CaptureQueriesContext(connection) as queries:
+            func(mission)
+        for _ in range(repeat):
+            start = perf_counter()
+            func(mission)
+            elapsed = (perf_counter() - start) * 1000
+            if best is None or elapsed < best:
+                best = elapsed
+        return best, len(queries)
+
+    @staticmethod
+    def create_mission(total_assets, depth, mission_assets):
+        """
+        Create a mission with mission_assets of total_assets each having depth positions
+        """
+        user = get_user_model().objects.create_user(f'benchmark-{total_assets}-{depth}')
+        asset_type = AssetType.objects.create(name='benchmark', description='benchmark')
+        mission = Mission.objects.create(creator=user, mission_name='benchmark')
+        assets = Asset.objects.bulk_create([Asset(name=f'asset {i}', asset_type=asset_type, owner=user) for i in range(total_assets)])
+        now = timezone.now()
+        points = []
+        for asset in assets[:mission_assets]:
+            MissionAsset.objects.create(mission=mission, asset=asset, creator=user)
+            for i in range(depth):
+                points.append(AssetPointTime(asset=asset, mission=mission, created_by=user, geo=Point(172.5 + i * 0.001, -43.5), created_at=now - timedelta(seconds=i)))
+        AssetPointTime.objects.bulk_create(points)
+        return mission
+
+    def run_case(self, total_assets, depth, mission_assets, repeat):
+        """
+        Create the data for a single case and time both implementations
+        """
+        mission = self.create_mission(total_assets, depth, mission_assets)
+        loop_time, loop_queries = self.time_function(latest_per_asset_loop, mission, repeat)
+        query_time, query_queries = self.time_function(latest_per_asset_query, mission, repeat)
+        self.stdout.write(f'{total_assets:>8} {depth:>8} {loop_queries:>8} {loop_time:>10.2f} {query_queries:>8} {query_time:>10.2f}')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"assets":>8} {"depth":>8} {"loop q":>8} {"loop ms":>10} {"single q":>8} {"single ms":>10}')
+        for total_assets in [int(v) for v in options['assets'].split(',')]:
+            for depth in [int(v) for v in options['depth'].split(',')]:
+                with transaction.atomic():
+                    self.run_case(total_assets, depth, min(options['mission_assets'], total_assets), options['repeat'])
+                    transaction.set_rollback(True)
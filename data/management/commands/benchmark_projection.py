@@ -0,0 +1,82 @@
+"""
+Benchmark converting polygon searches between lon/lat and metres
+
+Polygon (parallel line) searches are created in metres, so the polygon is
+converted from lon/lat and the creeping line converted back. This compares
+the time, and the worst error in the distance between points (against the
+geodesic distance), of the skew at the first point (conv_lonlat_to_meters)
+and the azimuthal equidistant projection at the centroid (conv_lonlat_to_local)
+for random polygons of each size.
+
+This doesn't use the database.
+"""
+
+from time import perf_counter
+
+from django.contrib.gis.geos import LinearRing, LineString, Point
+from django.core.management.base import BaseCommand
+import numpy as np
+
+from search.polygon.convex import conv_local_to_lonlat, conv_lonlat_to_local, conv_lonlat_to_meters, conv_meters_to_lonlat
+from smm.geodesy import geodesic_direct, geodesic_inverse
+
+
+def random_ring(rng, centre, size, points):
+    """
+    A random ring (in lon/lat) of points up to size/2 (m) from centre
+    """
+    azimuths = np.sort(rng.uniform(0, 360, points))
+    lons, lats = geodesic_direct(centre[0], centre[1], azimuths, rng.uniform(size / 4, size / 2, points))
+    coords = list(zip(lons.tolist(), lats.tolist()))
+    return LinearRing(coords + [coords[0]], srid=4326)
+
+
+def worst_error(lrng_lonlat, lrng_meters):
+    """
+    The worst error (m) in the distance between any two points, against the geodesic distance
+    """
+    lonlat = np.array(lrng_lonlat.coords)
+    meters = np.array(lrng_meters.coords)
+    first, second = np.triu_indices(len(lonlat), 1)
+    geodesic, _ = geodesic_inverse(lonlat[first, 0], lonlat[first, 1], lonlat[second, 0], lonlat[second, 1])
+    return np.max(np.abs(np.hypot(*(meters[first] - meters[second]).T) - geodesic))
+
+
+def time_ms(func, *args):
+    """
+    Time calling func (in ms), returning the time and the result
+    """
+    start = perf_counter()
+    result = func(*args)
+    return (perf_counter() - start) * 1000, result
+
+
+class Command(BaseCommand):
+    """
+    Benchmark the lon/lat to metres conversions
+    """
+    help = 'Benchmark converting polygon searches between lon/lat and metres, and the error in the distances'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000', help='Comma separated list of the sizes (m) of the polygons')
+        parser.add_argument('--points', type=int, default=50, help='Number of points in each polygon')
+        parser.add_argument('--line-points', type=int, default=5000, help='Number of points in the creeping line converted back to lon/lat')
+        parser.add_argument('--latitude', type=float, default=-43.5, help='Latitude of the polygons')
+        parser.add_argument('--seed', type=int, default=1, help='Seed for the random polygons')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        centre = Point(172.5, options['latitude'], srid=4326)
+        self.stdout.write(f'{"size m":>8} {"skew error m":>13} {"aeqd error m":>13} {"skew ms":>8} {"aeqd ms":>8}')
+        for size in [int(size) for size in options['sizes'].split(',')]:
+            lrng = random_ring(rng, centre, size, options['points'])
+            line_meters = LineString(rng.uniform(-size / 2, size / 2, (options['line_points'], 2)))
+
+            skew_time, skew_meters = time_ms(conv_lonlat_to_meters, lrng)
+            skew_time += time_ms(conv_meters_to_lonlat, line_meters, lrng[0])[0]
+            aeqd_time, aeqd_meters = time_ms(conv_lonlat_to_local, lrng, centre)
+            aeqd_time += time_ms(conv_local_to_lonlat, line_meters, centre)[0]
+
+            self.stdout.write(
+                f'{size:>8} {worst_error(lrng, skew_meters):>13.3f} {worst_error(lrng, aeqd_meters):>13.3f} '
+                f'{skew_time:>8.1f} {aeqd_time:>8.1f}')
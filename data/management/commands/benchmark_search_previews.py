@@ -0,0 +1,60 @@
+"""
+Benchmark creating search previews (the search is created, but not saved)
+
+The searches are created for a datum that isn't saved either, so this shows how
+many previews each search type can make per second without the database
+(the geodesic calculations are done in smm.geodesy).
+
+This doesn't use the database.
+"""
+
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import LineString, Point, Polygon
+from django.core.management.base import BaseCommand
+
+from assets.models import AssetType
+from data.models import GeoTimeLabel
+from mission.models import Mission
+from search.models import ExpandingBoxSearchParams, Search, SearchParams, TrackLineCreepingSearchParams
+
+
+def search_types(sweep_width, iterations, width):
+    """
+    The (name, create function, params) of each search type to preview
+    """
+    mission = Mission(mission_name='benchmark')
+    creator = get_user_model()(username='benchmark')
+    asset_type = AssetType(name='benchmark')
+    poi = GeoTimeLabel(geo=Point(172.5, -43.5, srid=4326), geo_type='poi', mission=mission)
+    line = GeoTimeLabel(geo=LineString((172.5, -43.5), (172.55, -43.45), (172.65, -43.47), srid=4326), geo_type='line', mission=mission)
+    polygon = GeoTimeLabel(geo=Polygon(((172.5, -43.5), (172.55, -43.45), (172.6, -43.5), (172.55, -43.48), (172.5, -43.5)), srid=4326), geo_type='polygon', mission=mission)
+    return (
+        ('sector', Search.create_sector_search, SearchParams(poi, asset_type, creator, sweep_width)),
+        ('expanding box', Search.create_expanding_box_search, ExpandingBoxSearchParams(poi, asset_type, creator, sweep_width, iterations, 0)),
+        ('creeping line', Search.create_track_line_creeping_search, TrackLineCreepingSearchParams(line, asset_type, creator, sweep_width, width)),
+        ('polygon', Search.create_polygon_creeping_line_search, SearchParams(polygon, asset_type, creator, sweep_width)),
+    )
+
+
+class Command(BaseCommand):
+    """
+    Benchmark creating search previews
+    """
+    help = 'Benchmark how many search previews of each type can be created per second (without the database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--previews', type=int, default=200, help='Number of previews of each type to create')
+        parser.add_argument('--sweep-width', type=int, default=200, help='Sweep width (m) of the searches')
+        parser.add_argument('--iterations', type=int, default=5, help='Iterations of the expanding box search')
+        parser.add_argument('--width', type=int, default=1000, help='Width (m) of the creeping line search')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"search":>14} {"points":>7} {"previews/s":>11} {"ms each":>8}')
+        for name, create, params in search_types(options['sweep_width'], options['iterations'], options['width']):
+            start = perf_counter()
+            for _ in range(options['previews']):
+                search = create(params)
+            elapsed = perf_counter() - start
+            self.stdout.write(f'{name:>14} {search.geo.num_points:>7} {options["previews"] / elapsed:>11.1f} {elapsed / options["previews"] * 1000:>8.2f}')
@@ -0,0 +1,165 @@
+"""
+Benchmark the WSGI and ASGI servers against each other
+
+Each server (uwsgi for WSGI, uvicorn for ASGI) is started with the same
+number of worker processes, then the high volume endpoints are requested
+from many client threads, reporting the throughput and latency of each.
+
+The data that is used (a user, asset, mission and POIs, all called
+benchmark-servers) is created in the database when it doesn't exist,
+and is kept for the next run, so only run this against a development database.
+The servers use the normal settings, so 127.0.0.1 needs to be in ALLOWED_HOSTS.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import http.client
+import itertools
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import time
+from time import perf_counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Point
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from assets.models import Asset, AssetType
+from data.models import GeoTimeLabel
+from mission.models import Mission, MissionAsset, MissionUser
+
+
+BENCHMARK_NAME = 'benchmark-servers'
+
+# How to start each server, with the port and number of workers to use
+SERVERS = {
+    'wsgi': ['uwsgi', '--http-socket', '127.0.0.1:{port}', '--processes', '{workers}', '--master', '--disable-logging', '-w', 'smm.wsgi'],
+    'asgi': ['uvicorn', 'smm.asgi:application', '--host', '127.0.0.1', '--port', '{port}', '--workers', '{workers}', '--no-access-log'],
+}
+
+# The endpoints to request, formatted with the mission and asset
+ENDPOINTS = (
+    ('record position', '/data/assets/{asset}/position/add/?lat=-43.5&lon=172.5&fix=3&alt=100&heading=90'),
+    ('latest positions', '/mission/{mission}/data/assets/positions/latest/'),
+    ('find next search', '/search/find/closest/?asset_id={asset}&latitude=-43.5&longitude=172.5'),
+    ('pois', '/mission/{mission}/data/pois/current/'),
+    ('searches', '/mission/{mission}/search/notstarted/'),
+)
+
+
+def create_data(pois):
+    """
+    Find (or create) the user, mission and asset to use
+    """
+    user, _ = get_user_model().objects.get_or_create(username=BENCHMARK_NAME)
+    mission, created = Mission.objects.get_or_create(mission_name=BENCHMARK_NAME, creator=user)
+    if created:
+        MissionUser.objects.create(mission=mission, user=user, creator=user, role='A')
+    asset_type, _ = AssetType.objects.get_or_create(name=BENCHMARK_NAME, defaults={'description': BENCHMARK_NAME})
+    asset, _ = Asset.objects.get_or_create(name=BENCHMARK_NAME, defaults={'asset_type': asset_type, 'owner': user})
+    if not MissionAsset.objects.filter(asset=asset, removed__isnull=True).exists():
+        MissionAsset.objects.create(mission=mission, asset=asset, creator=user)
+    for i in range(GeoTimeLabel.objects.filter(mission=mission, geo_type='poi').count(), pois):
+        GeoTimeLabel(mission=mission, created_by=user, geo=Point(172.5 + i * 0.001, -43.5), label=f'POI {i}', geo_type='poi').save()
+    return user, mission, asset
+
+
+def wait_for_server(port, timeout=30):
+    """
+    Wait until the server is accepting connections
+    """
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise CommandError(f"Server didn't start on port {port}")
+
+
+def load(port, path, cookie, requests, concurrency):
+    """
+    Make requests to path from concurrency threads
+
+    Returns the requests/s, the latencies (in ms) and the number of errors
+    """
+    counter = itertools.count()
+    latencies = []
+    errors = []
+
+    def client():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        while next(counter) < requests:
+            start = perf_counter()
+            try:
+                connection.request('GET', path, headers={'Cookie': cookie, 'Accept': 'application/json'})
+                response = connection.getresponse()
+                response.read()
+                if response.status >= 500:
+                    errors.append(response.status)
+            except (OSError, http.client.HTTPException) as error:
+                errors.append(error)
+                connection.close()
+            latencies.append((perf_counter() - start) * 1000)
+        connection.close()
+
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(client)
+    return requests / (perf_counter() - start), latencies, len(errors)
+
+
+class Command(BaseCommand):
+    """
+    Benchmark the WSGI and ASGI servers
+    """
+    help = 'Compare the throughput and latency of the WSGI and ASGI servers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', default='wsgi,asgi', help='Comma separated list of servers to benchmark')
+        parser.add_argument('--workers', type=int, default=4, help='Number of worker processes for each server')
+        parser.add_argument('--concurrency', type=int, default=32, help='Number of clients making requests at once')
+        parser.add_argument('--requests', type=int, default=2000, help='Number of requests to make to each endpoint')
+        parser.add_argument('--pois', type=int, default=500, help='Number of POIs in the mission')
+        parser.add_argument('--port', type=int, default=8091, help='Port to run the servers on')
+
+    def benchmark_server(self, server, endpoints, cookie, options):
+        """
+        Start the server, and measure each of the endpoints
+        """
+        command = [part.format(port=options['port'], workers=options['workers']) for part in SERVERS[server]]
+        if shutil.which(command[0]) is None:
+            self.stderr.write(f'Skipping {server}, {command[0]} is not installed')
+            return
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'smm.settings'))
+        with subprocess.Popen(command, cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) as process:
+            try:
+                wait_for_server(options['port'])
+                for name, path in endpoints:
+                    # Warm up the workers (and their database connections)
+                    load(options['port'], path, cookie, options['concurrency'], options['concurrency'])
+                    rate, latencies, errors = load(options['port'], path, cookie, options['requests'], options['concurrency'])
+                    percentiles = statistics.quantiles(latencies, n=100)
+                    self.stdout.write(f'{server:>6} {name:>18} {rate:>10.1f} {percentiles[49]:>8.1f} {percentiles[98]:>8.1f} {errors:>7}')
+            finally:
+                process.terminate()
+                process.wait()
+
+    def handle(self, *args, **options):
+        user, mission, asset = create_data(options['pois'])
+        client = Client()
+        client.force_login(user)
+        cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+        endpoints = [(name, path.format(mission=mission.pk, asset=asset.pk)) for name, path in ENDPOINTS]
+
+        self.stdout.write(f'{"server":>6} {"endpoint":>18} {"requests/s":>10} {"p50 ms":>8} {"p99 ms":>8} {"errors":>7}')
+        for server in options['servers'].split(','):
+            if server not in SERVERS:
+                raise CommandError(f'Unknown server {server}, use one of {", ".join(SERVERS)}')
+            self.benchmark_server(server, endpoints, cookie, options)
@@ -0,0 +1,89 @@
+"""
+Benchmark requesting simplified asset tracks
+
+Compares simplifying the whole position history on every request
+against using the stored track segments, at several zoom levels, and
+reports how much space the segments take.
+
+All the data is created inside a transaction that is rolled back.
+"""
+
+from functools import partial
+import json
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from data.models import AssetPointTime, AssetTrackSegment
+from data.view_helpers import to_geojson_track
+
+from .benchmark_geojson import create_track
+
+
+class Command(BaseCommand):
+    """
+    Benchmark the stored track segments
+    """
+    help = 'Benchmark requesting simplified asset tracks with and without the stored track segments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', default='10000,50000', help='Comma separated list of track lengths')
+        parser.add_argument('--zoom', default='8,12,16', help='Comma separated list of map zoom levels')
+        parser.add_argument('--repeat', type=int, default=3, help='Number of times to request each track')
+
+    @staticmethod
+    def request_track(mission, asset, zoom, stored):
+        """
+        Request the track, returning the number of points in the simplified part
+        """
+        request = RequestFactory().get('/', {'zoom': zoom})
+        positions = AssetPointTime.objects.filter(mission=mission, asset=asset)
+        stored_track = partial(AssetTrackSegment.track, mission, asset) if stored else None
+        data = json.loads(b''.join(to_geojson_track(request, AssetPointTime, positions, oldest='last', stored_track=stored_track).streaming_content))
+        return len(data['track']['coordinates'])
+
+    @staticmethod
+    def time_request(request_track, repeat):
+        """
+        Return the best time (in ms), number of queries and number of points for a track request
+        """
+        best = None
+        with CaptureQueriesContext(connection) as queries:
+            points = request_track()
+        for _ in range(repeat):
+            start = perf_counter()
+            request_track()
+            elapsed = (perf_counter() - start) * 1000
+            if best is None or elapsed < best:
+                best = elapsed
+        return best, len(queries), points
+
+    def report_storage(self, mission, asset):
+        """
+        Report the number of segments and their size for each level
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_total_relation_size(%s)', [AssetPointTime._meta.db_table])
+            self.stdout.write(f'  positions table: {cursor.fetchone()[0]} bytes')
+        levels = AssetTrackSegment.objects.filter(mission=mission, asset=asset).values('level').annotate(segments=Count('pk'), positions=Sum('positions')).order_by('level')
+        for level in levels:
+            points = sum(len(segment.geo) for segment in AssetTrackSegment.objects.filter(mission=mission, asset=asset, level=level['level']))
+            self.stdout.write(f'  level {level["level"]}: {level["segments"]} segments, {level["positions"]} positions stored as {points} points ({points * 16} bytes of coordinates)')
+
+    def handle(self, *args, **options):
+        for points in [int(v) for v in options['points'].split(',')]:
+            with transaction.atomic():
+                mission, asset = create_track(points, wiggle=0.01)
+                AssetTrackSegment.update(mission.pk, asset.pk)
+                self.stdout.write(f'{points} positions')
+                self.report_storage(mission, asset)
+                self.stdout.write(f'{"zoom":>6} {"full ms":>10} {"full q":>7} {"stored ms":>10} {"stored q":>9} {"points":>8}')
+                for zoom in [int(v) for v in options['zoom'].split(',')]:
+                    full_time, full_queries, _ = self.time_request(partial(self.request_track, mission, asset, zoom, False), options['repeat'])
+                    stored_time, stored_queries, track_points = self.time_request(partial(self.request_track, mission, asset, zoom, True), options['repeat'])
+                    self.stdout.write(f'{zoom:>6} {full_time:>10.2f} {full_queries:>7} {stored_time:>10.2f} {stored_queries:>9} {track_points:>8}')
+                transaction.set_rollback(True)
@@ -0,0 +1,270 @@
+"""
+Generate a large synthetic mission, for benchmarking (see benchmark_endpoints)
+
+The mission has many assets and users, each with a long position history
+(a random walk), the labels (POIs, lines, polygons) users draw, searches
+in every state, images, marine drift vectors and the timeline.
+Everything is created with bulk_create, so there are no timeline entries or
+events for the individual objects, the current positions, track segments
+and change versions are then brought up to date.
+
+The random values come from --seed, so the same options always generate
+the same mission. Only run this against a development database, the mission
+(and its users/assets, all named after the mission) are kept.
+Images don't have any files, so only their metadata can be used.
+"""
+
+from datetime import timedelta
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import LineString, Point, Polygon
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from assets.models import Asset, AssetType
+from data.models import AssetPointTime, AssetTrackSegment, ChangeVersion, CurrentAssetPosition, CurrentUserPosition, GeoTimeLabel, UserPointTime
+from images.models import GeoImage
+from marinesar.models import MarineTotalDriftVector
+from mission.models import Mission, MissionAsset, MissionUser
+from search.models import Search
+from timeline.models import TimeLineEntry
+
+
+# Where the mission is (lon, lat), and how far (in degrees) things are spread from it
+CENTER = (172.5, -43.5)
+SPREAD = 0.5
+
+# How many objects to give to each bulk_create
+BATCH_SIZE = 5000
+
+SEARCH_TYPES = ('Sector', 'Expanding Box', 'Track Line', 'Shore Line', 'Creeping Line', 'Parallel Line')
+SEARCH_STATES = ('notstarted', 'queued', 'inprogress', 'completed', 'deleted')
+
+
+class MissionGenerator:
+    # pylint: disable=R0902
+    """
+    Create the objects in a synthetic mission
+    """
+    def __init__(self, name, seed, stdout):
+        self.name = name
+        self.random = random.Random(seed)
+        self.stdout = stdout
+        self.now = timezone.now()
+        self.creator = None
+        self.mission = None
+        self.users = []
+        self.assets = []
+        self.pois = []
+
+    def point(self, spread=SPREAD):
+        """
+        A random point in the mission area
+        """
+        return (CENTER[0] + self.random.uniform(-spread, spread), CENTER[1] + self.random.uniform(-spread, spread))
+
+    def bulk_create(self, model, objects):
+        """
+        Create objects (an iterable) in batches, returning the number created
+        """
+        count = 0
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= BATCH_SIZE:
+                model.objects.bulk_create(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            model.objects.bulk_create(batch)
+            count += len(batch)
+        return count
+
+    def create_mission(self, users, assets):
+        """
+        Create the mission, its users and assets
+        """
+        user_model = get_user_model()
+        if Mission.objects.filter(mission_name=self.name).exists():
+            raise CommandError(f'There is already a mission called {self.name}')
+        self.creator, _ = user_model.objects.get_or_create(username=f'{self.name}-admin')
+        self.mission = Mission.objects.create(mission_name=self.name, mission_description='Synthetic mission for benchmarking', creator=self.creator, started=self.now - timedelta(days=1))
+        MissionUser.objects.create(mission=self.mission, user=self.creator, creator=self.creator, role='A')
+
+        new_users = [user_model(username=f'{self.name}-user-{i}') for i in range(users)]
+        for user in new_users:
+            user.set_unusable_password()
+        self.users = user_model.objects.bulk_create(new_users)
+        MissionUser.objects.bulk_create([MissionUser(mission=self.mission, user=user, creator=self.creator) for user in self.users])
+
+        asset_types = [AssetType.objects.get_or_create(name=f'{self.name}-{kind}', defaults={'description': kind})[0] for kind in ('boat', 'aircraft', 'drone')]
+        self.assets = Asset.objects.bulk_create([Asset(name=f'{self.name}-asset-{i}', asset_type=asset_types[i % len(asset_types)], owner=self.creator) for i in range(assets)])
+        MissionAsset.objects.bulk_create([MissionAsset(mission=self.mission, asset=asset, creator=self.creator) for asset in self.assets])
+
+    def walk(self, positions, interval):
+        """
+        Generate a random walk of positions points, returning (time, lon, lat, heading)
+        """
+        lon, lat = self.point()
+        heading = self.random.randrange(360)
+        start = self.now - timedelta(seconds=positions * interval)
+        for i in range(positions):
+            heading = (heading + self.random.randint(-10, 10)) % 360
+            lon += 0.0002 * self.random.uniform(0.5, 1.5) * (1 if heading < 180 else -1)
+            lat += 0.0002 * self.random.uniform(-1, 1)
+            yield start + timedelta(seconds=i * interval), lon, lat, heading
+
+    def create_positions(self, asset_positions, user_positions):
+        """
+        Create the position history of every asset and user
+        """
+        count = 0
+        for asset in self.assets:
+            count += self.bulk_create(AssetPointTime, (
+                AssetPointTime(mission=self.mission, asset=asset, created_by=self.creator, created_at=time, geo=Point(lon, lat), alt=self.random.randint(0, 3000), heading=heading, fix=3)
+                for time, lon, lat, heading in self.walk(asset_positions, 5)))
+            if asset_positions:
+                CurrentAssetPosition.record(AssetPointTime.objects.filter(mission=self.mission, asset=asset).latest('created_at'))
+                AssetTrackSegment.update(self.mission.pk, asset.pk)
+        self.stdout.write(f'Created {count} asset positions')
+        count = 0
+        for user in self.users:
+            count += self.bulk_create(UserPointTime, (
+                UserPointTime(mission=self.mission, user=user, created_by=user, created_at=time, geo=Point(lon, lat))
+                for time, lon, lat, _ in self.walk(user_positions, 10)))
+            if user_positions:
+                CurrentUserPosition.record(UserPointTime.objects.filter(mission=self.mission, user=user).latest('created_at'))
+        self.stdout.write(f'Created {count} user positions')
+
+    def label(self, geo_type, geo, i):
+        """
+        A label (one in ten are deleted)
+        """
+        created_by = self.random.choice(self.users) if self.users else self.creator
+        deleted_at = self.now if i % 10 == 9 else None
+        return GeoTimeLabel(mission=self.mission, created_by=created_by, geo=geo, label=f'{geo_type} {i}', geo_type=geo_type, deleted_at=deleted_at, deleted_by=created_by if deleted_at else None)
+
+    def create_labels(self, pois, lines, polygons):
+        """
+        Create the POIs, lines and polygons
+        """
+        count = self.bulk_create(GeoTimeLabel, (self.label('poi', Point(*self.point()), i) for i in range(pois)))
+        count += self.bulk_create(GeoTimeLabel, (self.label('line', LineString([self.point() for _ in range(self.random.randint(2, 6))]), i) for i in range(lines)))
+        count += self.bulk_create(GeoTimeLabel, (self.label('polygon', self.box(), i) for i in range(polygons)))
+        self.pois = list(GeoTimeLabel.objects.filter(mission=self.mission, geo_type='poi', deleted_at__isnull=True)[:100])
+        self.stdout.write(f'Created {count} labels')
+
+    def box(self, size=0.01):
+        """
+        A small polygon in the mission area
+        """
+        lon, lat = self.point()
+        return Polygon.from_bbox((lon, lat, lon + size, lat + size))
+
+    def search(self, i):
+        """
+        A search, in one of the states (not started, queued, in progress, completed, deleted)
+        """
+        datum = self.pois[i % len(self.pois)]
+        state = SEARCH_STATES[i % len(SEARCH_STATES)]
+        asset = self.assets[i % len(self.assets)]
+        lon, lat = datum.geo.coords
+        points = [(lon + 0.002 * (leg % 2), lat + 0.001 * leg) for leg in range(self.random.randint(4, 20))]
+        search = Search(
+            mission=self.mission, created_by=self.creator, created_at=self.now - timedelta(minutes=i % 600), geo=LineString(points),
+            datum=datum, created_for=asset.asset_type, sweep_width=self.random.choice((100, 200, 500)), search_type=SEARCH_TYPES[i % len(SEARCH_TYPES)])
+        if state == 'queued':
+            search.queued_at = self.now
+            search.queued_for_asset = asset
+        if state in ('inprogress', 'completed'):
+            search.inprogress_at = self.now
+            search.inprogress_by = asset
+        if state == 'completed':
+            search.completed_at = self.now
+            search.completed_by = asset
+        if state == 'deleted':
+            search.deleted_at = self.now
+            search.deleted_by = self.creator
+        return search
+
+    def create_searches(self, searches):
+        """
+        Create the searches, spread between all the states
+        """
+        if searches and (not self.pois or not self.assets):
+            raise CommandError('Searches need at least one POI and asset')
+        self.stdout.write(f'Created {self.bulk_create(Search, (self.search(i) for i in range(searches)))} searches')
+
+    def create_images(self, images):
+        """
+        Create the images (without any files), one in ten is important
+        """
+        count = self.bulk_create(GeoImage, (
+            GeoImage(mission=self.mission, created_by=self.creator, geo=Point(*self.point()), description=f'Image {i}', original_format='jpg', priority=i % 10 == 0)
+            for i in range(images)))
+        self.stdout.write(f'Created {count} images')
+
+    def create_drift_vectors(self, drift_vectors):
+        """
+        Create the marine total drift vectors
+        """
+        if drift_vectors and not self.pois:
+            raise CommandError('Drift vectors need at least one POI')
+        count = self.bulk_create(MarineTotalDriftVector, (
+            MarineTotalDriftVector(
+                mission=self.mission, created_by=self.creator, datum=self.pois[i % len(self.pois)], leeway_multiplier=0.03, leeway_modifier=0.1,
+                geo=LineString([self.pois[i % len(self.pois)].geo.coords, self.point()]))
+            for i in range(drift_vectors)))
+        self.stdout.write(f'Created {count} drift vectors')
+
+    def create_timeline(self, entries):
+        """
+        Create the timeline entries
+        """
+        event_types = [event_type for event_type, _ in TimeLineEntry.EVENT_TYPE]
+        count = self.bulk_create(TimeLineEntry, (
+            TimeLineEntry(mission=self.mission, user=self.creator, timestamp=self.now - timedelta(seconds=entries - i), event_type=event_types[i % len(event_types)], message=f'Synthetic event {i}')
+            for i in range(entries)))
+        self.stdout.write(f'Created {count} timeline entries')
+
+    def record_changes(self):
+        """
+        Let anyone watching (i.e. cached layers) know the mission has changed
+        """
+        models = (AssetPointTime, UserPointTime, GeoTimeLabel, Search, GeoImage, MarineTotalDriftVector)
+        ChangeVersion.bump(ChangeVersion.ASSETS_KEY, *[model.version_key(self.mission.pk) for model in models], *[ChangeVersion.asset_key(asset.pk) for asset in self.assets])
+
+
+class Command(BaseCommand):
+    """
+    Generate a synthetic mission
+    """
+    help = 'Generate a large synthetic mission for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--name', default='synthetic', help='Name of the mission (and prefix for the users/assets)')
+        parser.add_argument('--seed', type=int, default=1, help='Seed for the random values')
+        parser.add_argument('--users', type=int, default=200, help='Number of users in the mission')
+        parser.add_argument('--assets', type=int, default=200, help='Number of assets in the mission')
+        parser.add_argument('--asset-positions', type=int, default=5000, help='Number of positions for each asset')
+        parser.add_argument('--user-positions', type=int, default=2500, help='Number of positions for each user')
+        parser.add_argument('--pois', type=int, default=2000, help='Number of POIs')
+        parser.add_argument('--lines', type=int, default=500, help='Number of user lines')
+        parser.add_argument('--polygons', type=int, default=500, help='Number of user polygons')
+        parser.add_argument('--searches', type=int, default=2000, help='Number of searches')
+        parser.add_argument('--images', type=int, default=200, help='Number of images')
+        parser.add_argument('--drift-vectors', type=int, default=50, help='Number of marine drift vectors')
+        parser.add_argument('--timeline', type=int, default=5000, help='Number of timeline entries')
+
+    def handle(self, *args, **options):
+        generator = MissionGenerator(options['name'], options['seed'], self.stdout)
+        generator.create_mission(options['users'], options['assets'])
+        generator.create_positions(options['asset_positions'], options['user_positions'])
+        generator.create_labels(options['pois'], options['lines'], options['polygons'])
+        generator.create_searches(options['searches'])
+        generator.create_images(options['images'])
+        generator.create_drift_vectors(options['drift_vectors'])
+        generator.create_timeline(options['timeline'])
+        generator.record_changes()
+        self.stdout.write(f'Created mission {generator.mission.pk} ({generator.mission.mission_name})')
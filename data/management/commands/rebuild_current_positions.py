@@ -0,0 +1,22 @@
+"""
+Rebuild the current asset/user positions from the position history
+
+The current positions are maintained as positions are recorded,
+this is for recovering if they ever disagree with the history.
+"""
+
+from django.core.management.base import BaseCommand
+
+from data.models import CurrentAssetPosition, CurrentUserPosition
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the current asset/user positions
+    """
+    help = 'Rebuild the current asset/user positions from the position history'
+
+    def handle(self, *args, **options):
+        assets = CurrentAssetPosition.rebuild()
+        users = CurrentUserPosition.rebuild()
+        self.stdout.write(f'Rebuilt {assets} current asset positions and {users} current user positions')
@@ -0,0 +1,22 @@
+"""
+Rebuild the simplified asset track segments from the position history
+
+The segments are maintained as positions are recorded, this is for
+recovering if they ever disagree with the history, or after changing
+the tolerances of the levels.
+"""
+
+from django.core.management.base import BaseCommand
+
+from data.models import AssetTrackSegment
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the asset track segments
+    """
+    help = 'Rebuild the simplified asset track segments from the position history'
+
+    def handle(self, *args, **options):
+        segments = AssetTrackSegment.rebuild()
+        self.stdout.write(f'Rebuilt {segments} asset track segments')
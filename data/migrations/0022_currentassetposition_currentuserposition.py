@@ -0,0 +1,55 @@
+# Generated by Django 5.1.2 on 2026-10-18 19:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def forward_func(apps, schema_editor):
+    for current_model, position_model, key in (('CurrentAssetPosition', 'AssetPointTime', 'asset'), ('CurrentUserPosition', 'UserPointTime', 'user')):
+        CurrentPosition = apps.get_model('data', current_model)
+        PointTime = apps.get_model('data', position_model)
+        latest = PointTime.objects.filter(mission__isnull=False).order_by('mission', key, '-created_at').distinct('mission', key)
+        CurrentPosition.objects.bulk_create(
+            [CurrentPosition(mission_id=mission, position_id=pk, created_at=created_at, **{f'{key}_id': key_id}) for pk, mission, key_id, created_at in latest.values_list('pk', 'mission_id', f'{key}_id', 'created_at')],
+            batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0008_remove_assetcommand_acknowledged_and_more'),
+        ('data', '0021_userpointtime'),
+        ('mission', '0006_missionassetstatusvalue_missionassetstatus'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CurrentAssetPosition',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='assets.asset')),
+                ('mission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mission.mission')),
+                ('position', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='current', to='data.assetpointtime')),
+            ],
+            options={
+                'unique_together': {('mission', 'asset')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CurrentUserPosition',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('mission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mission.mission')),
+                ('position', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='current', to='data.userpointtime')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='current_%(app_label)s_%(class)s_related', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('mission', 'user')},
+            },
+        ),
+        migrations.RunPython(forward_func, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.2 on 2026-10-18 20:13
+
+import django.contrib.gis.db.models.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0008_remove_assetcommand_acknowledged_and_more'),
+        ('data', '0022_currentassetposition_currentuserposition'),
+        ('mission', '0006_missionassetstatusvalue_missionassetstatus'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssetTrackSegment',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.IntegerField()),
+                ('start_at', models.DateTimeField()),
+                ('end_at', models.DateTimeField()),
+                ('positions', models.IntegerField()),
+                ('geo', django.contrib.gis.db.models.fields.LineStringField(geography=True, srid=4326)),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='assets.asset')),
+                ('mission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mission.mission')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['mission', 'asset', 'level', 'start_at'], name='data_assett_mission_2d8997_idx'), models.Index(fields=['mission', 'asset', 'end_at'], name='data_assett_mission_dfbd08_idx')],
+            },
+        ),
+    ]
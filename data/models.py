@@ -7,14 +7,88 @@ Mostly directly user created, but also some data
 that assets provide directly (i.e. position reports).
 """
 
+import hashlib
+
 from django.contrib.gis.db import models
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import F, FloatField, Func, Max, Q, OuterRef, Subquery
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.contrib.gis.db.models.functions import Length
+from django.contrib.gis.geos import LineString
+import numpy as np
 from assets.models import Asset
-from mission.models import Mission
+from mission.events import publish_event
+from mission.models import Mission, MissionAsset
 from timeline.helpers import timeline_record_create, timeline_record_delete, timeline_record_update
+from smm.cache_versions import cache_version_changed
+from .simplify import douglas_peucker
+
+
+def lon_lat(field):
+    '''
+    Expressions for the longitude and latitude of a point field, for use in values_list()
+    '''
+    return [Func(F(field), function=function, template='%(function)s(%(expressions)s::geometry)', output_field=FloatField()) for function in ('ST_X', 'ST_Y')]
+
+
+class ChangeVersion(models.Model):
+    """
+    A counter that is incremented every time something it covers changes
+
+    Views use these to answer conditional requests (If-None-Match) without
+    querying for (or serializing) data that hasn't changed, see data_conditional.
+    Most keys are per-mission, per-layer (see mission_key), the others cover
+    an asset (asset_key) or a whole table (ASSETS_KEY, ICONS_KEY).
+    """
+    key = models.CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    ASSETS_KEY = 'assets'
+    ICONS_KEY = 'icons'
+
+    @staticmethod
+    def mission_key(mission_id, layer):
+        """
+        The key for a layer (the label of a model, i.e. data.geotimelabel) in a mission
+        """
+        return f'mission-{mission_id}-{layer}'
+
+    @staticmethod
+    def asset_key(asset_id):
+        """
+        The key for the details of an asset (commands, status, mission, searches)
+        """
+        return f'asset-{asset_id}'
+
+    @classmethod
+    def bump(cls, *keys):
+        """
+        Increment the versions of keys
+
+        This should happen after the change has been saved, so the version is never
+        read before the data it covers.
+        """
+        keys = set(keys)
+        if not keys:
+            return
+        if cls.objects.filter(key__in=keys).update(version=F('version') + 1) < len(keys):
+            # Some of the keys don't have a version yet, increment them all again
+            # once they exist, so a concurrent create can't hide this change
+            cls.objects.bulk_create([cls(key=key) for key in keys], ignore_conflicts=True)
+            cls.objects.filter(key__in=keys).update(version=F('version') + 1)
+
+    @classmethod
+    def etag(cls, keys, *extra):
+        """
+        Create an etag from the current versions of keys, and anything else (extra) the response depends on
+        """
+        versions = dict(cls.objects.filter(key__in=keys).values_list('key', 'version'))
+        state = [(key, versions.get(key, 0)) for key in keys] + list(extra)
+        return hashlib.sha256(repr(state).encode()).hexdigest()[:32]
+
+    def __str__(self):
+        return f"{self.key} version {self.version}"
 
 
 class GeoTime(models.Model):
@@ -44,6 +118,9 @@ class GeoTime(models.Model):
 
     RECORD_TIMELINE = True
 
+    # The times that something happened to an object, see changed_since
+    CHANGE_FIELDS = ('created_at', 'deleted_at', 'replaced_at', )
+
     def length(self):
         """
         Calculate the total length (in m) of this line
@@ -51,15 +128,54 @@ class GeoTime(models.Model):
         annotated_self = self.__class__.objects.annotate(length=Length('geo')).get(pk=self.pk)
         return annotated_self.length.m
 
+    async def alength(self):
+        """
+        Async version of length
+        """
+        annotated_self = await self.__class__.objects.annotate(length=Length('geo')).aget(pk=self.pk)
+        return annotated_self.length.m
+
     @classmethod
-    def all_current(cls, mission, current_at=None):
+    def in_area(cls, objects, area=None):
+        '''
+        Limit objects to area (an AreaTimeFilter), if there is one
+        '''
+        if area is None:
+            return objects
+        return area.apply(objects, geofield=cls.GEOFIELD)
+
+    @classmethod
+    def all_in_mission(cls, mission, area=None):
+        '''
+        Find all the objects in the mission, including any that have been deleted/replaced
+
+        area (an AreaTimeFilter) limits the objects to a bbox and/or time window
+        '''
+        return cls.in_area(cls.objects.filter(mission=mission), area=area)
+
+    @classmethod
+    def all_in_user_missions(cls, user, current_only=False, area=None):
+        '''
+        Find all the objects in missions this user is a member of, including any that have been deleted/replaced
+
+        current_only if True, only consider missions that haven't ended yet
+        area (an AreaTimeFilter) limits the objects to a bbox and/or time window
+        '''
+        objects = cls.objects.filter(Mission.user_filter(user, field='mission'))
+        if current_only:
+            objects = objects.filter(mission__closed__isnull=True)
+        return cls.in_area(objects, area=area)
+
+    @classmethod
+    def all_current(cls, mission, current_at=None, area=None):
         '''
         Find all the objects that were valid at the current_at time.
 
         mission is the mission the objects are part of
         current_at being None means now, otherwise only objects that existed at the time will be returned
+        area (an AreaTimeFilter) limits the objects to a bbox and/or time window
         '''
-        objects = cls.objects.filter(mission=mission)
+        objects = cls.all_in_mission(mission, area=area)
         if current_at:
             # Filter out any deleted objects
             objects = objects.filter(Q(deleted_at__isnull=True) | Q(deleted_at__gt=current_at))
@@ -70,17 +186,15 @@ class GeoTime(models.Model):
         return objects
 
     @classmethod
-    def all_current_user(cls, user, current_at=None, current_only=False):
+    def all_current_user(cls, user, current_at=None, current_only=False, area=None):
         '''
         Find all the objects that were valid at the current_at time.
 
         user is the user who is a member of the missions the objects are part of
         current_at being None means now, otherwise only objects that existed at the time will be returned
+        area (an AreaTimeFilter) limits the objects to a bbox and/or time window
         '''
-        missions = Mission.all_user_missions(user)
-        objects = cls.objects.filter(mission__in=missions)
-        if current_only:
-            objects = objects.filter(mission__closed__isnull=True)
+        objects = cls.all_in_user_missions(user, current_only=current_only, area=area)
         if current_at:
             # Filter out any deleted objects
             objects = objects.filter(Q(deleted_at__isnull=True) | Q(deleted_at__gt=current_at))
@@ -90,6 +204,46 @@ class GeoTime(models.Model):
             objects = objects.filter(deleted_at__isnull=True).filter(replaced_at__isnull=True)
         return objects
 
+    @classmethod
+    def changed_since(cls, objects, since):
+        '''
+        Reduce objects to those that changed (i.e. were created, deleted, replaced) after since
+
+        The times that count as changes are listed in CHANGE_FIELDS
+        '''
+        changed = Q()
+        for field in cls.CHANGE_FIELDS:
+            changed |= Q(**{f'{field}__gt': since})
+        return objects.filter(changed)
+
+    @classmethod
+    def version_key(cls, mission_id):
+        '''
+        The ChangeVersion key for objects of this type in the mission
+        '''
+        return ChangeVersion.mission_key(mission_id, cls._meta.label_lower)
+
+    def version_keys(self):
+        '''
+        The ChangeVersion keys that cover this object
+        '''
+        if self.mission_id is None:
+            return []
+        return [self.version_key(self.mission_id)]
+
+    def record_change(self):
+        '''
+        Let anyone watching know this object has changed
+        '''
+        ChangeVersion.bump(*self.version_keys())
+
+    @classmethod
+    def record_changes(cls, objects):
+        '''
+        Let anyone watching know these objects have changed (i.e. after a bulk_create)
+        '''
+        ChangeVersion.bump(*[key for obj in objects for key in obj.version_keys()])
+
     # pylint: disable=W0221
     def save(self, *args, **kwargs):
         exists = False
@@ -103,6 +257,7 @@ class GeoTime(models.Model):
             pass
 
         super().save(*args, **kwargs)
+        self.record_change()
         if self.RECORD_TIMELINE:
             if exists:
                 if replaced:
@@ -119,6 +274,7 @@ class GeoTime(models.Model):
         '''
         self.refresh_from_db()
         if self.deleted_at == time:
+            self.record_change()
             timeline_record_delete(self.mission, self.deleted_by, self)
             return True
         return False
@@ -139,6 +295,7 @@ class GeoTime(models.Model):
         self.__class__.objects.filter(pk=self.pk, deleted_at__isnull=True, replaced_at__isnull=True).update(replaced_at=time, replaced_by=replaced_by)
         self.refresh_from_db()
         if self.replaced_at == time:
+            self.record_change()
             timeline_record_update(self.mission, self.replaced_by.created_by, self.replaced_by, self)
             return True
         return False
@@ -171,6 +328,59 @@ class AssetPointTime(GeoTime):
     def __str__(self):
         return f"{self.asset}: {self.geo} {self.created_at}"
 
+    # pylint: disable=W0221
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            CurrentAssetPosition.record(self)
+
+    def record_change(self):
+        '''
+        Let anyone watching know this position has changed, once the transaction commits (see PendingPositions)
+        '''
+        PendingPositions.add([self])
+
+    @classmethod
+    def publish_positions(cls, positions):
+        '''
+        Publish an event for each asset with new positions
+        '''
+        for mission_id, asset_id in {(position.mission_id, position.asset_id) for position in positions}:
+            publish_event(mission_id, 'position', model=cls._meta.label_lower, asset=asset_id)
+
+    @classmethod
+    def latest(cls, mission_assets):
+        '''
+        Find the most recent position of each asset in mission_assets (a MissionAsset queryset)
+
+        Each mission asset is resolved with a lookup on the (mission, asset, -created_at) index,
+        so the cost depends on the number of assets in the mission(s), rather than the number
+        of assets in the system or how much history they have. This is all a single query.
+        '''
+        newest = cls.objects.filter(mission=OuterRef('mission'), asset=OuterRef('asset')).order_by('-created_at').values('pk')[:1]
+        newest_ids = mission_assets.annotate(newest=Subquery(newest)).values('newest')
+        return cls.objects.filter(pk__in=newest_ids).order_by('asset', '-created_at').distinct('asset')
+
+    @classmethod
+    def latest_for_mission(cls, mission):
+        '''
+        Find the most recent position of each asset in the mission
+        '''
+        return cls.latest(MissionAsset.objects.filter(mission=mission))
+
+    @classmethod
+    def latest_for_user(cls, user, current_only=False):
+        '''
+        Find the most recent position of each asset in any mission the user is a member of
+        (either directly or via an organization)
+
+        current_only if True, only consider missions that haven't ended yet
+        '''
+        mission_assets = MissionAsset.objects.filter(Mission.user_filter(user, field='mission'))
+        if current_only:
+            mission_assets = mission_assets.filter(mission__closed__isnull=True)
+        return cls.latest(mission_assets)
+
     class Meta:
         indexes = [
             models.Index(fields=['mission', 'asset', '-created_at']),
@@ -178,6 +388,38 @@ class AssetPointTime(GeoTime):
         ]
 
 
+class PendingPositions:
+    """
+    Asset positions recorded in the current transaction
+
+    Updating the track segments, bumping the version and publishing the events are
+    done once for all the positions when the transaction commits, rather than for
+    each position as it is saved.
+    """
+    def __init__(self, positions):
+        self.positions = list(positions)
+
+    @classmethod
+    def add(cls, positions):
+        """
+        Update the track segments, versions and events for positions once the current transaction commits
+        """
+        connection = transaction.get_connection()
+        if connection.in_atomic_block:
+            for _, callback, _ in connection.run_on_commit:
+                if isinstance(callback, cls):
+                    callback.positions.extend(positions)
+                    return
+        transaction.on_commit(cls(positions))
+
+    def __call__(self):
+        positions, self.positions = self.positions, []
+        with transaction.atomic():
+            AssetTrackSegment.record_many(positions)
+            AssetPointTime.record_changes(positions)
+            AssetPointTime.publish_positions(positions)
+
+
 class UserPointTime(GeoTime):
     """
     Stores the position of a user at a specific time
@@ -194,6 +436,42 @@ class UserPointTime(GeoTime):
     def __str__(self):
         return f"{self.user} @ {self.geo} @ {self.created_at}"
 
+    # pylint: disable=W0221
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        CurrentUserPosition.record(self)
+        publish_event(self.mission_id, 'position', model=self._meta.label_lower, user=self.user_id)
+
+    @classmethod
+    def latest(cls, objects):
+        '''
+        Reduce objects to the most recent position of each user.
+
+        Uses DISTINCT ON so the database can walk the (mission, user, -created_at) index
+        and return everything in a single query.
+        '''
+        return objects.order_by('user', '-created_at').distinct('user')
+
+    @classmethod
+    def latest_for_mission(cls, mission):
+        '''
+        Find the most recent position of each user in the mission
+        '''
+        return cls.latest(cls.objects.filter(mission=mission))
+
+    @classmethod
+    def latest_for_user(cls, user, current_only=False):
+        '''
+        Find the most recent position of each user in any mission the user is a member of
+        (either directly or via an organization)
+
+        current_only if True, only consider missions that haven't ended yet
+        '''
+        objects = cls.objects.filter(Mission.user_filter(user, field='mission'))
+        if current_only:
+            objects = objects.filter(mission__closed__isnull=True)
+        return cls.latest(objects)
+
     class Meta:
         indexes = [
             models.Index(fields=['mission', 'user', '-created_at']),
@@ -201,6 +479,301 @@ class UserPointTime(GeoTime):
         ]
 
 
+class CurrentPosition(models.Model):
+    """
+    An abstract model for the most recent position of something in a mission.
+
+    These are maintained as positions are recorded, so finding the latest
+    positions doesn't require searching through the position history.
+    The position history is still the source of truth, see rebuild()
+    """
+    mission = models.ForeignKey(Mission, on_delete=models.CASCADE)
+    created_at = models.DateTimeField()
+
+    # The field (on both this and the position) this is the current position of
+    KEY_FIELD = None
+
+    @classmethod
+    def position_model(cls):
+        """
+        The model that stores the position history
+        """
+        return cls._meta.get_field('position').related_model
+
+    @classmethod
+    def record(cls, position):
+        """
+        Make position the current position, unless there is already a newer one
+        """
+        if position.mission_id is None:
+            return
+        key = {'mission_id': position.mission_id, f'{cls.KEY_FIELD}_id': getattr(position, f'{cls.KEY_FIELD}_id')}
+        newer = {'position': position, 'created_at': position.created_at}
+        if cls.objects.filter(created_at__lte=position.created_at, **key).update(**newer):
+            return
+        current, created = cls.objects.get_or_create(defaults=newer, **key)
+        if not created and current.created_at < position.created_at:
+            # Another request created an older current position between the update and get_or_create
+            cls.objects.filter(created_at__lte=position.created_at, **key).update(**newer)
+
+    @classmethod
+    def record_many(cls, positions):
+        """
+        Record the newest of positions for each mission and asset/user
+        """
+        newest = {}
+        for position in positions:
+            key = (position.mission_id, getattr(position, f'{cls.KEY_FIELD}_id'))
+            if key not in newest or newest[key].created_at < position.created_at:
+                newest[key] = position
+        for position in newest.values():
+            cls.record(position)
+
+    @classmethod
+    def rebuild(cls):
+        """
+        Replace all the current positions with the newest ones from the position history
+
+        Returns the number of current positions
+        """
+        key = f'{cls.KEY_FIELD}_id'
+        latest = cls.position_model().objects.filter(mission__isnull=False).order_by('mission', cls.KEY_FIELD, '-created_at').distinct('mission', cls.KEY_FIELD)
+        with transaction.atomic():
+            cls.objects.all().delete()
+            current = cls.objects.bulk_create(
+                [cls(mission_id=mission, position_id=pk, created_at=created_at, **{key: key_id}) for pk, mission, key_id, created_at in latest.values_list('pk', 'mission_id', key, 'created_at')],
+                batch_size=1000)
+        return len(current)
+
+    @classmethod
+    def positions_for_mission(cls, mission):
+        """
+        Get the current position of each asset/user in the mission
+        """
+        return cls.position_model().objects.filter(current__mission=mission).order_by(cls.KEY_FIELD)
+
+    @classmethod
+    def positions_for_user(cls, user, current_only=False):
+        """
+        Get the newest current position of each asset/user across all the missions the user is a member of
+
+        current_only if True, only consider missions that haven't ended yet
+        """
+        positions = cls.position_model().objects.filter(Mission.user_filter(user, field='current__mission'))
+        if current_only:
+            positions = positions.filter(current__mission__closed__isnull=True)
+        return positions.order_by(cls.KEY_FIELD, '-created_at').distinct(cls.KEY_FIELD)
+
+    class Meta:
+        abstract = True
+
+
+class CurrentAssetPosition(CurrentPosition):
+    """
+    The most recent position of an asset in a mission
+    """
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE)
+    position = models.OneToOneField(AssetPointTime, on_delete=models.CASCADE, related_name='current')
+
+    KEY_FIELD = 'asset'
+
+    def __str__(self):
+        return f"{self.asset} in {self.mission}: {self.position_id}"
+
+    class Meta:
+        unique_together = [['mission', 'asset']]
+
+
+class CurrentUserPosition(CurrentPosition):
+    """
+    The most recent position of a user in a mission
+    """
+    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name='current_%(app_label)s_%(class)s_related')
+    position = models.OneToOneField(UserPointTime, on_delete=models.CASCADE, related_name='current')
+
+    KEY_FIELD = 'user'
+
+    def __str__(self):
+        return f"{self.user} in {self.mission}: {self.position_id}"
+
+    class Meta:
+        unique_together = [['mission', 'user']]
+
+
+class AssetTrackSegment(models.Model):
+    """
+    A simplified section of the track of an asset in a mission
+
+    The segments form a pyramid: each level 0 segment is SEGMENT_POSITIONS
+    positions simplified to within TOLERANCES[0], each segment in the levels
+    above is SEGMENT_FANOUT segments from the level below simplified again.
+    Only complete segments are stored, the positions after the last segment
+    are simplified when the track is requested.
+
+    The segments are maintained as positions are recorded, the position
+    history is still the source of truth, see rebuild()
+    """
+    mission = models.ForeignKey(Mission, on_delete=models.CASCADE)
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE)
+    level = models.IntegerField()
+    start_at = models.DateTimeField()
+    end_at = models.DateTimeField()
+    positions = models.IntegerField()
+    geo = models.LineStringField(geography=True)
+
+    # The tolerance (in m) each level is simplified to
+    TOLERANCES = (5.0, 50.0, 500.0)
+    # Number of positions in each level 0 segment
+    SEGMENT_POSITIONS = 500
+    # Number of segments from the level below in each segment
+    SEGMENT_FANOUT = 10
+
+    def __str__(self):
+        return f"{self.asset} in {self.mission} level {self.level}: {self.start_at} - {self.end_at}"
+
+    @classmethod
+    def level_error(cls, level):
+        """
+        The furthest (in m) a position can be from the track at level
+        """
+        return sum(cls.TOLERANCES[:level + 1])
+
+    @classmethod
+    def level_for_tolerance(cls, tolerance):
+        """
+        Find the coarsest level that is within tolerance, None if no level is accurate enough
+        """
+        levels = [level for level in range(len(cls.TOLERANCES)) if cls.level_error(level) <= tolerance]
+        return levels[-1] if levels else None
+
+    @classmethod
+    def record(cls, position):
+        """
+        Update the segments for the mission/asset of a newly recorded position
+        """
+        if position.mission_id is None:
+            return
+        # Any segments that should have included this position need to be recreated
+        cls.objects.filter(mission_id=position.mission_id, asset_id=position.asset_id, end_at__gte=position.created_at).delete()
+        cls.update(position.mission_id, position.asset_id)
+
+    @classmethod
+    def record_many(cls, positions):
+        """
+        Update the segments for each mission/asset of newly recorded positions
+        """
+        oldest = {}
+        for position in positions:
+            key = (position.mission_id, position.asset_id)
+            if key not in oldest or oldest[key].created_at > position.created_at:
+                oldest[key] = position
+        for position in oldest.values():
+            cls.record(position)
+
+    @classmethod
+    def create_segment(cls, mission_id, asset_id, level, start_at, end_at, positions, coords):
+        # pylint: disable=R0913,R0917
+        """
+        Simplify coords and store them as a segment
+        """
+        coords = np.asarray(coords, dtype=float)
+        return cls.objects.create(mission_id=mission_id, asset_id=asset_id, level=level, start_at=start_at, end_at=end_at, positions=positions,
+                                  geo=LineString(coords[douglas_peucker(coords, cls.TOLERANCES[level])].tolist()))
+
+    @classmethod
+    def update_level_0(cls, mission_id, asset_id):
+        """
+        Create level 0 segments from the positions after the last one
+
+        Returns if any segments were created
+        """
+        positions = AssetPointTime.objects.filter(mission_id=mission_id, asset_id=asset_id)
+        last_end = cls.objects.filter(mission_id=mission_id, asset_id=asset_id, level=0).aggregate(Max('end_at'))['end_at__max']
+        if last_end is not None:
+            positions = positions.filter(created_at__gt=last_end)
+        positions = positions.order_by('created_at')
+        if not positions[cls.SEGMENT_POSITIONS - 1:cls.SEGMENT_POSITIONS].exists():
+            return False
+        rows = list(positions.values_list('created_at', *lon_lat('geo')))
+        for start in range(0, len(rows) - cls.SEGMENT_POSITIONS + 1, cls.SEGMENT_POSITIONS):
+            segment = rows[start:start + cls.SEGMENT_POSITIONS]
+            cls.create_segment(mission_id, asset_id, 0, segment[0][0], segment[-1][0], len(segment), [(lon, lat) for _, lon, lat in segment])
+        return True
+
+    @classmethod
+    def update_level(cls, mission_id, asset_id, level):
+        """
+        Create segments at level from the segments in the level below after the last one
+
+        Returns if any segments were created
+        """
+        segments = cls.objects.filter(mission_id=mission_id, asset_id=asset_id)
+        last_end = segments.filter(level=level).aggregate(Max('end_at'))['end_at__max']
+        lower = segments.filter(level=level - 1)
+        if last_end is not None:
+            lower = lower.filter(start_at__gt=last_end)
+        lower = list(lower.order_by('start_at'))
+        for start in range(0, len(lower) - cls.SEGMENT_FANOUT + 1, cls.SEGMENT_FANOUT):
+            group = lower[start:start + cls.SEGMENT_FANOUT]
+            cls.create_segment(mission_id, asset_id, level, group[0].start_at, group[-1].end_at, sum(segment.positions for segment in group),
+                               [coord for segment in group for coord in segment.geo.coords])
+        return len(lower) >= cls.SEGMENT_FANOUT
+
+    @classmethod
+    def update(cls, mission_id, asset_id):
+        """
+        Create any segments that are now complete for the mission/asset
+        """
+        if not cls.update_level_0(mission_id, asset_id):
+            return
+        for level in range(1, len(cls.TOLERANCES)):
+            if not cls.update_level(mission_id, asset_id, level):
+                return
+
+    @classmethod
+    def rebuild(cls):
+        """
+        Replace all the segments with ones created from the position history
+
+        Returns the number of segments
+        """
+        with transaction.atomic():
+            cls.objects.all().delete()
+            for mission_id, asset_id in AssetPointTime.objects.filter(mission__isnull=False).values_list('mission_id', 'asset_id').distinct():
+                cls.update(mission_id, asset_id)
+            return cls.objects.count()
+
+    @classmethod
+    def track(cls, mission, asset, tolerance, until):
+        """
+        Get the stored part of the track of asset in mission, up to (and including) until
+
+        Uses the coarsest level that is within tolerance, with the levels below filling in
+        after the last segment of each level.
+        Returns the coordinates, and the time they cover up to (None if there are no segments)
+        """
+        level = cls.level_for_tolerance(tolerance)
+        coords = []
+        covered = None
+        if level is None:
+            return coords, covered
+        segments = cls.objects.filter(mission=mission, asset=asset, end_at__lte=until)
+        for current in range(level, -1, -1):
+            level_segments = segments.filter(level=current)
+            if covered is not None:
+                level_segments = level_segments.filter(start_at__gt=covered)
+            for end_at, geo in level_segments.order_by('start_at').values_list('end_at', 'geo'):
+                coords.extend(geo.coords)
+                covered = end_at
+        return coords, covered
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['mission', 'asset', 'level', 'start_at']),
+            models.Index(fields=['mission', 'asset', 'end_at']),
+        ]
+
+
 class GeoTimeLabel(GeoTime):
     """
     This is a geometric object the user has defined.
@@ -229,6 +802,20 @@ class GeoTimeLabel(GeoTime):
         'label',
     )
 
+    def delete(self, user):
+        '''
+        Delete this object, and stop using anything cached for it (i.e. search previews)
+        '''
+        cache_version_changed('geotimelabel', self.pk)
+        return super().delete(user)
+
+    def replace(self, replaced_by):
+        '''
+        Replace this object with a new one, and stop using anything cached for it (i.e. search previews)
+        '''
+        cache_version_changed('geotimelabel', self.pk)
+        return super().replace(replaced_by)
+
     def human_type(self):
         '''
         Return the human-readable version of the name
@@ -239,19 +826,21 @@ class GeoTimeLabel(GeoTime):
         return None
 
     @classmethod
-    def all_current_of_geo(cls, mission, geo_type, current_at=None):
+    def all_current_of_geo(cls, mission, geo_type, current_at=None, area=None):
         '''
         Find all the objects of the given geo_type that were valid at the current_at time.
 
         mission is the mission the objects are part of
         geo_type needs to be one of GEO_TYPE
         current_at being None means now, otherwise only objects that existed at the time will be returned
+        area (an AreaTimeFilter) limits the objects to a bbox and/or time window
         '''
-        objects = cls.all_current(mission, current_at=current_at).filter(geo_type=geo_type)
+        objects = cls.all_current(mission, current_at=current_at, area=area).filter(geo_type=geo_type)
         return objects
 
     @classmethod
-    def all_current_of_geo_user(cls, user, geo_type, current_at=None, current_only=False):
+    # pylint: disable=R0913,R0917
+    def all_current_of_geo_user(cls, user, geo_type, current_at=None, current_only=False, area=None):
         '''
         Find all the objects of the given geo_type that were valid at the current_at time.
 
@@ -259,8 +848,9 @@ class GeoTimeLabel(GeoTime):
         geo_type needs to be one of GEO_TYPE
         current_at being None means now, otherwise only objects that existed at the time will be returned
         current_only if True, only consider missions that haven't ended yet
+        area (an AreaTimeFilter) limits the objects to a bbox and/or time window
         '''
-        objects = cls.all_current_user(user, current_at=current_at, current_only=current_only).filter(geo_type=geo_type)
+        objects = cls.all_current_user(user, current_at=current_at, current_only=current_only, area=area).filter(geo_type=geo_type)
         return objects
 
     def __str__(self):
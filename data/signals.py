@@ -0,0 +1,87 @@
+"""
+Keep the change versions (see ChangeVersion) of things that aren't GeoTime models up to date
+
+Asset commands are also published as mission/asset events here, as they aren't part of the timeline.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from assets.models import Asset, AssetCommand, AssetStatus
+from icons.models import Icon
+from mission.events import publish_asset_event, publish_event
+from mission.models import MissionAsset, MissionAssetStatus
+from organization.models import OrganizationAsset, OrganizationMember
+from .models import ChangeVersion
+
+
+@receiver(post_save, sender=Asset)
+@receiver(post_delete, sender=Asset)
+def asset_changed(sender, instance, **kwargs):
+    # pylint: disable=W0613
+    """
+    An asset has been created/updated
+    """
+    ChangeVersion.bump(ChangeVersion.ASSETS_KEY, ChangeVersion.asset_key(instance.pk))
+
+
+@receiver(post_save, sender=OrganizationAsset)
+@receiver(post_save, sender=OrganizationMember)
+def organization_changed(sender, instance, **kwargs):
+    # pylint: disable=W0613
+    """
+    An organization has gained/lost an asset or a member, which changes who can see the assets
+    """
+    ChangeVersion.bump(ChangeVersion.ASSETS_KEY)
+
+
+@receiver(post_save, sender=AssetCommand)
+def asset_command_changed(sender, instance, **kwargs):
+    # pylint: disable=W0613
+    """
+    An asset has been given a command, or responded to one
+    """
+    keys = [ChangeVersion.asset_key(instance.asset_id)]
+    if instance.mission_id is not None:
+        keys.append(ChangeVersion.mission_key(instance.mission_id, AssetCommand._meta.label_lower))
+    ChangeVersion.bump(*keys)
+    event = {'pk': instance.pk, 'asset': instance.asset_id, 'command': instance.command, 'responded': instance.responded_at is not None}
+    publish_event(instance.mission_id, 'asset_command', **event)
+    publish_asset_event(instance.asset_id, 'asset_command', **event)
+
+
+@receiver(post_save, sender=AssetStatus)
+def asset_status_changed(sender, instance, **kwargs):
+    # pylint: disable=W0613
+    """
+    The status of an asset has been set
+    """
+    ChangeVersion.bump(ChangeVersion.asset_key(instance.asset_id))
+
+
+@receiver(post_save, sender=MissionAsset)
+def mission_asset_changed(sender, instance, **kwargs):
+    # pylint: disable=W0613
+    """
+    An asset has been added to/removed from a mission
+    """
+    ChangeVersion.bump(ChangeVersion.asset_key(instance.asset_id), ChangeVersion.mission_key(instance.mission_id, MissionAsset._meta.label_lower))
+
+
+@receiver(post_save, sender=MissionAssetStatus)
+def mission_asset_status_changed(sender, instance, **kwargs):
+    # pylint: disable=W0613
+    """
+    The status of an asset in a mission has been set
+    """
+    ChangeVersion.bump(ChangeVersion.asset_key(instance.mission_asset.asset_id), ChangeVersion.mission_key(instance.mission_asset.mission_id, MissionAssetStatus._meta.label_lower))
+
+
+@receiver(post_save, sender=Icon)
+@receiver(post_delete, sender=Icon)
+def icon_changed(sender, instance, **kwargs):
+    # pylint: disable=W0613
+    """
+    An icon has been added/updated/removed
+    """
+    ChangeVersion.bump(ChangeVersion.ICONS_KEY)
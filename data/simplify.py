@@ -0,0 +1,86 @@
+"""
+Simplification of tracks (lines of lon/lat points)
+
+Tracks are projected onto a local plane (in metres) around their first
+point, which is accurate enough for the distances an asset covers in a
+mission, and then simplified with Douglas-Peucker.
+"""
+
+import math
+
+import numpy as np
+
+
+# Mean radius of the earth (in m)
+EARTH_RADIUS = 6371008.8
+
+# Size (in m) of a pixel at zoom level 0 on a web mercator map, at the equator
+ZOOM_0_PIXEL_SIZE = 156543.03392
+
+# Most detailed zoom level a tolerance can be requested for
+MAX_ZOOM = 30
+
+
+def zoom_tolerance(zoom):
+    """
+    The tolerance (in m) that makes the error less than a pixel at zoom
+
+    Raises ValueError if zoom isn't between 0 and MAX_ZOOM.
+    """
+    if not 0 <= zoom <= MAX_ZOOM:
+        raise ValueError("Invalid zoom level")
+    return ZOOM_0_PIXEL_SIZE / 2 ** zoom
+
+
+def project(coords):
+    """
+    Project an array of lon/lat points onto a local plane, in metres
+    """
+    coords = np.asarray(coords, dtype=float)
+    origin = coords[0]
+    scale = np.array([math.cos(math.radians(origin[1])), 1.0]) * math.radians(EARTH_RADIUS)
+    return (coords - origin) * scale
+
+
+def segment_distances(points, start, end):
+    """
+    Find the distance of each of points from the segment start -> end
+    """
+    segment = end - start
+    length_squared = np.dot(segment, segment)
+    if length_squared == 0:
+        return np.linalg.norm(points - start, axis=1)
+    position = np.clip(np.dot(points - start, segment) / length_squared, 0.0, 1.0)
+    return np.linalg.norm(points - (start + np.outer(position, segment)), axis=1)
+
+
+def douglas_peucker(coords, tolerance):
+    """
+    Simplify the track (a sequence of lon/lat points) with Douglas-Peucker
+
+    Returns a boolean array of the points to keep, every point that is
+    removed is within tolerance (in m) of the simplified track.
+    The first and last points are always kept.
+    """
+    count = len(coords)
+    keep = np.zeros(count, dtype=bool)
+    if count == 0:
+        return keep
+    keep[0] = keep[-1] = True
+    if count < 3:
+        return keep
+    points = project(coords)
+    # Iterate over sections with an explicit stack, rather than recursing
+    sections = [(0, count - 1)]
+    while sections:
+        first, last = sections.pop()
+        if last - first < 2:
+            continue
+        distances = segment_distances(points[first + 1:last], points[first], points[last])
+        furthest = int(np.argmax(distances))
+        if distances[furthest] > tolerance:
+            split = first + 1 + furthest
+            keep[split] = True
+            sections.append((first, split))
+            sections.append((split, last))
+    return keep
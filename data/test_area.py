@@ -0,0 +1,60 @@
+"""
+Tests for limiting objects to an area and time window
+"""
+
+import math
+
+from django.test import SimpleTestCase
+
+from .area import AREA_MAX_WIDTH, bbox_polygons, parse_bbox, parse_time
+
+
+class AreaTestCase(SimpleTestCase):
+    """
+    Test parsing and splitting of bounding boxes
+    """
+    def test_parse_bbox(self):
+        """
+        Check valid and invalid bboxes
+        """
+        self.assertEqual(parse_bbox('172,-44,173.5,-43'), (172.0, -44.0, 173.5, -43.0))
+        self.assertEqual(parse_bbox('170,-45,190,-40'), (170.0, -45.0, 190.0, -40.0))
+        for value in ('', '172,-44,173', '172,-44,173,-43,1', 'a,b,c,d', '173,-44,172,-43', '172,-43,173,-44', '172,-95,173,-43', 'nan,-44,173,-43'):
+            with self.assertRaises(ValueError):
+                parse_bbox(value)
+
+    def test_parse_time(self):
+        """
+        Times need a timezone
+        """
+        self.assertEqual(parse_time('2024-01-01T00:00:00+13:00', 'from').utcoffset().total_seconds(), 13 * 3600)
+        for value in ('2024-01-01T00:00:00', 'yesterday', '2024-13-01T00:00:00Z'):
+            with self.assertRaises(ValueError):
+                parse_time(value, 'from')
+
+    def test_polygons(self):
+        """
+        Check bboxes are split at the antimeridian, and into narrow enough polygons
+        """
+        polygons = bbox_polygons((172, -44, 173, -43))
+        self.assertEqual([polygon.extent for polygon in polygons], [(172, -44, 173, -43)])
+        self.assertEqual(polygons[0].srid, 4326)
+        for bbox in ((170, -45, 190, -40), (-190, -45, -170, -40)):
+            self.assertEqual([polygon.extent for polygon in bbox_polygons(bbox)], [(170, -45, 180, -40), (-180, -45, -170, -40)])
+        polygons = bbox_polygons((-200, -10, 300, 10))
+        self.assertEqual(polygons[0].extent[0], -180)
+        self.assertEqual(polygons[-1].extent[2], 180)
+        self.assertTrue(all(polygon.extent[2] - polygon.extent[0] <= AREA_MAX_WIDTH for polygon in polygons))
+
+    def test_polygon_edges(self):
+        """
+        Check the north and south edges of wide boxes stay close to the lines of latitude
+        (the great circle between two points on a line of latitude bows towards the pole)
+        """
+        for polygon in bbox_polygons((0, 45, 90, 60)) + bbox_polygons((-180, -80, 180, -1)):
+            ring = polygon[0]
+            for (lon_a, lat_a), (lon_b, lat_b) in zip(ring[:-1], ring[1:]):
+                if lat_a != lat_b:
+                    continue
+                bowed = math.degrees(math.atan(math.tan(math.radians(lat_a)) / math.cos(math.radians(lon_b - lon_a) / 2)))
+                self.assertLess(abs(bowed - lat_a), 0.0001)
@@ -0,0 +1,113 @@
+"""
+Tests for the streaming geojson serializer
+"""
+
+import json
+
+from django.contrib.gis.geos import LineString, Point, Polygon
+from django.core.serializers import serialize
+from django.utils import timezone
+import numpy as np
+
+from assets.models import Asset, AssetType
+from images.models import GeoImage
+from marinesar.models import MarineTotalDriftVector
+from smm.tests import response_json
+
+from .models import AssetPointTime, GeoTimeLabel, UserPointTime
+from .tests import UserDataTestCase
+from .view_helpers import to_geojson
+
+
+class GeoJSONStreamTestCase(UserDataTestCase):
+    """
+    Check the streamed geojson has the same features as the django geojson serializer
+    """
+    def assertSameFeatures(self, document, expected):  # pylint: disable=C0103
+        """
+        Compare two geojson documents, the coordinates only need to be the same to within 1e-9 degrees
+        """
+        document, expected = json.loads(document), json.loads(expected)
+        geometries = [feature.pop('geometry') for feature in document['features']]
+        expected_geometries = [feature.pop('geometry') for feature in expected['features']]
+        self.assertEqual(document, expected)
+        for geometry, expected_geometry in zip(geometries, expected_geometries, strict=True):
+            self.assertEqual(geometry['type'], expected_geometry['type'])
+            np.testing.assert_allclose(geometry['coordinates'], expected_geometry['coordinates'], rtol=0, atol=1e-9)
+
+    def assertMatchesSerializer(self, objecttype, objects, extra=None):  # pylint: disable=C0103
+        """
+        Compare the streamed document for objects against the django serializer
+        """
+        response = to_geojson(objecttype, objects, extra=extra)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/geo+json')
+        streamed = b''.join(response.streaming_content).decode('utf-8')
+        expected = to_geojson(objecttype, list(objects), extra=extra).content.decode('utf-8')
+        self.assertSameFeatures(streamed, expected)
+        self.assertEqual(
+            expected[:-2],
+            serialize('geojson', list(objects), geometry_field=objecttype.GEOFIELD, fields=objecttype.GEOJSON_FIELDS, use_natural_foreign_keys=True)[:-2])
+        return response_json(to_geojson(objecttype, objects, extra=extra))
+
+    def test_empty(self):
+        """
+        Check an empty queryset
+        """
+        data = self.assertMatchesSerializer(GeoTimeLabel, GeoTimeLabel.objects.none())
+        self.assertEqual(data['features'], [])
+
+    def test_geotimelabel(self):
+        """
+        Check points, lines and polygons, including replaced and deleted objects
+        """
+        poi = GeoTimeLabel.objects.create(geo=Point(172.5, -43.5), label='POI "quoted" ✈', geo_type='poi', mission=self.mission, created_by=self.user)
+        GeoTimeLabel.objects.create(geo=LineString((172.5, -43.5), (172.6, -43.6)), label='Line', geo_type='line', mission=self.mission, created_by=self.user)
+        GeoTimeLabel.objects.create(geo=Polygon(((172.5, -43.5), (172.6, -43.5), (172.6, -43.6), (172.5, -43.5))), label='Polygon', geo_type='polygon', mission=self.mission, created_by=self.user)
+        replacement = GeoTimeLabel.objects.create(geo=Point(172.123456789, -43.987654321), label='POI 2', geo_type='poi', mission=self.mission, created_by=self.user)
+        poi.replaced_by = replacement
+        poi.replaced_at = timezone.now()
+        poi.deleted_by = self.user
+        poi.deleted_at = timezone.now()
+        poi.save()
+        data = self.assertMatchesSerializer(GeoTimeLabel, GeoTimeLabel.objects.filter(mission=self.mission).order_by('pk'))
+        self.assertEqual(len(data['features']), 4)
+        self.assertEqual(data['features'][0]['properties']['created_by'], ['test'])
+        self.assertEqual(data['features'][0]['properties']['replaced_by'], replacement.pk)
+
+    def test_awkward_coordinates(self):
+        """
+        Check coordinates that can be written differently (long fractions, tiny values, the antimeridian) are the same numbers
+        """
+        GeoTimeLabel.objects.create(geo=Point(0.1, 1e-7), label='Tiny', geo_type='poi', mission=self.mission, created_by=self.user)
+        GeoTimeLabel.objects.create(geo=Point(-180, -89.999999999), label='Corner', geo_type='poi', mission=self.mission, created_by=self.user)
+        GeoTimeLabel.objects.create(geo=LineString((1 / 3, 2 / 3), (-179.9999999999, 1e-12)), label='Line', geo_type='line', mission=self.mission, created_by=self.user)
+        data = self.assertMatchesSerializer(GeoTimeLabel, GeoTimeLabel.objects.filter(mission=self.mission).order_by('pk'))
+        self.assertEqual(data['features'][1]['geometry']['coordinates'][0], -180)
+
+    def test_positions(self):
+        """
+        Check asset and user positions
+        """
+        asset_type = AssetType.objects.create(name='type', description='type')
+        asset = Asset.objects.create(name='asset', asset_type=asset_type, owner=self.user)
+        AssetPointTime.objects.create(asset=asset, mission=self.mission, created_by=self.user, geo=Point(172.5, -43.5), alt=100, heading=90, fix=3)
+        AssetPointTime.objects.create(asset=asset, mission=self.mission, created_by=self.user, geo=Point(172.6, -43.6))
+        UserPointTime.objects.create(user=self.user, mission=self.mission, created_by=self.user, geo=Point(172.5, -43.5), alt=10)
+        data = self.assertMatchesSerializer(AssetPointTime, AssetPointTime.objects.all().order_by('pk'))
+        self.assertEqual(data['features'][0]['properties']['asset'], asset.pk)
+        data = self.assertMatchesSerializer(UserPointTime, UserPointTime.objects.all().order_by('pk'))
+        self.assertEqual(data['features'][0]['properties']['user'], ['test'])
+
+    def test_pk_and_extra(self):
+        """
+        Check models that include the pk, and extra members of the collection
+        """
+        GeoImage.objects.create(geo=Point(172.5, -43.5), description='Image', original_format='png', mission=self.mission, created_by=self.user)
+        datum = GeoTimeLabel.objects.create(geo=Point(172.5, -43.5), label='Datum', geo_type='poi', mission=self.mission, created_by=self.user)
+        MarineTotalDriftVector.objects.create(geo=LineString((172.5, -43.5), (172.6, -43.6)), datum=datum, leeway_multiplier=0.5, leeway_modifier=1.0,
+                                              mission=self.mission, created_by=self.user)
+        data = self.assertMatchesSerializer(GeoImage, GeoImage.objects.all(), extra={'cursor': timezone.now(), 'removed': ['1']})
+        self.assertEqual(data['removed'], ['1'])
+        data = self.assertMatchesSerializer(MarineTotalDriftVector, MarineTotalDriftVector.objects.all())
+        self.assertEqual(data['features'][0]['properties']['datum'], datum.pk)
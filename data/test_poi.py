@@ -2,14 +2,20 @@
 Tests for the POIs (user created point/time/label)
 """
 
+from datetime import timedelta
+from xml.etree import ElementTree
+
 from django.test import Client
 from django.contrib.gis.geos import Point
+from django.utils import timezone
+
+from smm.tests import response_json, response_metrics, QueryBudgetMixin
 
 from .models import GeoTimeLabel
 from .tests import UserDataTestCase
 
 
-class POIsTestCase(UserDataTestCase):
+class POIsTestCase(QueryBudgetMixin, UserDataTestCase):
     """
     Test POIs
     """
@@ -335,14 +341,14 @@ class POIsTestCase(UserDataTestCase):
         # Response should be empty because no POIs have been created yet
         response = client.get(poi_list_url)
         self.assertEqual(response.status_code, 200)
-        data = response.json()
+        data = response_json(response)
         self.assertTrue('features' in data)
         self.assertEqual(len(data['features']), 0)
         # Create a POI and see it appear
         poi_1 = GeoTimeLabel.objects.create(geo=Point(172.5, -43.5), label='List API POI 1', mission=self.mission, created_by=self.user, geo_type='poi')
         response = client.get(poi_list_url)
         self.assertEqual(response.status_code, 200)
-        data = response.json()
+        data = response_json(response)
         self.assertTrue('features' in data)
         self.assertEqual(len(data['features']), 1)
         self.assertEqual(data['features'][0]['properties']['pk'], str(poi_1.pk))
@@ -352,7 +358,7 @@ class POIsTestCase(UserDataTestCase):
         self.assertEqual(response.status_code, 200)
         response = client.get(poi_list_url)
         self.assertEqual(response.status_code, 200)
-        data = response.json()
+        data = response_json(response)
         self.assertTrue('features' in data)
         self.assertEqual(len(data['features']), 1)
         self.assertNotEqual(data['features'][0]['properties']['pk'], str(poi_1.pk))
@@ -362,13 +368,158 @@ class POIsTestCase(UserDataTestCase):
         self.assertEqual(response.status_code, 200)
         response = client.get(poi_list_url)
         self.assertEqual(response.status_code, 200)
-        data = response.json()
+        data = response_json(response)
         self.assertTrue('features' in data)
         self.assertEqual(len(data['features']), 0)
         # Add an object of the wrong type and check it doesn't appear
         GeoTimeLabel.objects.create(geo=Point(172.5, -43.5), label='List API POI 10', mission=self.mission, created_by=self.user, geo_type='other')
         response = client.get(poi_list_url)
         self.assertEqual(response.status_code, 200)
-        data = response.json()
+        data = response_json(response)
         self.assertTrue('features' in data)
         self.assertEqual(len(data['features']), 0)
+
+    def test_api_list_query_budget(self):
+        """
+        Check the number of queries for listing POIs doesn't depend on the number of POIs
+        """
+        poi_list_url = f'/mission/{self.mission.pk}/data/pois/current/'
+        client = Client()
+        client.login(username='test', password='password')
+        GeoTimeLabel.objects.create(geo=Point(172.5, -43.5), label='Budget POI 0', mission=self.mission, created_by=self.user, geo_type='poi')
+        budget = response_metrics(client.get(poi_list_url))['queries']
+        for i in range(1, 5):
+            GeoTimeLabel.objects.create(geo=Point(172.5, -43.5 + i / 10), label=f'Budget POI {i}', mission=self.mission, created_by=self.user, geo_type='poi')
+        response = client.get(poi_list_url)
+        self.assertQueryBudget(response, budget)
+        self.assertEqual(len(response_json(response)['features']), 5)
+
+    def test_api_list_since(self):
+        """
+        Check the API for listing only the POIs that changed since the last request
+        """
+        poi_list_url = f'/mission/{self.mission.pk}/data/pois/current/'
+        client = Client()
+        client.login(username='test', password='password')
+        old = timezone.now() - timedelta(hours=1)
+        poi_1 = GeoTimeLabel.objects.create(geo=Point(172.5, -43.5), label='Since API POI 1', mission=self.mission, created_by=self.user, geo_type='poi', created_at=old)
+        poi_2 = GeoTimeLabel.objects.create(geo=Point(172.5, -43.5), label='Since API POI 2', mission=self.mission, created_by=self.user, geo_type='poi', created_at=old)
+        data = response_json(client.get(poi_list_url))
+        self.assertEqual(len(data['features']), 2)
+        self.assertTrue('cursor' in data)
+        cursor = data['cursor']
+        # Nothing has changed since the cursor
+        response = client.get(poi_list_url, {'since': cursor})
+        self.assertEqual(response.status_code, 200)
+        data = response_json(response)
+        self.assertEqual(len(data['features']), 0)
+        self.assertEqual(data['removed'], [])
+        # Move one POI and delete the other
+        response = client.post(f'/data/pois/{poi_1.pk}/replace/', {'lat': -44.5, 'lon': 171.5, 'label': 'Since API POI 3'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(poi_2.delete(self.user))
+        data = response_json(client.get(poi_list_url, {'since': cursor}))
+        self.assertEqual(len(data['features']), 1)
+        self.assertEqual(data['features'][0]['properties']['label'], 'Since API POI 3')
+        self.assertEqual(sorted(data['removed']), sorted([str(poi_1.pk), str(poi_2.pk)]))
+        # Lines that changed aren't part of the POIs
+        GeoTimeLabel.objects.create(geo=Point(172.5, -43.5), label='Since API Line', mission=self.mission, created_by=self.user, geo_type='line')
+        data = response_json(client.get(poi_list_url, {'since': cursor}))
+        self.assertEqual(len(data['features']), 1)
+        # Invalid cursors are rejected
+        self.assertEqual(client.get(poi_list_url, {'since': 'not a time'}).status_code, 400)
+        self.assertEqual(client.get(poi_list_url, {'since': '2024-01-01T00:00:00'}).status_code, 400)
+
+    def test_api_list_kml(self):
+        """
+        Check the list of current POIs as kml
+        """
+        poi_kml_url = f'/mission/{self.mission.pk}/data/pois/current/kml/'
+        GeoTimeLabel.objects.create(geo=Point(172.5, -43.5), label='KML POI ]]> 1', mission=self.mission, created_by=self.user, geo_type='poi')
+        GeoTimeLabel.objects.create(geo=Point(172.5, -43.5), label='KML Line', mission=self.mission, created_by=self.user, geo_type='line')
+        response = Client().get(poi_kml_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.google-earth.kml+xml')
+        document = ElementTree.fromstring(b''.join(response.streaming_content))
+        namespace = {'kml': 'http://www.opengis.net/kml/2.2'}
+        placemarks = document.findall('kml:Document/kml:Placemark', namespace)
+        self.assertEqual(len(placemarks), 1)
+        self.assertTrue(placemarks[0].find('kml:name', namespace).text.startswith('KML POI ]]> 1 poi near 172.5'))
+        self.assertEqual(placemarks[0].find('kml:Point/kml:coordinates', namespace).text, '172.5,-43.5')
+
+    def test_api_list_area(self):
+        """
+        Check the list of POIs can be limited to a bbox and time window
+        """
+        poi_list_url = f'/mission/{self.mission.pk}/data/pois/current/'
+        client = Client()
+        client.login(username='test', password='password')
+        old = timezone.now() - timedelta(hours=2)
+        GeoTimeLabel.objects.create(geo=Point(172.5, -43.5), label='Area POI Christchurch', mission=self.mission, created_by=self.user, geo_type='poi', created_at=old)
+        GeoTimeLabel.objects.create(geo=Point(174.8, -41.3), label='Area POI Wellington', mission=self.mission, created_by=self.user, geo_type='poi')
+        GeoTimeLabel.objects.create(geo=Point(-176.5, -44.0), label='Area POI Chathams', mission=self.mission, created_by=self.user, geo_type='poi')
+
+        def labels(params):
+            response = client.get(poi_list_url, params)
+            self.assertEqual(response.status_code, 200)
+            return sorted(feature['properties']['label'] for feature in response_json(response)['features'])
+
+        self.assertEqual(len(labels({})), 3)
+        self.assertEqual(labels({'bbox': '172,-44,173,-43'}), ['Area POI Christchurch'])
+        self.assertEqual(labels({'bbox': '170,-45,175,-40'}), ['Area POI Christchurch', 'Area POI Wellington'])
+        # Across the antimeridian, in both the leaflet (east > 180) and wrapped forms
+        self.assertEqual(labels({'bbox': '174,-45,184,-40'}), ['Area POI Chathams', 'Area POI Wellington'])
+        self.assertEqual(labels({'bbox': '-186,-45,-176,-40'}), ['Area POI Chathams', 'Area POI Wellington'])
+        # Time window
+        hour_ago = (timezone.now() - timedelta(hours=1)).isoformat()
+        self.assertEqual(labels({'from': hour_ago}), ['Area POI Chathams', 'Area POI Wellington'])
+        self.assertEqual(labels({'to': hour_ago}), ['Area POI Christchurch'])
+        self.assertEqual(labels({'bbox': '170,-45,175,-40', 'from': hour_ago}), ['Area POI Wellington'])
+        # Wide boxes include objects just inside the edge nearest the equator (great circles bow away from it)
+        GeoTimeLabel.objects.create(geo=Point(45, 45.2), label='Area POI Inside', mission=self.mission, created_by=self.user, geo_type='poi')
+        GeoTimeLabel.objects.create(geo=Point(45, 44.8), label='Area POI Outside', mission=self.mission, created_by=self.user, geo_type='poi')
+        self.assertEqual(labels({'bbox': '0,45,90,60'}), ['Area POI Inside'])
+        self.assertEqual(labels({'bbox': '0,-60,90,-45'}), [])
+        # Invalid parameters are rejected
+        self.assertEqual(client.get(poi_list_url, {'bbox': '172,-44,173'}).status_code, 400)
+        self.assertEqual(client.get(poi_list_url, {'bbox': '173,-44,172,-43'}).status_code, 400)
+        self.assertEqual(client.get(poi_list_url, {'from': '2024-01-01T00:00:00'}).status_code, 400)
+
+    def test_api_list_conditional(self):
+        """
+        Check the list of POIs is only sent again when it changes
+        """
+        poi_list_url = f'/mission/{self.mission.pk}/data/pois/current/'
+        client = Client()
+        client.login(username='test', password='password')
+        poi_1 = GeoTimeLabel.objects.create(geo=Point(172.5, -43.5), label='Conditional POI 1', mission=self.mission, created_by=self.user, geo_type='poi')
+        response = client.get(poi_list_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue('no-cache' in response['Cache-Control'])
+        etag = response['ETag']
+        cursor = response_json(response)['cursor']
+        self.assertEqual(client.get(poi_list_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Polling for changes has a different etag to the whole list
+        response = client.get(poi_list_url, {'since': cursor}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        cursor = response_json(response)['cursor']
+        self.assertEqual(client.get(poi_list_url, {'since': cursor}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Moving, creating and deleting POIs all change the etag
+        response = client.post(f'/data/pois/{poi_1.pk}/replace/', {'lat': -44.5, 'lon': 171.5, 'label': 'Conditional POI 2'})
+        self.assertEqual(response.status_code, 200)
+        response = client.get(poi_list_url, {'since': cursor}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response_json(response)['features']), 1)
+        etag = response['ETag']
+        poi_3 = GeoTimeLabel.objects.create(geo=Point(172.5, -43.5), label='Conditional POI 3', mission=self.mission, created_by=self.user, geo_type='poi')
+        response = client.get(poi_list_url, {'since': cursor}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(poi_3.delete(self.user))
+        response = client.get(poi_list_url, {'since': cursor}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(str(poi_3.pk) in response_json(response)['removed'])
+        # The etag depends on the other parameters
+        response = client.get(poi_list_url, {'since': cursor, 'bbox': '170,-45,175,-40'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,509 @@
+"""
+Tests for asset and user positions
+"""
+
+from datetime import timedelta
+from io import StringIO
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.gis.geos import Point
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from assets.tests import AssetsHelpers
+from mission.models import Mission, MissionUser, MissionAsset, MissionOrganization
+from organization.models import Organization, OrganizationMember
+from smm.tests import SMMTestUsers, response_json
+
+from .models import AssetPointTime, AssetTrackSegment, ChangeVersion, CurrentAssetPosition, CurrentUserPosition, UserPointTime
+
+
+class PositionsTestCase(TestCase):
+    """
+    Common setup for the position tests
+    """
+    def setUp(self):
+        """
+        Create the required objects
+        """
+        self.smm = SMMTestUsers()
+        self.assets = AssetsHelpers(self.smm)
+        self.asset_type = self.assets.create_asset_type()
+        self.mission = Mission.objects.create(creator=self.smm.user1, mission_name='positions')
+        MissionUser(mission=self.mission, user=self.smm.user1, role='A', creator=self.smm.user1).save()
+        self.now = timezone.now()
+
+    def add_asset(self, name, positions):
+        """
+        Create an asset in the mission, with a number of positions (newest first)
+        """
+        asset = self.assets.create_asset(name=name, asset_type=self.asset_type)
+        MissionAsset(mission=self.mission, asset=asset, creator=self.smm.user1).save()
+        for i in range(positions):
+            AssetPointTime.objects.create(asset=asset, mission=self.mission, created_by=self.smm.user1, geo=Point(172.5 + i, -43.5), created_at=self.now - timedelta(minutes=i))
+        return asset
+
+    def get_latest(self):
+        """
+        Get the latest asset positions for the mission
+        """
+        response = self.smm.client1.get(f'/mission/{self.mission.pk}/data/assets/positions/latest/')
+        self.assertEqual(response.status_code, 200)
+        return response_json(response)['features']
+
+
+class PositionsLatestTestCase(PositionsTestCase):
+    """
+    Test finding the latest positions of assets/users
+    """
+    def test_asset_latest(self):
+        """
+        Check only the newest position for each asset is returned
+        """
+        asset1 = self.add_asset('asset1', 5)
+        asset2 = self.add_asset('asset2', 3)
+        features = self.get_latest()
+        self.assertEqual(len(features), 2)
+        for feature in features:
+            self.assertIn(feature['properties']['asset'], (asset1.pk, asset2.pk))
+            self.assertEqual(feature['geometry']['coordinates'], [172.5, -43.5])
+
+    async def test_asset_latest_asgi(self):
+        """
+        Check the latest positions are the same when served by ASGI, where they are streamed with the async ORM
+        """
+        await sync_to_async(self.add_asset)('asset1', 3)
+        expected = await sync_to_async(self.get_latest)()
+        await self.async_client.aforce_login(self.smm.user1)
+        response = await self.async_client.get(f'/mission/{self.mission.pk}/data/assets/positions/latest/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(json.loads(content)['features'], expected)
+
+    def test_asset_latest_other_mission(self):
+        """
+        Check assets that are not part of the mission are not returned
+        """
+        self.add_asset('asset1', 2)
+        other_mission = Mission.objects.create(creator=self.smm.user1, mission_name='other')
+        other_asset = self.assets.create_asset(name='other', asset_type=self.asset_type)
+        MissionAsset(mission=other_mission, asset=other_asset, creator=self.smm.user1).save()
+        AssetPointTime.objects.create(asset=other_asset, mission=other_mission, created_by=self.smm.user1, geo=Point(170, -40))
+        features = self.get_latest()
+        self.assertEqual(len(features), 1)
+        self.assertEqual(AssetPointTime.latest_for_user(self.smm.user1).count(), 2)
+
+    def test_latest_organization_mission(self):
+        """
+        Check the positions in missions the user is a member of via an organization are returned
+        """
+        self.add_asset('asset1', 2)
+        other_mission = Mission.objects.create(creator=self.smm.user2, mission_name='other')
+        other_asset = self.assets.create_asset(name='other', asset_type=self.asset_type)
+        MissionAsset(mission=other_mission, asset=other_asset, creator=self.smm.user2).save()
+        AssetPointTime.objects.create(asset=other_asset, mission=other_mission, created_by=self.smm.user2, geo=Point(170, -40))
+        UserPointTime.objects.create(user=self.smm.user2, mission=other_mission, created_by=self.smm.user2, geo=Point(170, -40))
+        self.assertEqual(AssetPointTime.latest_for_user(self.smm.user1).count(), 1)
+        self.assertEqual(UserPointTime.latest_for_user(self.smm.user1).count(), 0)
+        organization = Organization.objects.create(name='org', creator=self.smm.user2)
+        OrganizationMember.objects.create(organization=organization, user=self.smm.user1, added_by=self.smm.user2)
+        MissionOrganization.objects.create(mission=other_mission, organization=organization, creator=self.smm.user2)
+        self.assertEqual(AssetPointTime.latest_for_user(self.smm.user1).count(), 2)
+        self.assertEqual(UserPointTime.latest_for_user(self.smm.user1).count(), 1)
+
+    def test_asset_latest_query_count(self):
+        """
+        Check the number of queries doesn't depend on the number of assets
+        """
+        self.add_asset('asset0', 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(list(AssetPointTime.latest_for_mission(self.mission))), 1)
+        for i in range(1, 10):
+            self.add_asset(f'asset{i}', 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(list(AssetPointTime.latest_for_mission(self.mission))), 10)
+
+    def test_user_latest(self):
+        """
+        Check only the newest position for each user is returned
+        """
+        for i in range(3):
+            UserPointTime.objects.create(user=self.smm.user1, mission=self.mission, created_by=self.smm.user1, geo=Point(172.5 + i, -43.5), created_at=self.now - timedelta(minutes=i))
+        UserPointTime.objects.create(user=self.smm.user2, mission=self.mission, created_by=self.smm.user2, geo=Point(171, -43), created_at=self.now)
+        response = self.smm.client1.get(f'/mission/{self.mission.pk}/data/users/positions/latest/')
+        self.assertEqual(response.status_code, 200)
+        features = response_json(response)['features']
+        self.assertEqual(len(features), 2)
+        for feature in features:
+            if feature['properties']['user'] == [self.smm.user1.username]:
+                self.assertEqual(feature['geometry']['coordinates'], [172.5, -43.5])
+            else:
+                self.assertEqual(feature['geometry']['coordinates'], [171, -43])
+
+
+class CurrentPositionTestCase(PositionsTestCase):
+    """
+    Test the current positions agree with the position history
+    """
+    def check_consistent(self):
+        """
+        Check the current positions match the newest positions in the history
+        """
+        self.assertEqual(
+            set(CurrentAssetPosition.positions_for_mission(self.mission).values_list('pk', flat=True)),
+            set(AssetPointTime.latest_for_mission(self.mission).values_list('pk', flat=True)))
+        self.assertEqual(
+            set(CurrentAssetPosition.positions_for_user(self.smm.user1).values_list('pk', flat=True)),
+            set(AssetPointTime.latest_for_user(self.smm.user1).values_list('pk', flat=True)))
+        self.assertEqual(
+            set(CurrentUserPosition.positions_for_mission(self.mission).values_list('pk', flat=True)),
+            set(UserPointTime.latest_for_mission(self.mission).values_list('pk', flat=True)))
+        self.assertEqual(
+            set(CurrentUserPosition.positions_for_user(self.smm.user1).values_list('pk', flat=True)),
+            set(UserPointTime.latest_for_user(self.smm.user1).values_list('pk', flat=True)))
+
+    def test_current_consistent(self):
+        """
+        Check the current positions are maintained as positions are added
+        """
+        self.add_asset('asset1', 5)
+        self.add_asset('asset2', 1)
+        for i in range(3):
+            UserPointTime.objects.create(user=self.smm.user1, mission=self.mission, created_by=self.smm.user1, geo=Point(172.5 + i, -43.5), created_at=self.now - timedelta(minutes=i))
+        self.assertEqual(CurrentAssetPosition.objects.count(), 2)
+        self.assertEqual(CurrentUserPosition.objects.count(), 1)
+        self.check_consistent()
+
+    def test_current_out_of_order(self):
+        """
+        Check an older position arriving late doesn't replace the current position
+        """
+        asset = self.add_asset('asset1', 1)
+        newest = AssetPointTime.objects.get(asset=asset)
+        AssetPointTime.objects.create(asset=asset, mission=self.mission, created_by=self.smm.user1, geo=Point(170, -40), created_at=self.now - timedelta(hours=1))
+        self.assertEqual(CurrentAssetPosition.objects.get(mission=self.mission, asset=asset).position, newest)
+        self.check_consistent()
+
+    def test_current_other_mission(self):
+        """
+        Check each mission has its own current position
+        """
+        asset = self.add_asset('asset1', 2)
+        other_mission = Mission.objects.create(creator=self.smm.user1, mission_name='other')
+        MissionUser(mission=other_mission, user=self.smm.user1, role='A', creator=self.smm.user1).save()
+        MissionAsset(mission=other_mission, asset=asset, creator=self.smm.user1).save()
+        newest = AssetPointTime.objects.create(asset=asset, mission=other_mission, created_by=self.smm.user1, geo=Point(170, -40), created_at=self.now + timedelta(minutes=1))
+        self.assertEqual(CurrentAssetPosition.objects.filter(asset=asset).count(), 2)
+        self.assertEqual(list(CurrentAssetPosition.positions_for_user(self.smm.user1)), [newest])
+        self.check_consistent()
+
+    def test_current_record_position(self):
+        """
+        Check recording a position via the api updates the latest positions
+        """
+        asset = self.add_asset('asset1', 2)
+        response = self.smm.client1.post(f'/data/assets/{asset.pk}/position/add/', {
+            'lat': -43,
+            'lon': 170,
+            'fix': 3,
+        })
+        self.assertEqual(response.status_code, 200)
+        features = self.get_latest()
+        self.assertEqual(len(features), 1)
+        self.assertEqual(features[0]['geometry']['coordinates'], [170, -43])
+        response = self.smm.client1.post(f'/mission/{self.mission.pk}/data/user/{self.smm.user1.username}/position/add/', {
+            'lat': -43.2,
+            'lon': 171,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(CurrentUserPosition.objects.get(mission=self.mission, user=self.smm.user1).position.geo.coords, (171, -43.2))
+        self.check_consistent()
+
+    def test_rebuild(self):
+        """
+        Check the current positions can be rebuilt from the history
+        """
+        self.add_asset('asset1', 3)
+        self.add_asset('asset2', 2)
+        UserPointTime.objects.create(user=self.smm.user2, mission=self.mission, created_by=self.smm.user2, geo=Point(171, -43), created_at=self.now)
+        expected = set(CurrentAssetPosition.objects.values_list('mission', 'asset', 'position', 'created_at'))
+        CurrentAssetPosition.objects.all().delete()
+        CurrentUserPosition.objects.all().delete()
+        call_command('rebuild_current_positions', stdout=StringIO())
+        self.assertEqual(set(CurrentAssetPosition.objects.values_list('mission', 'asset', 'position', 'created_at')), expected)
+        self.assertEqual(CurrentUserPosition.objects.count(), 1)
+        self.check_consistent()
+
+
+class BulkPositionsTestCase(PositionsTestCase):
+    """
+    Test recording batches of positions
+    """
+    def post_positions(self, positions, asset=None, client=None):
+        """
+        Post a batch of positions as json
+        """
+        if client is None:
+            client = self.smm.client1
+        url = f'/data/assets/{asset.pk}/positions/add/' if asset is not None else '/data/assets/positions/add/'
+        return client.post(url, json.dumps(positions), content_type='application/json')
+
+    def test_bulk_json(self):
+        """
+        Check a batch of positions for a single asset are recorded
+        """
+        asset = self.add_asset('asset1', 0)
+        response = self.post_positions([
+            {'lat': -43.5, 'lon': 172.5, 'fix': 3, 'time': (self.now - timedelta(minutes=2)).isoformat()},
+            {'lat': -43.4, 'lon': 172.4, 'alt': 100, 'heading': 90, 'time': self.now.isoformat()},
+            {'lat': 'bad', 'lon': 172.3},
+            {'lat': -43.3, 'lon': 172.3, 'time': 'yesterday'},
+            {'lat': -43.6, 'lon': 172.6, 'time': (self.now - timedelta(minutes=1)).timestamp()},
+        ], asset=asset)
+        self.assertEqual(response.status_code, 200)
+        json_data = response.json()
+        self.assertEqual([result['accepted'] for result in json_data['results']], [True, True, False, False, True])
+        self.assertEqual(json_data['results'][2]['reason'], 'Invalid lat/lon')
+        self.assertEqual(json_data['commands'], {str(asset.pk): {}})
+        self.assertEqual(AssetPointTime.objects.filter(asset=asset).count(), 3)
+        features = self.get_latest()
+        self.assertEqual(len(features), 1)
+        self.assertEqual(features[0]['geometry']['coordinates'], [172.4, -43.4])
+        self.assertEqual(features[0]['properties']['heading'], 90)
+
+    def test_bulk_csv(self):
+        """
+        Check a batch of positions for many assets are recorded, or rejected
+        """
+        asset1 = self.add_asset('asset1', 0)
+        asset2 = self.add_asset('asset2', 0)
+        other_owner = self.assets.create_asset(name='other', asset_type=self.asset_type, owner=self.smm.user2)
+        MissionAsset(mission=self.mission, asset=other_owner, creator=self.smm.user1).save()
+        not_in_mission = self.assets.create_asset(name='spare', asset_type=self.asset_type)
+        body = "asset,lat,lon,fix\n" + \
+            f"{asset1.pk},-43.5,172.5,3\n" + \
+            f"{asset2.pk},-43.4,172.4,3\n" + \
+            f"{other_owner.pk},-43.3,172.3,3\n" + \
+            f"{not_in_mission.pk},-43.2,172.2,3\n" + \
+            "0,-43.1,172.1,3\n" + \
+            "x,-43.1,172.1,3\n"
+        response = self.smm.client1.post('/data/assets/positions/add/', body, content_type='text/csv')
+        self.assertEqual(response.status_code, 200)
+        json_data = response.json()
+        self.assertEqual([result['accepted'] for result in json_data['results']], [True, True, False, False, False, False])
+        self.assertEqual(json_data['results'][2]['reason'], 'Not Authorized to record the position of this asset')
+        self.assertEqual(json_data['results'][3]['reason'], 'Asset is not in a mission')
+        self.assertEqual(json_data['results'][4]['reason'], 'Unknown asset')
+        self.assertEqual(set(json_data['commands'].keys()), {str(asset1.pk), str(asset2.pk)})
+        self.assertEqual(len(self.get_latest()), 2)
+
+    def test_bulk_invalid(self):
+        """
+        Check requests that can't be understood are rejected
+        """
+        asset = self.add_asset('asset1', 0)
+        url = f'/data/assets/{asset.pk}/positions/add/'
+        self.assertEqual(self.smm.client1.post(url, 'not json', content_type='application/json').status_code, 400)
+        self.assertEqual(self.smm.client1.post(url, json.dumps({'lat': 1}), content_type='application/json').status_code, 400)
+        self.assertEqual(self.smm.client1.get(url).status_code, 400)
+        self.assertEqual(self.post_positions([{'lat': -43, 'lon': 172}], asset=asset, client=self.smm.client2).status_code, 403)
+
+    def test_bulk_query_count(self):
+        """
+        Check the number of queries doesn't depend on the number of positions
+        """
+        asset = self.add_asset('asset1', 1)
+        with CaptureQueriesContext(connection) as single:
+            self.post_positions([{'lat': -43, 'lon': 172}], asset=asset)
+        with CaptureQueriesContext(connection) as many:
+            self.post_positions({'positions': [{'lat': -43, 'lon': 172 + i / 100} for i in range(50)]}, asset=asset)
+        self.assertEqual(len(single), len(many))
+        self.assertEqual(AssetPointTime.objects.filter(asset=asset).count(), 52)
+
+
+class TrackTestCase(PositionsTestCase):
+    """
+    Test getting (simplified) tracks
+    """
+    def get_track(self, asset, params=None):
+        """
+        Get the track for asset
+        """
+        response = self.smm.client1.get(f'/mission/{self.mission.pk}/data/assets/{asset.pk}/position/history/', params or {})
+        self.assertEqual(response.status_code, 200)
+        return response_json(response)
+
+    def test_track_full(self):
+        """
+        Check the full track is returned when no tolerance is requested
+        """
+        asset = self.add_asset('asset1', 20)
+        data = self.get_track(asset)
+        self.assertEqual(len(data['features']), 20)
+        self.assertNotIn('track', data)
+        data = self.get_track(asset, {'oldest': 'last'})
+        self.assertEqual(data['features'][-1]['geometry']['coordinates'], [172.5, -43.5])
+
+    def test_track_simplified(self):
+        """
+        Check the older positions are simplified, and the recent ones are not
+        """
+        asset = self.assets.create_asset(name='asset1', asset_type=self.asset_type)
+        MissionAsset(mission=self.mission, asset=asset, creator=self.smm.user1).save()
+        # A straight line, followed by a right angle
+        for i in range(30):
+            AssetPointTime.objects.create(asset=asset, mission=self.mission, created_by=self.smm.user1, geo=Point(172.5 + i * 0.001, -43.5),
+                                          created_at=self.now - timedelta(minutes=60 - i))
+        for i in range(1, 30):
+            AssetPointTime.objects.create(asset=asset, mission=self.mission, created_by=self.smm.user1, geo=Point(172.529, -43.5 + i * 0.001),
+                                          created_at=self.now - timedelta(minutes=30 - i))
+        data = self.get_track(asset, {'tolerance': 1, 'recent': 5, 'oldest': 'last'})
+        self.assertEqual(data['tolerance'], 1)
+        self.assertEqual(data['track']['type'], 'LineString')
+        self.assertEqual(len(data['track']['coordinates']), 3)
+        self.assertAlmostEqual(data['track']['coordinates'][1][0], 172.529)
+        self.assertAlmostEqual(data['track']['coordinates'][1][1], -43.5)
+        self.assertEqual(len(data['features']), 5)
+        self.assertAlmostEqual(data['features'][-1]['geometry']['coordinates'][1], -43.471)
+        # The zoom level can be used instead of a tolerance
+        data = self.get_track(asset, {'zoom': 18, 'recent': 5})
+        self.assertEqual(len(data['track']['coordinates']), 3)
+        self.assertEqual(len(data['features']), 5)
+
+    def test_track_short(self):
+        """
+        Check tracks with only recent positions aren't simplified
+        """
+        asset = self.add_asset('asset1', 5)
+        data = self.get_track(asset, {'zoom': 10})
+        self.assertIsNone(data['track'])
+        self.assertEqual(len(data['features']), 5)
+
+    def test_track_invalid(self):
+        """
+        Check invalid parameters are rejected
+        """
+        asset = self.add_asset('asset1', 5)
+        url = f'/mission/{self.mission.pk}/data/assets/{asset.pk}/position/history/'
+        for params in ({'tolerance': 'far'}, {'tolerance': -1}, {'zoom': 'in'}, {'zoom': 2000.0}, {'zoom': -1}, {'zoom': 10, 'recent': -1}):
+            self.assertEqual(self.smm.client1.get(url, params).status_code, 400)
+
+
+class TrackSegmentTestCase(PositionsTestCase):
+    """
+    Test maintaining the stored track segments
+    """
+    def setUp(self):
+        super().setUp()
+        self.asset = self.assets.create_asset(name='asset1', asset_type=self.asset_type)
+        MissionAsset(mission=self.mission, asset=self.asset, creator=self.smm.user1).save()
+
+    def bulk_positions(self, count, start=0):
+        """
+        Add count positions heading east (oldest first, one per second), without updating the segments
+        """
+        AssetPointTime.objects.bulk_create([
+            AssetPointTime(asset=self.asset, mission=self.mission, created_by=self.smm.user1, geo=Point(172.5 + i * 0.0001, -43.5),
+                           created_at=self.now + timedelta(seconds=i))
+            for i in range(start, start + count)])
+
+    def segments(self, level=0):
+        """
+        Get the segments at level, oldest first
+        """
+        return list(AssetTrackSegment.objects.filter(mission=self.mission, asset=self.asset, level=level).order_by('start_at'))
+
+    def test_segment_incremental(self):
+        """
+        Check a segment is created once there are enough positions
+        """
+        size = AssetTrackSegment.SEGMENT_POSITIONS
+        self.bulk_positions(size - 1)
+        AssetTrackSegment.update(self.mission.pk, self.asset.pk)
+        self.assertEqual(self.segments(), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            AssetPointTime.objects.create(asset=self.asset, mission=self.mission, created_by=self.smm.user1, geo=Point(172.5 + size * 0.0001, -43.5),
+                                          created_at=self.now + timedelta(seconds=size - 1))
+        segments = self.segments()
+        self.assertEqual(len(segments), 1)
+        self.assertEqual(segments[0].positions, size)
+        self.assertEqual(segments[0].start_at, self.now)
+        self.assertEqual(segments[0].end_at, self.now + timedelta(seconds=size - 1))
+        # A straight line only needs the end points
+        self.assertEqual(len(segments[0].geo), 2)
+
+    def test_segment_out_of_order(self):
+        """
+        Check segments are recreated when an older position arrives
+        """
+        size = AssetTrackSegment.SEGMENT_POSITIONS
+        self.bulk_positions(size, start=1)
+        AssetTrackSegment.update(self.mission.pk, self.asset.pk)
+        self.assertEqual(self.segments()[0].start_at, self.now + timedelta(seconds=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            AssetPointTime.objects.create(asset=self.asset, mission=self.mission, created_by=self.smm.user1, geo=Point(172.5, -43.5), created_at=self.now)
+        segments = self.segments()
+        self.assertEqual(len(segments), 1)
+        self.assertEqual(segments[0].start_at, self.now)
+        self.assertEqual(segments[0].end_at, self.now + timedelta(seconds=size - 1))
+
+    def test_segment_transaction(self):
+        """
+        Check the segments and version are updated once for all the positions saved in a transaction
+        """
+        size = AssetTrackSegment.SEGMENT_POSITIONS
+        self.bulk_positions(size - 5)
+        version_key = AssetPointTime.version_key(self.mission.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            for i in range(size - 5, size):
+                AssetPointTime.objects.create(asset=self.asset, mission=self.mission, created_by=self.smm.user1, geo=Point(172.5 + i * 0.0001, -43.5),
+                                              created_at=self.now + timedelta(seconds=i))
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self.segments(), [])
+        self.assertFalse(ChangeVersion.objects.filter(key=version_key).exists())
+        callbacks[0]()
+        self.assertEqual(len(self.segments()), 1)
+        self.assertEqual(ChangeVersion.objects.get(key=version_key).version, 1)
+
+    def test_segment_levels(self):
+        """
+        Check the segments are combined into the levels above, and can be rebuilt
+        """
+        size = AssetTrackSegment.SEGMENT_POSITIONS * AssetTrackSegment.SEGMENT_FANOUT
+        self.bulk_positions(size + 10)
+        AssetTrackSegment.update(self.mission.pk, self.asset.pk)
+        self.assertEqual(len(self.segments(0)), AssetTrackSegment.SEGMENT_FANOUT)
+        level_1 = self.segments(1)
+        self.assertEqual(len(level_1), 1)
+        self.assertEqual(level_1[0].positions, size)
+        self.assertEqual(level_1[0].end_at, self.segments(0)[-1].end_at)
+        self.assertEqual(self.segments(2), [])
+        out = StringIO()
+        call_command('rebuild_track_segments', stdout=out)
+        self.assertIn(f'Rebuilt {AssetTrackSegment.SEGMENT_FANOUT + 1} asset track segments', out.getvalue())
+
+    def test_segment_track(self):
+        """
+        Check the stored segments are used for the track
+        """
+        size = AssetTrackSegment.SEGMENT_POSITIONS * AssetTrackSegment.SEGMENT_FANOUT
+        self.bulk_positions(size + 200)
+        AssetTrackSegment.update(self.mission.pk, self.asset.pk)
+        url = f'/mission/{self.mission.pk}/data/assets/{self.asset.pk}/position/history/'
+        with CaptureQueriesContext(connection) as queries:
+            data = response_json(self.smm.client1.get(url, {'tolerance': 100, 'recent': 100}))
+        # The level 1 segment, then the positions after it (simplified on request)
+        self.assertEqual(len(data['track']['coordinates']), 4)
+        self.assertEqual(data['track']['coordinates'][0], [172.5, -43.5])
+        self.assertAlmostEqual(data['track']['coordinates'][1][0], 172.5 + (size - 1) * 0.0001)
+        self.assertAlmostEqual(data['track']['coordinates'][3][0], 172.5 + (size + 99) * 0.0001)
+        self.assertEqual(len(data['features']), 100)
+        self.assertLess(len(queries), 15)
+        # Only the positions since from are included, the segments aren't used
+        data = response_json(self.smm.client1.get(url, {'tolerance': 100, 'recent': 100, 'from': self.now.isoformat()}))
+        self.assertEqual(len(data['track']['coordinates']), 2)
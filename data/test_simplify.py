@@ -0,0 +1,90 @@
+"""
+Tests for track simplification
+"""
+
+import math
+
+from django.test import SimpleTestCase
+import numpy as np
+
+from .simplify import douglas_peucker, project, segment_distances, zoom_tolerance
+
+
+class SimplifyTestCase(SimpleTestCase):
+    """
+    Test Douglas-Peucker simplification of tracks
+    """
+    @staticmethod
+    def track(count):
+        """
+        A wiggly track heading east from Christchurch, one point every 10m or so
+        """
+        steps = np.arange(count)
+        return np.column_stack((172.5 + steps * 0.0001, -43.5 + 0.001 * np.sin(steps / 20.0) + 0.00005 * np.sin(steps)))
+
+    def max_error(self, coords, keep):
+        """
+        The furthest distance (in m) of any of the removed points from the simplified track
+        """
+        points = project(coords)
+        kept = np.flatnonzero(keep)
+        self.assertEqual(kept[0], 0)
+        self.assertEqual(kept[-1], len(coords) - 1)
+        error = 0.0
+        for first, last in zip(kept[:-1], kept[1:]):
+            if last - first > 1:
+                error = max(error, float(np.max(segment_distances(points[first + 1:last], points[first], points[last]))))
+        return error
+
+    def test_short(self):
+        """
+        Check tracks too short to simplify are unchanged
+        """
+        self.assertEqual(douglas_peucker([], 10).tolist(), [])
+        self.assertEqual(douglas_peucker([(172.5, -43.5)], 10).tolist(), [True])
+        self.assertEqual(douglas_peucker([(172.5, -43.5), (172.6, -43.5)], 10).tolist(), [True, True])
+
+    def test_straight(self):
+        """
+        Check a straight line is reduced to the end points
+        """
+        coords = [(172.5 + i * 0.001, -43.5) for i in range(100)]
+        self.assertEqual(np.flatnonzero(douglas_peucker(coords, 1)).tolist(), [0, 99])
+
+    def test_bounded_error(self):
+        """
+        Check every removed point is within tolerance of the simplified track
+        """
+        coords = self.track(20000)
+        for tolerance in (0.5, 5, 50, 500):
+            keep = douglas_peucker(coords, tolerance)
+            self.assertLessEqual(self.max_error(coords, keep), tolerance)
+            self.assertLess(keep.sum(), len(coords))
+        # A zero tolerance only removes points exactly on the track
+        keep = douglas_peucker(coords, 0)
+        self.assertEqual(self.max_error(coords, keep), 0)
+
+    def test_stationary(self):
+        """
+        Check a stationary asset is reduced to the end points
+        """
+        coords = [(172.5, -43.5)] * 50
+        self.assertEqual(np.flatnonzero(douglas_peucker(coords, 1)).tolist(), [0, 49])
+
+    def test_projection(self):
+        """
+        Check the local projection is close to the real distances
+        """
+        points = project([(172.5, -43.5), (172.5, -43.4), (172.6, -43.5)])
+        self.assertAlmostEqual(points[1][1], 11119.5, delta=1)
+        self.assertAlmostEqual(points[2][0], 11119.5 * math.cos(math.radians(43.5)), delta=1)
+
+    def test_zoom_tolerance(self):
+        """
+        Check the tolerance halves with each zoom level
+        """
+        self.assertAlmostEqual(zoom_tolerance(0), 156543.03392)
+        self.assertAlmostEqual(zoom_tolerance(10) * 2, zoom_tolerance(9))
+        for zoom in (-1, 31, 2000.0, math.inf, math.nan):
+            with self.assertRaises(ValueError):
+                zoom_tolerance(zoom)
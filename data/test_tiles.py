@@ -0,0 +1,109 @@
+"""
+Tests for the vector tiles
+"""
+
+import math
+
+from django.contrib.gis.geos import LineString, Point
+from django.test import SimpleTestCase, TestCase
+
+from smm.tests import SMMTestUsers
+from mission.models import Mission, MissionUser
+
+from .models import GeoTimeLabel
+from .tiles import WEB_MERCATOR_EXTENT, tile_bounds, tile_valid
+
+
+def tile_for(lon, lat, z):
+    """
+    Find the x/y of the tile at zoom z that contains lon/lat
+    """
+    lat = math.radians(lat)
+    scale = 2 ** z
+    return int((lon + 180) / 360 * scale), int((1 - math.asinh(math.tan(lat)) / math.pi) / 2 * scale)
+
+
+class TileBoundsTestCase(SimpleTestCase):
+    """
+    Test finding the bounds of tiles
+    """
+    def test_world(self):
+        """
+        Check the single zoom 0 tile is the whole world
+        """
+        self.assertEqual(tile_bounds(0, 0, 0), (-WEB_MERCATOR_EXTENT, -WEB_MERCATOR_EXTENT, WEB_MERCATOR_EXTENT, WEB_MERCATOR_EXTENT))
+
+    def test_quadrants(self):
+        """
+        Check the tiles are numbered from the top left
+        """
+        self.assertEqual(tile_bounds(1, 0, 0), (-WEB_MERCATOR_EXTENT, 0, 0, WEB_MERCATOR_EXTENT))
+        self.assertEqual(tile_bounds(1, 1, 1), (0, -WEB_MERCATOR_EXTENT, WEB_MERCATOR_EXTENT, 0))
+
+    def test_valid(self):
+        """
+        Check tiles outside the world are rejected
+        """
+        self.assertTrue(tile_valid(0, 0, 0))
+        self.assertTrue(tile_valid(10, 1023, 1023))
+        self.assertFalse(tile_valid(10, 1024, 0))
+        self.assertFalse(tile_valid(10, 0, 1024))
+        self.assertFalse(tile_valid(30, 0, 0))
+
+
+class TileTestCase(TestCase):
+    """
+    Test getting vector tiles of mission data
+    """
+    def setUp(self):
+        self.smm = SMMTestUsers()
+        self.mission = Mission.objects.create(creator=self.smm.user1, mission_name='tiles')
+        MissionUser(mission=self.mission, user=self.smm.user1, role='A', creator=self.smm.user1).save()
+
+    def get_tile(self, layer, z, x, y, client=None):
+        # pylint: disable=R0913,R0917
+        """
+        Get a tile from layer
+        """
+        return (client or self.smm.client1).get(f'/mission/{self.mission.pk}/tiles/{layer}/{z}/{x}/{y}.mvt')
+
+    def test_tile_pois(self):
+        """
+        Check only current POIs in the tile are included
+        """
+        GeoTimeLabel.objects.create(geo=Point(172.5, -43.5), label='Tile POI', geo_type='poi', mission=self.mission, created_by=self.smm.user1)
+        deleted = GeoTimeLabel.objects.create(geo=Point(172.5, -43.5), label='Deleted POI', geo_type='poi', mission=self.mission, created_by=self.smm.user1)
+        deleted.delete(self.smm.user1)
+        GeoTimeLabel.objects.create(geo=LineString((172.5, -43.5), (172.6, -43.6)), label='Tile Line', geo_type='line', mission=self.mission, created_by=self.smm.user1)
+        x, y = tile_for(172.5, -43.5, 10)
+        response = self.get_tile('pois', 10, x, y)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        self.assertIn(b'pois', response.content)
+        self.assertIn(b'Tile POI', response.content)
+        self.assertNotIn(b'Deleted POI', response.content)
+        self.assertNotIn(b'Tile Line', response.content)
+        # The whole world
+        self.assertIn(b'Tile POI', self.get_tile('pois', 0, 0, 0).content)
+        # The other side of the world
+        x, y = tile_for(-7.5, 43.5, 10)
+        response = self.get_tile('pois', 10, x, y)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+
+    def test_tile_lines(self):
+        """
+        Check lines are included in the tiles they cross
+        """
+        GeoTimeLabel.objects.create(geo=LineString((172.5, -43.5), (172.6, -43.6)), label='Tile Line', geo_type='line', mission=self.mission, created_by=self.smm.user1)
+        for lon, lat in ((172.5, -43.5), (172.6, -43.6)):
+            x, y = tile_for(lon, lat, 14)
+            self.assertIn(b'Tile Line', self.get_tile('userlines', 14, x, y).content)
+
+    def test_tile_invalid(self):
+        """
+        Check tiles that don't exist, and non-members are rejected
+        """
+        self.assertEqual(self.get_tile('pois', 1, 2, 0).status_code, 404)
+        self.assertEqual(self.get_tile('unknown', 0, 0, 0).status_code, 404)
+        self.assertEqual(self.get_tile('pois', 0, 0, 0, client=self.smm.client2).status_code, 404)
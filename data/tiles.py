@@ -0,0 +1,98 @@
+"""
+Mapbox Vector Tiles for GeoTime models
+
+The tiles are generated by PostGIS (ST_AsMVT), from the same querysets
+that are used for the geojson layers, so they have the same filtering.
+The properties of the features are the same as the geojson properties.
+"""
+
+from django.contrib.gis.db.models import GeometryField
+from django.db import connection
+from django.db.models import BooleanField, F, Func
+from django.db.models.expressions import RawSQL
+
+from .geojson import geojson_properties
+
+
+# Size of the web mercator world (in m), from the origin to the edge
+WEB_MERCATOR_EXTENT = 20037508.342789244
+
+# Resolution of the tile coordinates
+TILE_EXTENT = 4096
+
+# Size of the buffer around each tile (in tile coordinates), so lines/polygons
+# that cross the edge of the tile are drawn correctly
+TILE_BUFFER = 64
+
+# Most detailed zoom level tiles are available for
+TILE_MAX_ZOOM = 24
+
+
+def tile_valid(z, x, y):
+    """
+    Check z/x/y is a tile that exists
+    """
+    return 0 <= z <= TILE_MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def tile_bounds(z, x, y):
+    """
+    Find the bounds (xmin, ymin, xmax, ymax) of a tile, in web mercator (EPSG:3857)
+    """
+    size = 2 * WEB_MERCATOR_EXTENT / 2 ** z
+    xmin = -WEB_MERCATOR_EXTENT + x * size
+    ymax = WEB_MERCATOR_EXTENT - y * size
+    return (xmin, ymax - size, xmin + size, ymax)
+
+
+def tile_filter(objecttype, objects, bounds):
+    """
+    Only include the objects that are (or could be) inside bounds
+
+    This compares the bounding boxes of the geography and the tile (in lon/lat),
+    so the spatial index is used. The whole world is too large to be a geography,
+    so very low zoom tiles aren't filtered.
+    """
+    if bounds[2] - bounds[0] > WEB_MERCATOR_EXTENT:
+        return objects
+    column = f'{connection.ops.quote_name(objecttype._meta.db_table)}.{connection.ops.quote_name(objecttype._meta.get_field(objecttype.GEOFIELD).column)}'
+    return objects.filter(RawSQL(f'{column} && ST_Transform(ST_MakeEnvelope(%s, %s, %s, %s, 3857), 4326)::geography', bounds, output_field=BooleanField()))
+
+
+def tile_rows(objecttype, objects, bounds):
+    """
+    Build the query for the rows of a tile
+
+    Returns the sql/params of the query and the select list that names the columns as the properties
+    """
+    margin = (bounds[2] - bounds[0]) * TILE_BUFFER / TILE_EXTENT
+    search_bounds = (bounds[0] - margin, max(bounds[1] - margin, -WEB_MERCATOR_EXTENT), bounds[2] + margin, min(bounds[3] + margin, WEB_MERCATOR_EXTENT))
+    properties = geojson_properties(objecttype, objecttype.GEOJSON_FIELDS)
+    columns = {f'mvt_{index}': F(lookup) for index, (_, lookup, _) in enumerate(properties)}
+    rows = tile_filter(objecttype, objects, search_bounds).order_by().annotate(
+        mvt_id=F('pk'),
+        mvt_geom=Func(F(objecttype.GEOFIELD), template='ST_Transform(%(expressions)s::geometry, 3857)', output_field=GeometryField(srid=3857)),
+        **columns).values('mvt_id', 'mvt_geom', *columns)
+    sql, params = rows.query.sql_with_params()
+    select = ''.join(f', objects.{column} AS {connection.ops.quote_name(name)}' for column, (name, _, _) in zip(columns, properties))
+    return sql, params, select
+
+
+def mvt_tile(objecttype, objects, layer, z, x, y):
+    # pylint: disable=R0913,R0917
+    """
+    Generate the tile z/x/y for the objects (a queryset of objecttype), as a layer called layer
+
+    Returns the tile as bytes, which will be empty when there are no objects in the tile.
+    """
+    bounds = tile_bounds(z, x, y)
+    sql, params, select = tile_rows(objecttype, objects, bounds)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT ST_AsMVT(tile, %s, %s, 'geom', 'id') FROM ("
+            f"SELECT objects.mvt_id AS id{select}, ST_AsMVTGeom(objects.mvt_geom, ST_MakeEnvelope(%s, %s, %s, %s, 3857), %s, %s, true) AS geom "
+            f"FROM ({sql}) AS objects"
+            ") AS tile WHERE tile.geom IS NOT NULL",
+            [layer, TILE_EXTENT, *bounds, TILE_EXTENT, TILE_BUFFER, *params])
+        tile = cursor.fetchone()[0]
+    return bytes(tile) if tile is not None else b''
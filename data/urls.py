@@ -10,6 +10,8 @@ from . import views
 urlpatterns = [
     re_path(r'^mission/(?P<mission_id>\d+)/data/assets/positions/latest/$', views.assets_position_latest, name='assets_position_latest'),
     re_path(r'^data/assets/(?P<asset_id>\d+)/position/add/$', views.asset_record_position, name='asset_record_position'),
+    re_path(r'^data/assets/(?P<asset_id>\d+)/positions/add/$', views.asset_record_positions, name='asset_record_positions'),
+    re_path(r'^data/assets/positions/add/$', views.assets_record_positions, name='assets_record_positions'),
     re_path(r'^mission/(?P<mission_id>\d+)/data/assets/(?P<asset_id>\d+)/position/history/$', views.asset_position_history_mission, name='asset_position_history'),
 
     re_path(r'^mission/(?P<mission_id>\d+)/data/users/positions/latest/$', views.users_position_latest, name='users_position_latest'),
@@ -17,14 +19,17 @@ urlpatterns = [
     re_path(r'^mission/(?P<mission_id>\d+)/data/user/(?P<user>.*)/position/history/$', views.user_position_history_mission, name='user_position_history'),
 
     re_path(r'^mission/(?P<mission_id>\d+)/data/pois/current/$', views.data_all_specific_mission_type, {'geo_type': 'poi'}),
+    re_path(r'^mission/(?P<mission_id>\d+)/tiles/pois/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.mvt$', views.data_tile_specific_mission_type, {'geo_type': 'poi', 'layer': 'pois'}),
     re_path(r'^mission/(?P<mission_id>\d+)/data/pois/current/kml/$', views.point_labels_all_kml, name='point_labels_all_kml'),
     re_path(r'^mission/(?P<mission_id>\d+)/data/pois/create/$', views.point_label_create, name='point_label_create'),
     re_path(r'^data/pois/(?P<geo_id>\d+)/replace/$', views.point_label_replace, {'geo_type': 'poi'}, name='point_label_replace'),
     re_path(r'^mission/(?P<mission_id>\d+)/data/userpolygons/current/$', views.data_all_specific_mission_type, {'geo_type': 'polygon'}),
+    re_path(r'^mission/(?P<mission_id>\d+)/tiles/userpolygons/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.mvt$', views.data_tile_specific_mission_type, {'geo_type': 'polygon', 'layer': 'userpolygons'}),
     re_path(r'^mission/(?P<mission_id>\d+)/data/userpolygons/current/kml/$', views.user_polygons_all_kml, name='user_polygons_all_kml'),
     re_path(r'^mission/(?P<mission_id>\d+)/data/userpolygons/create/$', views.user_polygon_create, name='user_polygon_create'),
     re_path(r'^data/userpolygons/(?P<geo_id>\d+)/replace/$', views.user_polygon_replace, {'geo_type': 'polygon'}, name='user_polygon_replace'),
     re_path(r'^mission/(?P<mission_id>\d+)/data/userlines/current/$', views.data_all_specific_mission_type, {'geo_type': 'line'}),
+    re_path(r'^mission/(?P<mission_id>\d+)/tiles/userlines/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.mvt$', views.data_tile_specific_mission_type, {'geo_type': 'line', 'layer': 'userlines'}),
     re_path(r'^mission/(?P<mission_id>\d+)/data/userlines/current/kml/$', views.user_lines_all_kml, name='user_lines_all_kml'),
     re_path(r'^mission/(?P<mission_id>\d+)/data/userlines/create/$', views.user_line_create, name='user_line_create'),
     re_path(r'^data/userlines/(?P<geo_id>\d+)/replace/$', views.user_line_replace, {'geo_type': 'line'}, name='user_line_replace'),
@@ -5,38 +5,273 @@ The functions here should cover the logic associated with making
 views work.
 """
 
-from django.http import HttpResponse, HttpResponseNotFound, HttpResponseBadRequest
+import csv
+import itertools
+import json
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseNotFound, HttpResponseBadRequest, StreamingHttpResponse
 from django.core.serializers import serialize
-from django.contrib.gis.geos import Point, Polygon, LineString, GEOSGeometry
+from django.contrib.gis.geos import Point, Polygon, LineString
+from django.db.models import QuerySet
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+import numpy as np
+
+from .geojson import ageojson_stream, geojson_footer, geojson_stream
+from .kml import kml_folder, kml_placemarks, kml_stream
+from .simplify import douglas_peucker, zoom_tolerance
+from .tiles import mvt_tile, tile_valid
+from .models import GeoTimeLabel, lon_lat
+
+
+# How far before a since cursor to look for changes, so objects that were
+# still being committed when the cursor was issued are not missed
+SINCE_OVERLAP = timedelta(seconds=30)
 
-from .models import GeoTimeLabel
+# Number of the most recent positions in a track that are never simplified
+TRACK_RECENT = 100
 
 
-def to_geojson(objecttype, objects):
+def to_geojson(objecttype, objects, extra=None):
     """
     Convert a set of objects to geojson and return them as an http response
+
+    Querysets are streamed using the fast serializer (see geojson.py),
+    lists of objects (i.e. a single new object) use the django serializer.
+    extra is added as members of the FeatureCollection
     """
+    if isinstance(objects, QuerySet):
+        return StreamingHttpResponse(geojson_stream(objecttype, objects, extra=extra), content_type='application/geo+json')
     geojson_data = serialize('geojson', objects, geometry_field=objecttype.GEOFIELD,
                              fields=objecttype.GEOJSON_FIELDS, use_natural_foreign_keys=True)
-    return HttpResponse(geojson_data, content_type='application/geo+json')
+    return HttpResponse(geojson_data[:-2] + geojson_footer(extra), content_type='application/geo+json')
+
+
+async def ato_geojson(request, objecttype, objects, extra=None):
+    """
+    Async version of to_geojson, for a queryset
+
+    When served by ASGI the rows are streamed with the async ORM. Otherwise (WSGI, tests) the
+    stream has to be synchronous, as django would read all of an async stream before sending it.
+    """
+    if isinstance(request, ASGIRequest):
+        return StreamingHttpResponse(ageojson_stream(objecttype, objects, extra=extra), content_type='application/geo+json')
+    return to_geojson(objecttype, objects, extra=extra)
+
+
+def since_parameter(request):
+    """
+    Find the since cursor in the request, moved back by SINCE_OVERLAP
+
+    Returns None if there isn't one, and raises ValueError if it isn't valid
+    """
+    since = request.GET.get('since')
+    if since is None:
+        return None
+    try:
+        since = parse_datetime(since)
+    except ValueError:
+        since = None
+    if since is None or timezone.is_naive(since):
+        raise ValueError("Invalid since")
+    return since - SINCE_OVERLAP
+
+
+def to_geojson_since(request, objecttype, objects, scope):
+    """
+    Convert a set of objects to geojson, with a cursor for only getting the changes next time
+
+    When the request has the cursor (as since), only objects that changed after it are included.
+    scope is every object that could be in objects (i.e. including deleted/replaced ones),
+    any of these that changed but are no longer in objects are listed (by pk) as removed.
+    """
+    cursor = timezone.now()
+    try:
+        since = since_parameter(request)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    if since is None:
+        return to_geojson(objecttype, objects, extra={'cursor': cursor})
+
+    removed = objecttype.changed_since(scope, since).exclude(pk__in=objects.values('pk')).values_list('pk', flat=True)
+    return to_geojson(objecttype, objecttype.changed_since(objects, since), extra={'cursor': cursor, 'removed': [str(pk) for pk in removed]})
+
+
+async def ato_geojson_since(request, objecttype, objects, scope):
+    """
+    Async version of to_geojson_since
+    """
+    cursor = timezone.now()
+    try:
+        since = since_parameter(request)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    if since is None:
+        return await ato_geojson(request, objecttype, objects, extra={'cursor': cursor})
+
+    removed = objecttype.changed_since(scope, since).exclude(pk__in=objects.values('pk')).values_list('pk', flat=True)
+    return await ato_geojson(request, objecttype, objecttype.changed_since(objects, since), extra={'cursor': cursor, 'removed': [str(pk) async for pk in removed]})
+
+
+def track_parameters(params):
+    """
+    Find the tolerance (in m) and number of recent positions to keep requested for a track
+
+    The tolerance can be requested directly, or as the zoom level of the map.
+    The tolerance is None if the full resolution track was requested.
+    Raises ValueError if the parameters are not valid.
+    """
+    tolerance = None
+    if params.get('tolerance'):
+        tolerance = float(params.get('tolerance'))
+    elif params.get('zoom'):
+        tolerance = zoom_tolerance(float(params.get('zoom')))
+    recent = int(params.get('recent', TRACK_RECENT))
+    if (tolerance is not None and (not math.isfinite(tolerance) or tolerance < 0)) or recent < 0:
+        raise ValueError("Invalid track parameters")
+    return tolerance, recent
+
+
+def to_geojson_track(request, objecttype, positions, oldest='first', stored_track=None):
+    """
+    Convert a track (the positions of a single asset/user) to geojson and return it as an http response
+
+    When a tolerance (or zoom) is requested, only the most recent positions are included
+    as features, the older positions are simplified into a LineString (as track), every
+    position that is left out is within tolerance of the track.
+
+    stored_track(tolerance, until) can provide the start of the track already simplified
+    (see AssetTrackSegment.track), only the positions after that are simplified here.
+    """
+    order = 'created_at' if oldest == 'last' else '-created_at'
+    try:
+        tolerance, recent = track_parameters(request.GET)
+    except ValueError:
+        return HttpResponseBadRequest("Invalid tolerance, zoom or recent")
+    if tolerance is None:
+        return to_geojson(objecttype, positions.order_by(order))
+
+    extra = {'tolerance': tolerance, 'track': None}
+    boundary = positions.order_by('-created_at').values_list('created_at', flat=True)[recent:recent + 1]
+    if boundary:
+        stored, covered = stored_track(tolerance, boundary[0]) if stored_track is not None else ([], None)
+        remaining = positions.filter(created_at__lte=boundary[0])
+        if covered is not None:
+            remaining = remaining.filter(created_at__gt=covered)
+        coords = np.array(remaining.order_by('created_at').values_list(*lon_lat(objecttype.GEOFIELD)), dtype=float).reshape(-1, 2)
+        extra['track'] = {'type': 'LineString', 'coordinates': stored + coords[douglas_peucker(coords, tolerance)].tolist()}
+        positions = positions.filter(created_at__gt=boundary[0])
+    return to_geojson(objecttype, positions.order_by(order), extra=extra)
 
 
 def to_kml(objecttype, objects):
     """
     Convert a set of objects to kml and return them as an http response
     """
-    kml_data = '<?xml version="1.0" encoding="UTF-8"?>\n' + \
-               '<kml xmlns="http://www.opengis.net/kml/2.2">\n' + \
-               '\t<Document>\n'
-    for obj in objects:
-        kml_data += f'\t\t<Placemark>\n\t\t\t<name><![CDATA[{str(obj)}]]></name>\n'
-        kml_data += f'\t\t\t<description><![CDATA[{str(obj)}]]></description>\n'
-        kml_data += GEOSGeometry(getattr(obj, objecttype.GEOFIELD)).kml
-        kml_data += '\n\t\t</Placemark>\n'
+    return StreamingHttpResponse(kml_stream(kml_placemarks(objecttype, objects)), content_type='application/vnd.google-earth.kml+xml')
+
+
+def to_kml_folders(folders):
+    """
+    Convert several sets of objects to kml, each in a styled folder, and return them as an http response
+
+    folders is a list of (name, objecttype, objects, style)
+    """
+    parts = itertools.chain.from_iterable(kml_folder(name, objecttype, objects, style=style) for name, objecttype, objects, style in folders)
+    styles = list(dict.fromkeys(style for _, _, _, style in folders if style))
+    return StreamingHttpResponse(kml_stream(parts, styles=styles), content_type='application/vnd.google-earth.kml+xml')
+
+
+def to_mvt(objecttype, objects, layer, z, x, y):
+    # pylint: disable=R0913,R0917
+    """
+    Convert the objects in tile z/x/y to a mapbox vector tile and return it as an http response
+    """
+    z, x, y = int(z), int(x), int(y)
+    if not tile_valid(z, x, y):
+        return HttpResponseNotFound("Unknown tile")
+    return HttpResponse(mvt_tile(objecttype, objects, layer, z, x, y), content_type='application/vnd.mapbox-vector-tile')
+
+
+def position_values(lat, lon, fix=None, alt=None, heading=None):
+    """
+    Convert user supplied values for a position into the values to store.
+
+    fix/alt/heading are optional, and are None if they are not valid.
+    Returns None if the lat/lon are not valid.
+    """
+    try:
+        point = Point(float(lon), float(lat))
+    except (ValueError, TypeError):
+        return None
+
+    try:
+        fix = int(fix)
+    except (TypeError, ValueError):
+        fix = None
+    try:
+        heading = int(heading)
+    except (TypeError, ValueError):
+        heading = None
+    try:
+        alt = float(alt)
+    except (TypeError, ValueError):
+        alt = None
+
+    return {'geo': point, 'fix': fix, 'alt': alt, 'heading': heading}
+
+
+def position_time(value):
+    """
+    Convert the user supplied time of a position into a datetime.
+
+    Accepts ISO 8601 or seconds since the unix epoch, times without
+    a timezone are in the current timezone. No time means now.
+    Raises ValueError if the time is not valid.
+    """
+    if value is None or value == '':
+        return timezone.now()
+    try:
+        return datetime.fromtimestamp(float(value), tz=dt_timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        pass
+    created_at = parse_datetime(str(value))
+    if created_at is None:
+        raise ValueError(f"Invalid time: {value}")
+    if timezone.is_naive(created_at):
+        created_at = timezone.make_aware(created_at)
+    return created_at
+
+
+def positions_from_request(request):
+    """
+    Get the list of positions from the body of a request.
+
+    The body is either csv (with a header row), or json, as either
+    a list of objects or an object with the list as 'positions'.
+    Raises ValueError if the body is not understood.
+    """
+    try:
+        body = request.body.decode(request.encoding or 'utf-8')
+    except UnicodeDecodeError as error:
+        raise ValueError("Invalid encoding") from error
 
-    kml_data += '\t</Document>\n</kml>'
+    if request.content_type == 'text/csv':
+        return list(csv.DictReader(StringIO(body)))
 
-    return HttpResponse(kml_data, 'application/vnd.google-earth.kml+xml')
+    try:
+        positions = json.loads(body)
+    except json.JSONDecodeError as error:
+        raise ValueError("Invalid json") from error
+    if isinstance(positions, dict):
+        positions = positions.get('positions')
+    if not isinstance(positions, list) or not all(isinstance(position, dict) for position in positions):
+        raise ValueError("Expected a list of positions")
+    return positions
 
 
 # pylint: disable=R0913
@@ -8,25 +8,28 @@ Also, the asset tracks are handled here too.
 from io import TextIOWrapper
 import csv
 from datetime import datetime
+from functools import partial
 import pytz
 
+from asgiref.sync import sync_to_async
 from django.http import HttpResponse, HttpResponseRedirect, HttpResponseBadRequest, JsonResponse, HttpResponseNotFound
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.contrib.gis.geos import Point
+from django.db import transaction
 from django.shortcuts import get_object_or_404, render
 from django.utils.decorators import method_decorator
 from django.views import View
 
 from smm.settings import TIME_ZONE
 from assets.models import Asset, AssetCommand
-from assets.decorators import asset_is_recorder
-from mission.decorators import mission_is_member, mission_asset_get
+from assets.decorators import asset_is_recorder, asset_user_is_recorder
+from mission.decorators import mission_is_member, mission_asset_get, amission_asset_get
 from mission.models import Mission
-from .decorators import geotimelabel_from_type_id, geotimelabel_from_id, data_get_mission_id
-from .models import AssetPointTime, GeoTimeLabel, UserPointTime
+from .decorators import geotimelabel_from_type_id, geotimelabel_from_id, data_get_mission_id, data_area_time, data_conditional, mission_layers
+from .models import AssetPointTime, AssetTrackSegment, CurrentAssetPosition, CurrentUserPosition, GeoTimeLabel, PendingPositions, UserPointTime
 from .forms import UploadTyphoonData
-from .view_helpers import to_geojson, to_kml, point_label_make, user_polygon_make, user_line_make, geotimelabel_replace
+from .view_helpers import ato_geojson, ato_geojson_since, to_geojson, to_geojson_track, to_kml, to_mvt, point_label_make, user_polygon_make, user_line_make, geotimelabel_replace, position_values, position_time, positions_from_request
 
 
 def mission_get(mission_id):
@@ -38,41 +41,26 @@ def mission_get(mission_id):
 
 @login_required
 @mission_is_member
-def assets_position_latest(request, mission_user):
+@data_conditional(mission_layers(AssetPointTime))
+async def assets_position_latest(request, mission_user):
     """
-    Get the last position of each of the know assets
+    Get the last position of each of the assets in this mission
     """
-    assets = Asset.objects.all()
-    positions = []
-    for asset in assets:
-        points = AssetPointTime.objects.filter(mission=mission_user.mission, asset=asset).order_by('-created_at')[:1]
-        for point in points:
-            positions.append(point)
-
-    return to_geojson(AssetPointTime, positions)
+    return await ato_geojson(request, AssetPointTime, CurrentAssetPosition.positions_for_mission(mission_user.mission))
 
 
 @login_required
-def assets_position_latest_user(request, current_only):
+@data_conditional(mission_layers(AssetPointTime))
+async def assets_position_latest_user(request, current_only):
     """
-    Get the last position of each of the know assets from all missions
+    Get the last position of each of the assets from all missions
     """
-    assets = Asset.objects.all()
-    positions = []
-    for asset in assets:
-        points = AssetPointTime.objects
-        if current_only:
-            points = points.filter(mission__closed__isnull=True)
-        points = points.filter(mission__missionuser__user=request.user, asset=asset).order_by('-created_at')[:1]
-        for point in points:
-            positions.append(point)
-
-    return to_geojson(AssetPointTime, positions)
+    return await ato_geojson(request, AssetPointTime, CurrentAssetPosition.positions_for_user(await request.auser(), current_only=current_only))
 
 
 @login_required
 @asset_is_recorder
-def asset_record_position(request, asset):
+async def asset_record_position(request, asset):
     """
     Record the current position of an asset.
 
@@ -102,42 +90,149 @@ def asset_record_position(request, asset):
     else:
         return HttpResponseBadRequest("Unsupported method")
 
-    point = None
-    try:
-        point = Point(float(lon), float(lat))
-    except (ValueError, TypeError):
-        pass
+    values = position_values(lat, lon, fix=fix, alt=alt, heading=heading)
 
-    try:
-        fix = int(fix)
-    except (TypeError, ValueError):
-        fix = None
-    try:
-        heading = int(heading)
-    except (TypeError, ValueError):
-        heading = None
-    try:
-        alt = float(alt)
-    except (TypeError, ValueError):
-        alt = None
-
-    mission_asset = mission_asset_get(asset)
+    mission_asset = await amission_asset_get(asset)
     if mission_asset is not None:
-        if point:
-            AssetPointTime(asset=asset, geo=point, created_by=request.user, alt=alt, heading=heading, fix=fix, mission=mission_asset.mission).save()
+        if values:
+            await AssetPointTime(asset=asset, created_by=await request.auser(), mission=mission_asset.mission, **values).asave()
         else:
             return HttpResponseBadRequest("Invalid lat/lon")
 
-        return JsonResponse(AssetCommand.last_command_for_asset_to_json(asset))
+        return JsonResponse(await AssetCommand.alast_command_for_asset_to_json(asset))
 
     return HttpResponse("Continue")
 
 
+def positions_asset_mission(user, asset):
+    """
+    Check the user can record positions for the asset, and find the mission they are recorded in.
+
+    Returns the mission asset, or the reason the positions can't be recorded
+    """
+    if asset is None:
+        return None, "Unknown asset"
+    if not asset_user_is_recorder(user, asset):
+        return None, "Not Authorized to record the position of this asset"
+    mission_asset = mission_asset_get(asset)
+    if mission_asset is None:
+        return None, "Asset is not in a mission"
+    mission_asset.asset = asset
+    return mission_asset, None
+
+
+def position_point(user, mission_asset, position):
+    """
+    Create (but don't save) the point for a user supplied position.
+
+    Raises ValueError if the position is not valid
+    """
+    values = position_values(position.get('lat'), position.get('lon'), fix=position.get('fix'), alt=position.get('alt'), heading=position.get('heading'))
+    if values is None:
+        raise ValueError("Invalid lat/lon")
+    return AssetPointTime(asset=mission_asset.asset, created_by=user, created_at=position_time(position.get('time')), mission_id=mission_asset.mission_id, **values)
+
+
+def positions_by_asset(positions, results, asset=None):
+    """
+    Group the (indexes of the) positions by asset id.
+
+    Positions that don't have a valid asset id are rejected in results.
+    """
+    asset_positions = {}
+    for index, position in enumerate(positions):
+        try:
+            asset_positions.setdefault(asset.pk if asset is not None else int(position.get('asset')), []).append(index)
+        except (TypeError, ValueError):
+            results[index] = {'accepted': False, 'reason': "Unknown asset"}
+    return asset_positions
+
+
+def positions_record(user, positions, asset=None):
+    """
+    Record a batch of positions for one or more assets.
+
+    Each asset is only checked once, no matter how many positions it has.
+    When asset is None, each position has the asset id as 'asset'.
+
+    Returns whether each position was accepted, along with the last command
+    for each asset that had positions recorded.
+    """
+    results = [None] * len(positions)
+    asset_positions = positions_by_asset(positions, results, asset=asset)
+    assets = {asset.pk: asset} if asset is not None else Asset.objects.in_bulk(asset_positions.keys())
+    points = []
+    recorded_assets = []
+    for asset_id, indexes in asset_positions.items():
+        mission_asset, reason = positions_asset_mission(user, assets.get(asset_id))
+        if mission_asset is not None:
+            recorded_assets.append(mission_asset.asset)
+        for index in indexes:
+            try:
+                if reason is not None:
+                    raise ValueError(reason)
+                points.append((index, position_point(user, mission_asset, positions[index])))
+            except ValueError as error:
+                results[index] = {'accepted': False, 'reason': str(error)}
+
+    with transaction.atomic():
+        AssetPointTime.objects.bulk_create([point for _, point in points])
+        CurrentAssetPosition.record_many([point for _, point in points])
+        PendingPositions.add([point for _, point in points])
+
+    for index, point in points:
+        results[index] = {'accepted': True, 'id': point.pk}
+
+    return JsonResponse({
+        'results': results,
+        'commands': {recorded_asset.pk: AssetCommand.last_command_for_asset_to_json(recorded_asset) for recorded_asset in recorded_assets},
+    })
+
+
+@login_required
+@asset_is_recorder
+async def asset_record_positions(request, asset):
+    """
+    Record a batch of positions for an asset.
+
+    For trackers that store their positions while out of coverage.
+    The positions can be json or csv, see positions_from_request
+    Each position has lat, lon, and optionally fix, alt, heading and time.
+    """
+    if request.method != 'POST':
+        return HttpResponseBadRequest("Unsupported method")
+    try:
+        positions = positions_from_request(request)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    # Recording is a single transaction, which has to be run in a thread
+    return await sync_to_async(positions_record)(await request.auser(), positions, asset=asset)
+
+
+@login_required
+async def assets_record_positions(request):
+    """
+    Record a batch of positions for many assets.
+
+    For bridges that relay the positions of many assets.
+    The positions can be json or csv, see positions_from_request
+    Each position has asset (id), lat, lon, and optionally fix, alt, heading and time.
+    """
+    if request.method != 'POST':
+        return HttpResponseBadRequest("Unsupported method")
+    try:
+        positions = positions_from_request(request)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    return await sync_to_async(positions_record)(await request.auser(), positions)
+
+
 def asset_position_history(request, asset_id, mission=None, user=None, current_only=False):
     """
     Get the full track from an asset.
 
     When from is provided, only points after the timestamp from are considered.
+    When tolerance (in m) or zoom is provided, all but the most recent positions are simplified.
     """
     oldest = 'first'
     since = None
@@ -158,12 +253,12 @@ def asset_position_history(request, asset_id, mission=None, user=None, current_o
     positions = positions.filter(asset=asset)
     if since is not None:
         positions = positions.filter(created_at__gt=since)
-    if oldest == 'last':
-        positions = positions.order_by('created_at')
-    else:
-        positions = positions.order_by('-created_at')
 
-    return to_geojson(AssetPointTime, positions)
+    stored_track = None
+    if mission is not None and since is None:
+        stored_track = partial(AssetTrackSegment.track, mission, asset)
+
+    return to_geojson_track(request, AssetPointTime, positions, oldest=oldest, stored_track=stored_track)
 
 
 @login_required
@@ -189,41 +284,26 @@ def asset_position_history_user(request, asset_id, current_only):
 
 @login_required
 @mission_is_member
-def users_position_latest(request, mission_user):
+@data_conditional(mission_layers(UserPointTime))
+async def users_position_latest(request, mission_user):
     """
-    Get the last position of each of the know assets
+    Get the last position of each of the users in this mission
     """
-    users = get_user_model().objects.all()
-    positions = []
-    for user in users:
-        points = UserPointTime.objects.filter(mission=mission_user.mission, user=user).order_by('-created_at')[:1]
-        for point in points:
-            positions.append(point)
-
-    return to_geojson(UserPointTime, positions)
+    return await ato_geojson(request, UserPointTime, CurrentUserPosition.positions_for_mission(mission_user.mission))
 
 
 @login_required
-def users_position_latest_user(request, current_only):
+@data_conditional(mission_layers(UserPointTime))
+async def users_position_latest_user(request, current_only):
     """
-    Get the last position of each of the know assets from all missions
+    Get the last position of each of the users from all missions
     """
-    users = get_user_model().objects.all()
-    positions = []
-    for user in users:
-        points = UserPointTime.objects
-        if current_only:
-            points = points.filter(mission__closed__isnull=True)
-        points = points.filter(mission__missionuser__user=request.user, user=user).order_by('-created_at')[:1]
-        for point in points:
-            positions.append(point)
-
-    return to_geojson(UserPointTime, positions)
+    return await ato_geojson(request, UserPointTime, CurrentUserPosition.positions_for_user(await request.auser(), current_only=current_only))
 
 
 @login_required
 @mission_is_member
-def user_record_position(request, mission_user, user):
+async def user_record_position(request, mission_user, user):
     """
     Record the current position of a user.
 
@@ -235,7 +315,8 @@ def user_record_position(request, mission_user, user):
     alt = None
     heading = None
 
-    if request.user.username != user:
+    request_user = await request.auser()
+    if request_user.username != user:
         return HttpResponse('Unauthorized', status=401)
 
     if request.method == 'GET':
@@ -253,27 +334,10 @@ def user_record_position(request, mission_user, user):
     else:
         return HttpResponseBadRequest("Unsupported method")
 
-    point = None
-    try:
-        point = Point(float(lon), float(lat))
-    except (ValueError, TypeError):
-        pass
+    values = position_values(lat, lon, fix=fix, alt=alt, heading=heading)
 
-    try:
-        fix = int(fix)
-    except (TypeError, ValueError):
-        fix = None
-    try:
-        heading = int(heading)
-    except (TypeError, ValueError):
-        heading = None
-    try:
-        alt = float(alt)
-    except (TypeError, ValueError):
-        alt = None
-
-    if point:
-        UserPointTime(user=request.user, geo=point, created_by=request.user, alt=alt, mission=mission_user.mission).save()
+    if values:
+        await UserPointTime(user=request_user, geo=values['geo'], created_by=request_user, alt=values['alt'], mission=mission_user.mission).asave()
     else:
         return HttpResponseBadRequest("Invalid lat/lon")
 
@@ -285,6 +349,7 @@ def user_position_history(request, user, mission=None, requesting_user=None, cur
     Get the full track from an asset.
 
     When from is provided, only points after the timestamp from are considered.
+    When tolerance (in m) or zoom is provided, all but the most recent positions are simplified.
     """
     oldest = 'first'
     since = None
@@ -305,12 +370,8 @@ def user_position_history(request, user, mission=None, requesting_user=None, cur
     positions = positions.filter(user=user_object)
     if since is not None:
         positions = positions.filter(created_at__gt=since)
-    if oldest == 'last':
-        positions = positions.order_by('created_at')
-    else:
-        positions = positions.order_by('-created_at')
 
-    return to_geojson(UserPointTime, positions)
+    return to_geojson_track(request, UserPointTime, positions, oldest=oldest)
 
 
 @login_required
@@ -338,27 +399,48 @@ def user_position_history_user(request, user, current_only):
 
 @login_required
 @mission_is_member
-def data_all_specific_mission_type(request, mission_user, geo_type):
+@data_area_time
+@data_conditional(mission_layers(GeoTimeLabel))
+async def data_all_specific_mission_type(request, mission_user, geo_type, area):
     """
     Get all the current (geo_type)s as geojson from the specified mission
     """
-    return to_geojson(GeoTimeLabel, GeoTimeLabel.all_current_of_geo(mission_user.mission, geo_type=geo_type))
+    return await ato_geojson_since(request, GeoTimeLabel, GeoTimeLabel.all_current_of_geo(mission_user.mission, geo_type=geo_type, area=area),
+                                   GeoTimeLabel.all_in_mission(mission_user.mission, area=area).filter(geo_type=geo_type))
 
 
 @login_required
-def data_all_all_missions_type(request, geo_type):
+@data_area_time
+@data_conditional(mission_layers(GeoTimeLabel))
+async def data_all_all_missions_type(request, geo_type, area):
     """
     Get all current (geo_type)s from all missions this user is in
     """
-    return to_geojson(GeoTimeLabel, GeoTimeLabel.all_current_of_geo_user(request.user, geo_type))
+    user = await request.auser()
+    return await ato_geojson_since(request, GeoTimeLabel, GeoTimeLabel.all_current_of_geo_user(user, geo_type, area=area),
+                                   GeoTimeLabel.all_in_user_missions(user, area=area).filter(geo_type=geo_type))
 
 
 @login_required
-def data_all_current_missions_type(request, geo_type):
+@data_area_time
+@data_conditional(mission_layers(GeoTimeLabel))
+async def data_all_current_missions_type(request, geo_type, area):
     """
     Get all current (geo_type)s from all missions this user is in
     """
-    return to_geojson(GeoTimeLabel, GeoTimeLabel.all_current_of_geo_user(request.user, geo_type, current_only=True))
+    user = await request.auser()
+    return await ato_geojson_since(request, GeoTimeLabel, GeoTimeLabel.all_current_of_geo_user(user, geo_type, current_only=True, area=area),
+                                   GeoTimeLabel.all_in_user_missions(user, current_only=True, area=area).filter(geo_type=geo_type))
+
+
+@login_required
+@mission_is_member
+def data_tile_specific_mission_type(request, mission_user, geo_type, layer, z, x, y):
+    # pylint: disable=R0913,R0917
+    """
+    Get a vector tile of the current (geo_type)s in this mission
+    """
+    return to_mvt(GeoTimeLabel, GeoTimeLabel.all_current_of_geo(mission_user.mission, geo_type=geo_type), layer, z, x, y)
 
 
 def point_labels_all_kml(request, mission_id):
@@ -366,7 +448,7 @@ def point_labels_all_kml(request, mission_id):
     Get all the current POIs as kml
     """
     mission = mission_get(mission_id)
-    return to_kml(GeoTimeLabel, GeoTimeLabel.all_current_of_geo(mission.mission, geo_type='poi'))
+    return to_kml(GeoTimeLabel, GeoTimeLabel.all_current_of_geo(mission, geo_type='poi'))
 
 
 @login_required
@@ -515,13 +597,15 @@ def upload_typhoonh_data(request, mission_user):
             with TextIOWrapper(request.FILES['telemetry'].file, encoding=request.encoding) as file:
                 reader = csv.DictReader(file)
                 last_second = -1
-                for row in reader:
-                    if row['gps_used'] == 'true':
-                        point = Point(float(row['longitude']), float(row['latitude']))
-                        timestring, seconds = convert_typhoon_time(row[''])
-                        if seconds != last_second:
-                            AssetPointTime(asset=form.cleaned_data['asset'], alt=float(row['altitude']), heading=float(row['yaw']), point=point, created_at=timestring, created_by=mission_user.user).save()
-                            last_second = seconds
+                # A single transaction, so the positions are processed together (see PendingPositions)
+                with transaction.atomic():
+                    for row in reader:
+                        if row['gps_used'] == 'true':
+                            point = Point(float(row['longitude']), float(row['latitude']))
+                            timestring, seconds = convert_typhoon_time(row[''])
+                            if seconds != last_second:
+                                AssetPointTime(asset=form.cleaned_data['asset'], alt=float(row['altitude']), heading=float(row['yaw']), point=point, created_at=timestring, created_by=mission_user.user).save()
+                                last_second = seconds
             return HttpResponseRedirect('/')
     else:
         form = UploadTyphoonData()
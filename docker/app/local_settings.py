@@ -2,6 +2,8 @@
 # Make changes as required and make sure to save
 # it as local_settings.py
 
+from smm.database import pool_options
+
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
@@ -22,5 +24,11 @@ DATABASES = {
         'NAME': 'POSTGRES_DBNAME',
         'USER': 'POSTGRES_USER',
         'PASSWORD': 'POSTGRES_PASSWORD',
+        # Check connections are still working before they are used
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Reuse connections from psycopg's pool, see smm/database.py for sizing it
+            'pool': pool_options(),
+        },
     }
 }
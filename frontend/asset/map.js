@@ -94,6 +94,11 @@ class SMMAsset {
   }
 
   updateNewRoute(route) {
+    if (route.track) {
+      for (const coordinate of route.track.coordinates) {
+        this.path.push(L.latLng(coordinate[1], coordinate[0]))
+      }
+    }
     for (const f in route.features) {
       const lon = route.features[f].geometry.coordinates[0]
       const lat = route.features[f].geometry.coordinates[1]
@@ -117,6 +122,8 @@ class SMMAsset {
     let assetUrl = `/mission/${this.missionId}/data/assets/${this.assetId}/position/history/?oldest=last`
     if (this.lastUpdate != null) {
       assetUrl = `${assetUrl}&from=${this.lastUpdate}`
+    } else {
+      assetUrl = `${assetUrl}&zoom=${this.map.getZoom()}`
     }
 
     $.ajax({
@@ -536,11 +536,29 @@ class AssetUI extends React.Component {
     $.ajaxSetup({ timeout: 2500 })
     this.updateData()
     this.timer = setInterval(() => this.updateData(), 10000)
+    this.waiting = true
+    this.waitForCommands()
   }
 
   componentWillUnmount() {
     clearInterval(this.timer)
     this.timer = null
+    this.waiting = false
+  }
+
+  async waitForCommands() {
+    let after = 0
+    while (this.waiting) {
+      try {
+        const data = await $.ajax({ url: `/assets/${this.props.asset}/command/wait/`, data: { after: after, timeout: 25 }, dataType: 'json', timeout: 30000 })
+        if (this.waiting && 'id' in data.command) {
+          after = data.command.id
+          this.currentCommand(data.command)
+        }
+      } catch {
+        await new Promise((resolve) => setTimeout(resolve, 5000))
+      }
+    }
   }
 
   updateDataResponse(data) {
@@ -14,28 +14,24 @@ class SMMImage extends SMMRealtime {
   }
 
   realtime() {
-    return L.realtime(
-      {
-        url: this.getUrl(),
-        type: 'json'
+    this.layer = L.realtime(this.source(), {
+      interval: this.interval,
+      color: this.color,
+      onEachFeature: this.createPopup,
+      getFeatureId: function (feature) {
+        return feature.properties.pk
       },
-      {
-        interval: this.interval,
-        color: this.color,
-        onEachFeature: this.createPopup,
-        getFeatureId: function (feature) {
-          return feature.properties.pk
-        },
-        pointToLayer: function (feature, latlng) {
-          return L.marker(latlng, {
-            icon: L.icon({
-              iconUrl: '/static/icons/image-x-generic.png',
-              iconSize: [24, 24]
-            })
+      removeMissing: false,
+      pointToLayer: function (feature, latlng) {
+        return L.marker(latlng, {
+          icon: L.icon({
+            iconUrl: '/static/icons/image-x-generic.png',
+            iconSize: [24, 24]
           })
-        }
+        })
       }
-    )
+    })
+    return this.layer
   }
 
   createPopup(image, layer) {
@@ -34,6 +34,7 @@ import { SMMImageAll, SMMImageImportant } from './image/map.js'
 import { SMMMarineVector } from './marine/vectors.js'
 import { SMMAssets } from './asset/map.js'
 import { SMMMissionTopBar } from './menu/topbar.js'
+import { SMMEvents } from './smmmap.js'
 import { SMMUserPositions } from './user/map.js'
 
 class SMMMap {
@@ -132,37 +133,41 @@ class SMMMap {
     // Default leaflet path color
     const defaultColor = '#3388ff'
 
+    // Layers follow the events for a single mission, and poll for all/current missions
+    const events = this.missionId !== 'current' && this.missionId !== 'all' ? new SMMEvents(this.map, this.missionId) : null
+    const follow = (model, layer) => (events === null ? layer : events.follow(model, layer))
+
     this.assets = new SMMAssets(this.map, this.csrftoken, this.missionId, assetUpdateFreq, 'red', this.overlayAddAsset)
-    this.overlayAdd('Assets', this.assets.realtime().addTo(this.map))
+    this.overlayAdd('Assets', follow('data.assetpointtime', this.assets.realtime()).addTo(this.map))
 
     this.users = new SMMUserPositions(this.map, this.csrftoken, this.missionId, userUpdateFreq, 'red', this.overlayAddUser)
-    this.overlayAdd('Users', this.users.realtime().addTo(this.map))
+    this.overlayAdd('Users', follow('data.userpointtime', this.users.realtime()).addTo(this.map))
 
     this.POIs = new SMMPOIs(this.map, this.csrftoken, this.missionId, userDataUpdateFreq, defaultColor)
-    this.overlayAdd('POIs', this.POIs.realtime().addTo(this.map))
+    this.overlayAdd('POIs', follow('data.geotimelabel', this.POIs.realtime()).addTo(this.map))
 
     this.polygons = new SMMPolygons(this.map, this.csrftoken, this.missionId, userDataUpdateFreq, defaultColor)
-    this.overlayAdd('Polygons', this.polygons.realtime().addTo(this.map))
+    this.overlayAdd('Polygons', follow('data.geotimelabel', this.polygons.realtime()).addTo(this.map))
 
     this.lines = new SMMLines(this.map, this.csrftoken, this.missionId, userDataUpdateFreq, defaultColor)
-    this.overlayAdd('Lines', this.lines.realtime().addTo(this.map))
+    this.overlayAdd('Lines', follow('data.geotimelabel', this.lines.realtime()).addTo(this.map))
 
     this.notStartedSearches = new SMMSearchesNotStarted(this.map, this.csrftoken, this.missionId, searchIncompleteUpdateFreq, 'orange')
     this.inprogressSearches = new SMMSearchesInprogress(this.map, this.csrftoken, this.missionId, searchIncompleteUpdateFreq, 'orange')
     this.completeSearches = new SMMSearchesComplete(this.map, this.csrftoken, this.missionId, searchCompleteUpdateFreq, defaultColor)
 
-    this.overlayAdd('Pending Searches', this.notStartedSearches.realtime().addTo(this.map))
-    this.overlayAdd('Inprogress Searches', this.inprogressSearches.realtime().addTo(this.map))
-    this.overlayAdd('Completed Searches', this.completeSearches.realtime())
+    this.overlayAdd('Pending Searches', follow('search.search', this.notStartedSearches.realtime()).addTo(this.map))
+    this.overlayAdd('Inprogress Searches', follow('search.search', this.inprogressSearches.realtime()).addTo(this.map))
+    this.overlayAdd('Completed Searches', follow('search.search', this.completeSearches.realtime()))
 
     this.allImages = new SMMImageAll(this.map, this.csrftoken, this.missionId, imageAllUpdateFreq, defaultColor)
     this.importantImages = new SMMImageImportant(this.map, this.csrftoken, this.missionId, imageAllUpdateFreq, defaultColor)
 
-    this.overlayAdd('Images (all)', this.allImages.realtime())
-    this.overlayAdd('Images (prioritized', this.importantImages.realtime().addTo(this.map))
+    this.overlayAdd('Images (all)', follow('images.geoimage', this.allImages.realtime()))
+    this.overlayAdd('Images (prioritized', follow('images.geoimage', this.importantImages.realtime()).addTo(this.map))
 
     this.marineVectors = new SMMMarineVector(this.map, this.csrftoken, this.missionId, marineDataUpdateFreq, 'black')
-    this.overlayAdd('Marine - Total Drift Vectors', this.marineVectors.realtime())
+    this.overlayAdd('Marine - Total Drift Vectors', follow('marinesar.marinetotaldriftvector', this.marineVectors.realtime()))
   }
 
   overlayAdd(name, layer) {
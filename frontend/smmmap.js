@@ -11,20 +11,53 @@ class SMMRealtime {
   }
 
   realtime() {
-    return L.realtime(
-      {
-        url: this.getUrl(),
-        type: 'json'
+    this.layer = L.realtime(this.source(), {
+      interval: this.interval,
+      color: this.color,
+      onEachFeature: this.createPopup,
+      getFeatureId: function (feature) {
+        return feature.properties.pk
       },
-      {
-        interval: this.interval,
-        color: this.color,
-        onEachFeature: this.createPopup,
-        getFeatureId: function (feature) {
-          return feature.properties.pk
-        }
-      }
-    )
+      removeMissing: false
+    })
+    return this.layer
+  }
+
+  source() {
+    // Only fetch the full layer the first time, after that use the cursor
+    // from the last response to only get the changes, and the etag so the
+    // server can answer 304 when nothing has changed at all
+    let cursor = null
+    let etag = null
+    return (success, error) => {
+      const url = cursor === null ? this.getUrl() : `${this.getUrl()}?since=${encodeURIComponent(cursor)}`
+      const headers = etag === null ? {} : { 'If-None-Match': etag }
+      fetch(url, { credentials: 'same-origin', headers })
+        .then((response) => {
+          if (response.status === 304) {
+            return null
+          }
+          if (!response.ok) {
+            throw new Error(response.statusText)
+          }
+          etag = response.headers.get('ETag')
+          return response.json()
+        })
+        .then((data) => {
+          if (data === null) {
+            success({ type: 'FeatureCollection', features: [] })
+            return
+          }
+          if (cursor !== null && this.layer !== undefined && data.removed !== undefined) {
+            this.layer.remove(data.removed.map((pk) => ({ type: 'Feature', properties: { pk: pk }, geometry: null })))
+          }
+          if (data.cursor !== undefined) {
+            cursor = data.cursor
+          }
+          success(data)
+        })
+        .catch(error)
+    }
   }
 
   createButtonGroup(data) {
@@ -53,4 +86,79 @@ class SMMRealtime {
   }
 }
 
-export { SMMRealtime }
+// Events (from the server) that mean something in a layer has changed
+const SMM_EVENT_TYPES = ['position', 'created', 'replaced', 'updated', 'deleted', 'search_queued', 'search_begun', 'search_finished']
+
+class SMMEvents {
+  // Refresh realtime layers when the server says something in them has changed,
+  // rather than polling them, polling is only used while the event stream is down
+  constructor(map, missionId) {
+    this.map = map
+    this.layers = {}
+    this.pending = new Set()
+    this.connected = false
+    this.reconnecting = false
+
+    this.source = new EventSource(`/mission/${missionId}/events/`)
+    this.source.onopen = () => {
+      this.connected = true
+      for (const layer of this.allLayers()) {
+        layer.stop()
+        if (this.reconnecting) {
+          // Catch up on anything that happened while disconnected
+          this.refresh(layer)
+        }
+      }
+    }
+    this.source.onerror = () => {
+      this.connected = false
+      this.reconnecting = true
+      for (const layer of this.allLayers()) {
+        if (this.map.hasLayer(layer) && !layer.isRunning()) {
+          layer.start()
+        }
+      }
+    }
+    for (const eventType of SMM_EVENT_TYPES) {
+      this.source.addEventListener(eventType, (event) => {
+        const data = JSON.parse(event.data)
+        for (const layer of this.layers[data.model] || []) {
+          this.refresh(layer)
+        }
+      })
+    }
+    // Layers start polling when they are shown, they only need the first update
+    this.map.on('overlayadd', (event) => {
+      if (this.connected && this.allLayers().includes(event.layer)) {
+        event.layer.stop()
+        this.refresh(event.layer)
+      }
+    })
+  }
+
+  follow(model, layer) {
+    if (!(model in this.layers)) {
+      this.layers[model] = []
+    }
+    this.layers[model].push(layer)
+    return layer
+  }
+
+  allLayers() {
+    return Object.values(this.layers).flat()
+  }
+
+  refresh(layer) {
+    // Wait a moment, so a burst of events only causes a single update
+    if (!this.map.hasLayer(layer) || this.pending.has(layer)) {
+      return
+    }
+    this.pending.add(layer)
+    window.setTimeout(() => {
+      this.pending.delete(layer)
+      layer.update()
+    }, 1000)
+  }
+}
+
+export { SMMRealtime, SMMEvents }
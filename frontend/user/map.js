@@ -69,6 +69,11 @@ class SMMUserPosition {
   }
 
   updateNewPosition(route) {
+    if (route.track) {
+      for (const coordinate of route.track.coordinates) {
+        this.path.push(L.latLng(coordinate[1], coordinate[0]))
+      }
+    }
     for (const f in route.features) {
       const lon = route.features[f].geometry.coordinates[0]
       const lat = route.features[f].geometry.coordinates[1]
@@ -92,6 +97,8 @@ class SMMUserPosition {
     let userUrl = `/mission/${this.missionId}/data/user/${this.userName}/position/history/?oldest=last`
     if (this.lastUpdate != null) {
       userUrl = `${userUrl}&from=${this.lastUpdate}`
+    } else {
+      userUrl = `${userUrl}&zoom=${this.map.getZoom()}`
     }
 
     $.ajax({
@@ -4,10 +4,23 @@ from django.views import View
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 
+from data.decorators import data_conditional
+from data.models import ChangeVersion
+
 from .models import Icon
 
 
+def icons_version_keys(request):
+    """
+    The change versions that cover the json list of icons
+    """
+    if "application/json" not in request.META.get('HTTP_ACCEPT', ''):
+        return None
+    return [ChangeVersion.ICONS_KEY]
+
+
 @method_decorator(login_required, name="dispatch")
+@method_decorator(data_conditional(icons_version_keys), name="get")
 class IconIndex(View):
     def as_json(self, request):
         data = {
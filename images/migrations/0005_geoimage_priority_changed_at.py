@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 19:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0004_alter_geoimage_created_by_alter_geoimage_deleted_by'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='geoimage',
+            name='priority_changed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
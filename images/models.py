@@ -15,10 +15,13 @@ class GeoImage(GeoTime):
     description = models.TextField()
     original_format = models.CharField(max_length=10)
     priority = models.BooleanField(default=False)
+    priority_changed_at = models.DateTimeField(null=True, blank=True)
     replaced_by = models.ForeignKey("GeoImage", on_delete=models.SET_NULL, null=True, blank=True)
 
     GEOJSON_FIELDS = ('pk', 'created_at', 'description', 'priority', )
 
+    CHANGE_FIELDS = GeoTime.CHANGE_FIELDS + ('priority_changed_at', )
+
     def __str__(self):
         # pylint: disable=E1136
         return f"Image ({self.description}) @ {self.geo[0]}, {self.geo[1]}"
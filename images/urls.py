@@ -11,6 +11,8 @@ urlpatterns = [
     re_path(r'^mission/(?P<mission_id>\d+)/image/upload/$', views.image_upload, name='image_upload'),
     re_path(r'^mission/(?P<mission_id>\d+)/image/list/all/$', views.images_list_all, name='images_list_all'),
     re_path(r'^mission/(?P<mission_id>\d+)/image/list/important/$', views.images_list_important, name='images_list_important'),
+    re_path(r'^mission/(?P<mission_id>\d+)/tiles/images/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.mvt$', views.images_tile, {'important': False, 'layer': 'images'}),
+    re_path(r'^mission/(?P<mission_id>\d+)/tiles/images-important/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.mvt$', views.images_tile, {'important': True, 'layer': 'images-important'}),
     re_path(r'^image/(?P<image_id>\d+)/full/$', views.image_get_full, name='image_get_full'),
     re_path(r'^image/(?P<image_id>\d+)/thumbnail/$', views.image_get_thumbnail, name='image_get_thumbnail'),
     re_path(r'^image/(?P<image_id>\d+)/priority/set/$', views.image_priority_set, name='image_priority_set'),
@@ -6,10 +6,11 @@ Views for dealing with images uploaded by users
 from django.http import HttpResponseBadRequest, HttpResponseRedirect, FileResponse, HttpResponse, HttpResponseNotAllowed
 from django.contrib.auth.decorators import login_required
 from django.contrib.gis.geos import Point
+from django.utils import timezone
 
 from mission.decorators import mission_is_member, mission_is_member_no_variable
-from data.decorators import data_get_mission_id
-from data.view_helpers import to_geojson
+from data.decorators import data_get_mission_id, data_area_time, data_conditional, mission_layers
+from data.view_helpers import to_geojson_since, to_mvt
 from timeline.helpers import timeline_record_image_priority_changed
 
 from .decorators import image_from_id
@@ -42,44 +43,70 @@ def image_upload(request, mission_user):
 
 @login_required
 @mission_is_member
-def images_list_all(request, mission_user):
+@data_area_time
+@data_conditional(mission_layers(GeoImage))
+def images_list_all(request, mission_user, area):
     """
     Get all the current Images as geojson
     """
-    return to_geojson(GeoImage, GeoImage.all_current(mission_user.mission))
+    return to_geojson_since(request, GeoImage, GeoImage.all_current(mission_user.mission, area=area), GeoImage.all_in_mission(mission_user.mission, area=area))
 
 
 @login_required
-def images_list_all_user(request, current_only):
+@mission_is_member
+def images_tile(request, mission_user, important, layer, z, x, y):
+    # pylint: disable=R0913,R0917
+    """
+    Get a vector tile of the (important) images in this mission
+    """
+    images = GeoImage.all_current(mission_user.mission)
+    if important:
+        images = images.exclude(priority=False)
+    return to_mvt(GeoImage, images, layer, z, x, y)
+
+
+@login_required
+@data_area_time
+@data_conditional(mission_layers(GeoImage))
+def images_list_all_user(request, current_only, area):
     """
     Get all the current Images as geojson from all missions
     """
-    return to_geojson(GeoImage, GeoImage.all_current_user(request.user, current_only=current_only))
+    return to_geojson_since(request, GeoImage, GeoImage.all_current_user(request.user, current_only=current_only, area=area),
+                            GeoImage.all_in_user_missions(request.user, current_only=current_only, area=area))
 
 
 @login_required
 @mission_is_member
-def images_list_important(request, mission_user):
+@data_area_time
+@data_conditional(mission_layers(GeoImage))
+def images_list_important(request, mission_user, area):
     """
     Get the current priority Images as geojson
     """
-    return to_geojson(GeoImage, GeoImage.all_current(mission_user.mission).exclude(priority=False))
+    return to_geojson_since(request, GeoImage, GeoImage.all_current(mission_user.mission, area=area).exclude(priority=False), GeoImage.all_in_mission(mission_user.mission, area=area))
 
 
 @login_required
-def images_list_important_user(request, current_only):
+@data_area_time
+@data_conditional(mission_layers(GeoImage))
+def images_list_important_user(request, current_only, area):
     """
     Get the current priority Images as geojson from all missions
     """
-    return to_geojson(GeoImage, GeoImage.all_current_user(request.user, current_only=current_only).exclude(priority=False))
+    return to_geojson_since(request, GeoImage, GeoImage.all_current_user(request.user, current_only=current_only, area=area).exclude(priority=False),
+                            GeoImage.all_in_user_missions(request.user, current_only=current_only, area=area))
 
 
 @login_required
-def images_list_important_current(request):
+@data_area_time
+@data_conditional(mission_layers(GeoImage))
+def images_list_important_current(request, area):
     """
     Get the current priority Images as geojson from current missions
     """
-    return to_geojson(GeoImage, GeoImage.all_current_user(request.user, current_only=True).exclude(priority=False))
+    return to_geojson_since(request, GeoImage, GeoImage.all_current_user(request.user, current_only=True, area=area).exclude(priority=False),
+                            GeoImage.all_in_user_missions(request.user, current_only=True, area=area))
 
 
 @login_required
@@ -113,6 +140,7 @@ def image_priority_set(request, image, mission_user):
     Set the priority flag on an image
     """
     image.priority = True
+    image.priority_changed_at = timezone.now()
     image.save()
     timeline_record_image_priority_changed(mission_user.mission, mission_user.user, image)
 
@@ -128,6 +156,7 @@ def image_priority_unset(request, image, mission_user):
     UnSet the priority flag on an image
     """
     image.priority = False
+    image.priority_changed_at = timezone.now()
     image.save()
     timeline_record_image_priority_changed(mission_user.mission, mission_user.user, image)
 
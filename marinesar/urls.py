@@ -11,6 +11,7 @@ urlpatterns = [
     re_path(r'^mission/(?P<mission_id>\d+)/sar/marine/vectors/create/$', views.marine_vectors_create, name='marine_vectors_create'),
     re_path(r'^sar/marine/vectors/(?P<tdv_id>\d+)/delete/$', views.marine_vectors_delete, name='marine_vectors_delete'),
     re_path(r'^mission/(?P<mission_id>\d+)/sar/marine/vectors/current/$', views.marine_vectors_all, name='marine_vectors_all'),
+    re_path(r'^mission/(?P<mission_id>\d+)/tiles/marine-vectors/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.mvt$', views.marine_vectors_tile, {'layer': 'marine-vectors'}),
     re_path(r'^mission/(?P<mission_id>\d+)/sar/marine/sac/$', views.marine_sac, name='marine_sac'),
 
     re_path(r'^mission/all/sar/marine/vectors/current/$', views.marine_vectors_all_user, {'current_only': False}),
@@ -4,17 +4,17 @@ Views for marinesar
 These views should only relate to presentation of the UI
 """
 
-from django.db import connection as dbconn
 from django.contrib.auth.decorators import login_required
-from django.contrib.gis.geos import GEOSGeometry, LineString, Point
+from django.contrib.gis.geos import LineString, Point
 from django.http import HttpResponseNotFound, HttpResponse
 from django.shortcuts import render, get_object_or_404
 from django.utils import timezone
 
-from data.decorators import data_get_mission_id
+from data.decorators import data_get_mission_id, data_area_time, data_conditional, mission_layers
 from data.models import GeoTimeLabel
-from data.view_helpers import to_geojson
+from data.view_helpers import to_geojson, to_geojson_since, to_mvt
 from mission.decorators import mission_is_member
+from smm.geodesy import project
 
 from .decorators import total_drift_from_type_id
 from .models import MarineTotalDriftVector, MarineTotalDriftVectorCurrent, MarineTotalDriftVectorWind
@@ -95,12 +95,7 @@ def marine_vectors_create(request, mission_user):
     points = [start_point]
     current_point = start_point
     for vector in vectors:
-        query = f"SELECT ST_Project(ST_SetSRID(ST_Point({current_point.x}, {current_point.y}), 4326)::geography, {vector['distance']}, radians({vector['bearing']}))"
-        cursor = dbconn.cursor()
-        cursor.execute(query)
-        reference_points = cursor.fetchone()
-
-        current_point = GEOSGeometry(reference_points[0])
+        current_point = project(current_point, vector['distance'], vector['bearing'])
         points.append(current_point)
 
     total_drift_vector = MarineTotalDriftVector(geo=LineString(points), leeway_multiplier=leeway_multiplier, leeway_modifier=leeway_modifier, mission=mission_user.mission, created_by=mission_user.user, created_at=timezone.now(), datum=poi)
@@ -138,19 +133,35 @@ def marine_vectors_delete(request, tdv, mission_user):
 
 @login_required
 @mission_is_member
-def marine_vectors_all(request, mission_user):
+@data_area_time
+@data_conditional(mission_layers(MarineTotalDriftVector))
+def marine_vectors_all(request, mission_user, area):
     """
     Get all the current Total Drift Vectors as geojson
     """
-    return to_geojson(MarineTotalDriftVector, MarineTotalDriftVector.all_current(mission_user.mission))
+    return to_geojson_since(request, MarineTotalDriftVector, MarineTotalDriftVector.all_current(mission_user.mission, area=area),
+                            MarineTotalDriftVector.all_in_mission(mission_user.mission, area=area))
+
+
+@login_required
+@mission_is_member
+def marine_vectors_tile(request, mission_user, layer, z, x, y):
+    # pylint: disable=R0913,R0917
+    """
+    Get a vector tile of the current Total Drift Vectors
+    """
+    return to_mvt(MarineTotalDriftVector, MarineTotalDriftVector.all_current(mission_user.mission), layer, z, x, y)
 
 
 @login_required
-def marine_vectors_all_user(request, current_only):
+@data_area_time
+@data_conditional(mission_layers(MarineTotalDriftVector))
+def marine_vectors_all_user(request, current_only, area):
     """
     Get all the current Total Drift Vectors as geojson (for all missions)
     """
-    return to_geojson(MarineTotalDriftVector, MarineTotalDriftVector.all_current_user(request.user, current_only=current_only))
+    return to_geojson_since(request, MarineTotalDriftVector, MarineTotalDriftVector.all_current_user(request.user, current_only=current_only, area=area),
+                            MarineTotalDriftVector.all_in_user_missions(request.user, current_only=current_only, area=area))
 
 
 @login_required
@@ -10,3 +10,7 @@ class MissionConfig(AppConfig):
     Define the mission app
     """
     name = 'mission'
+
+    def ready(self):
+        # Connect the signal handlers that keep the cached membership up to date
+        from . import signals  # pylint: disable=C0415,W0611
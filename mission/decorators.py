@@ -2,29 +2,45 @@
 Function decorators to make dealing with missions easier
 """
 
+from asgiref.sync import iscoroutinefunction, sync_to_async
 from django.shortcuts import get_object_or_404
 from django.http import HttpResponseForbidden, Http404
 from django.core.exceptions import ObjectDoesNotExist
 
-from organization.models import OrganizationMember
-
-from .models import Mission, MissionUser, MissionAsset, MissionOrganization
+from .membership import membership_get
+from .models import Mission, MissionUser, MissionAsset
 
 
 def mission_user_get(mission_id, user):
     """
     Get the mission_user for the given mission id and user.
+
+    Users that are members through an organization get an (unsaved) MissionUser with the member role.
     """
     mission = get_object_or_404(Mission, pk=mission_id)
-    # Find any direct membership first
-    try:
-        mission_user = MissionUser.objects.get(mission=mission, user=user)
+    membership = membership_get(mission.pk, user.pk)
+    if membership is None:
+        raise Http404("Not Found")
+    if membership[0] == 'user':
+        mission_user = MissionUser(**membership[1])
+        # Keep the mission and user, so views (especially async ones) don't have to fetch them again
+        mission_user.mission = mission
+        mission_user.user = user
         return mission_user
-    except ObjectDoesNotExist:
-        organization_member = OrganizationMember.objects.filter(organization__in=[mo.organization for mo in MissionOrganization.objects.filter(mission=mission, removed__isnull=True)], user=user, removed__isnull=True)
-        if organization_member:
-            return MissionUser(mission=mission, user=user, role='M')
-    raise Http404("Not Found")
+    return MissionUser(mission=mission, user=user, role='M')
+
+
+def request_mission_user(request, mission_id):
+    """
+    Get the mission_user for the user making the request
+
+    This is remembered for the rest of the request, so stacked decorators only check once.
+    """
+    mission_users = request.__dict__.setdefault('mission_users', {})
+    mission_id = int(mission_id)
+    if mission_id not in mission_users:
+        mission_users[mission_id] = mission_user_get(mission_id, request.user)
+    return mission_users[mission_id]
 
 
 def mission_is_member_no_variable(view_func):
@@ -32,7 +48,7 @@ def mission_is_member_no_variable(view_func):
     Make sure that user is a member of the mission
     """
     def wrapper_is_member(*args, **kwargs):
-        mission_user_get(kwargs['mission_id'], args[0].user)
+        request_mission_user(args[0], kwargs['mission_id'])
         kwargs.pop('mission_id')
         return view_func(*args, **kwargs)
     return wrapper_is_member
@@ -41,9 +57,17 @@ def mission_is_member_no_variable(view_func):
 def mission_is_member(view_func):
     """
     Make sure that user is a member of the mission
+
+    This also works for async views, the membership is checked in a thread.
     """
+    if iscoroutinefunction(view_func):
+        async def async_wrapper_is_member(*args, **kwargs):
+            mission_user = await sync_to_async(request_mission_user)(args[0], kwargs.pop('mission_id'))
+            return await view_func(*args, mission_user=mission_user, **kwargs)
+        return async_wrapper_is_member
+
     def wrapper_is_member(*args, **kwargs):
-        mission_user = mission_user_get(kwargs['mission_id'], args[0].user)
+        mission_user = request_mission_user(args[0], kwargs['mission_id'])
         kwargs.pop('mission_id')
         return view_func(*args, mission_user=mission_user, **kwargs)
     return wrapper_is_member
@@ -54,7 +78,7 @@ def mission_is_admin(view_func):
     Make sure the user is a member and they have an admin role of the mission
     """
     def wrapper_is_admin(*args, **kwargs):
-        mission_user = mission_user_get(kwargs['mission_id'], args[0].user)
+        mission_user = request_mission_user(args[0], kwargs['mission_id'])
         kwargs.pop('mission_id')
         if mission_user.is_admin():
             return view_func(*args, mission_user=mission_user, **kwargs)
@@ -67,7 +91,18 @@ def mission_asset_get(asset):
     Get the current MissionAsset object for an asset
     """
     try:
-        mission_asset = MissionAsset.objects.get(asset=asset, removed__isnull=True)
+        mission_asset = MissionAsset.objects.select_related('mission').get(asset=asset, removed__isnull=True)
+    except ObjectDoesNotExist:
+        mission_asset = None
+    return mission_asset
+
+
+async def amission_asset_get(asset):
+    """
+    Async version of mission_asset_get
+    """
+    try:
+        mission_asset = await MissionAsset.objects.select_related('mission').aget(asset=asset, removed__isnull=True)
     except ObjectDoesNotExist:
         mission_asset = None
     return mission_asset
@@ -77,6 +112,14 @@ def mission_asset_get_mission(view_func):
     """
     Find the current mission for the asset and add it to the parameters
     """
+    if iscoroutinefunction(view_func):
+        async def async_wrapper_mission(*args, **kwargs):
+            mission_asset = await amission_asset_get(kwargs['asset'])
+            if mission_asset is None:
+                return HttpResponseForbidden("This Asset is not currently in a mission")
+            return await view_func(*args, mission=mission_asset.mission, **kwargs)
+        return async_wrapper_mission
+
     def wrapper_mission(*args, **kwargs):
         mission_asset = mission_asset_get(kwargs['asset'])
         if mission_asset is None:
@@ -0,0 +1,392 @@
+"""
+Change events for missions, pushed to clients (see mission_events)
+
+Events are published from the places that record the timeline (timeline.helpers),
+and when positions are recorded. They are only delivered once the transaction
+they are part of commits, so clients can fetch the changes straight away.
+
+Events are sent on a channel, each mission has one (mission_channel), and so
+does each asset (asset_channel) for the commands that are sent to it.
+
+Events are delivered by a broker, chosen with the SMM_EVENT_BROKER setting:
+LocalBroker only delivers events within a single process (i.e. tests, runserver),
+PostgresBroker uses LISTEN/NOTIFY so events reach every worker, each
+worker process has one connection listening for them.
+"""
+
+import asyncio
+from functools import lru_cache, partial
+import json
+import logging
+import queue
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+import psycopg
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EVENT_BROKER = 'mission.events.LocalBroker'
+
+# How often (in seconds) to send a comment to keep idle connections open
+EVENT_KEEPALIVE = 15
+
+# How long (in seconds) a stream stays open, the client then reconnects,
+# which stops a stream being kept open after the client has gone
+EVENT_STREAM_DURATION = 300
+
+# How long (in ms) clients should wait before reconnecting
+EVENT_RETRY = 5000
+
+# The PostgreSQL notification channel PostgresBroker sends every event on
+EVENT_NOTIFY_CHANNEL = 'smm_events'
+
+# How long (in seconds) to wait for the PostgresBroker to start listening,
+# and how often its thread checks whether it should stop
+EVENT_LISTEN_TIMEOUT = 5
+
+# How long (in seconds) to wait before reconnecting when PostgresBroker loses its connection
+EVENT_RECONNECT_DELAY = 1
+
+
+def mission_channel(mission_id):
+    """
+    The channel for the events of a mission
+    """
+    return f'mission_{int(mission_id)}'
+
+
+def asset_channel(asset_id):
+    """
+    The channel for the events of an asset
+    """
+    return f'asset_{int(asset_id)}'
+
+
+class LocalBroker:
+    """
+    Deliver events to subscribers in the same process
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = {}
+
+    def publish(self, channel, event_type, data):
+        """
+        Send an event to everyone subscribed to the channel
+        """
+        with self.lock:
+            subscribers = list(self.subscribers.get(channel, ()))
+        for subscriber in subscribers:
+            subscriber.put((event_type, data))
+
+    def subscribe(self, channel):
+        """
+        Start receiving the events for a channel
+        """
+        return LocalSubscription(self, channel)
+
+    async def asubscribe(self, channel):
+        """
+        Start receiving the events for a channel, in the running event loop
+        """
+        return AsyncLocalSubscription(self, channel)
+
+    def add(self, channel, subscriber):
+        """
+        Add a subscriber (anything with a put method) to a channel
+        """
+        with self.lock:
+            self.subscribers.setdefault(channel, set()).add(subscriber)
+
+    def remove(self, channel, subscriber):
+        """
+        Remove a subscriber from a channel
+        """
+        with self.lock:
+            subscribers = self.subscribers.get(channel, set())
+            subscribers.discard(subscriber)
+            if not subscribers:
+                self.subscribers.pop(channel, None)
+
+
+class LocalSubscription:
+    """
+    The events for a channel, from a LocalBroker
+    """
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.events = queue.SimpleQueue()
+        broker.add(channel, self)
+
+    def put(self, event):
+        """
+        Deliver an event to this subscription
+        """
+        self.events.put(event)
+
+    def get(self, timeout):
+        """
+        Wait up to timeout (in seconds) for events, and return a list of (event_type, data)
+        """
+        try:
+            events = [self.events.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while not self.events.empty():
+            events.append(self.events.get())
+        return events
+
+    def close(self):
+        """
+        Stop receiving events
+        """
+        self.broker.remove(self.channel, self)
+
+
+class AsyncLocalSubscription:
+    """
+    The events for a channel, from a LocalBroker, for use in an event loop
+
+    Events can be published from any thread, they are passed to the loop.
+    """
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.events = asyncio.Queue()
+        broker.add(channel, self)
+
+    def put(self, event):
+        """
+        Deliver an event to this subscription
+        """
+        try:
+            self.loop.call_soon_threadsafe(self.events.put_nowait, event)
+        except RuntimeError:
+            # The loop has finished (i.e. the stream was never started), so nobody is listening
+            self.broker.remove(self.channel, self)
+
+    async def get(self, timeout):
+        """
+        Wait up to timeout (in seconds) for events, and return a list of (event_type, data)
+        """
+        try:
+            events = [await asyncio.wait_for(self.events.get(), timeout)]
+        except TimeoutError:
+            return []
+        while not self.events.empty():
+            events.append(self.events.get_nowait())
+        return events
+
+    async def close(self):
+        """
+        Stop receiving events
+        """
+        self.broker.remove(self.channel, self)
+
+
+def connection_params():
+    """
+    The parameters for connecting to the database, for subscriptions that need their own connection
+    """
+    database = settings.DATABASES['default']
+    params = {
+        'dbname': database.get('NAME'),
+        'user': database.get('USER'),
+        'password': database.get('PASSWORD'),
+        'host': database.get('HOST'),
+        'port': database.get('PORT'),
+    }
+    return {key: value for key, value in params.items() if value}
+
+
+class PostgresBroker(LocalBroker):
+    """
+    Deliver events to subscribers in any process, using PostgreSQL LISTEN/NOTIFY
+
+    Every event is sent on one notification channel (EVENT_NOTIFY_CHANNEL), with the
+    channel it is for. Each process has a single connection (outside django's pool)
+    listening from a thread, which passes the events to the subscribers in the process,
+    so subscribing doesn't need a connection.
+    """
+    def __init__(self):
+        super().__init__()
+        self.listener = None
+        self.listening = threading.Event()
+        self.stopping = threading.Event()
+
+    def publish(self, channel, event_type, data):
+        """
+        Send an event to everyone subscribed to the channel, in every process
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [EVENT_NOTIFY_CHANNEL, json.dumps([channel, event_type, data])])
+
+    def subscribe(self, channel):
+        """
+        Start receiving the events for a channel
+        """
+        self.listen()
+        return super().subscribe(channel)
+
+    async def asubscribe(self, channel):
+        """
+        Start receiving the events for a channel, in the running event loop
+        """
+        if not self.listening.is_set():
+            await asyncio.to_thread(self.listen)
+        return await super().asubscribe(channel)
+
+    def listen(self):
+        """
+        Start listening for events (if this process isn't already), and wait until it is
+        """
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(target=self.run, name='smm-events', daemon=True)
+                self.listener.start()
+        self.listening.wait(EVENT_LISTEN_TIMEOUT)
+
+    def run(self):
+        """
+        Pass the events to the subscribers in this process, until stopped
+        """
+        while not self.stopping.is_set():
+            try:
+                self.deliver()
+            except psycopg.Error:
+                logger.exception('Lost the connection listening for events, reconnecting')
+                self.stopping.wait(EVENT_RECONNECT_DELAY)
+
+    def deliver(self):
+        """
+        Connect and pass the events on, until stopped (or the connection fails)
+        """
+        listener = psycopg.connect(autocommit=True, **connection_params())
+        try:
+            listener.execute(f'LISTEN {EVENT_NOTIFY_CHANNEL}')
+            self.listening.set()
+            while not self.stopping.is_set():
+                for notify in listener.notifies(timeout=EVENT_LISTEN_TIMEOUT):
+                    super().publish(*json.loads(notify.payload))
+        finally:
+            self.listening.clear()
+            listener.close()
+
+    def stop(self):
+        """
+        Stop listening (i.e. at the end of a test)
+        """
+        with self.lock:
+            listener = self.listener
+            self.listener = None
+        if listener is not None:
+            self.stopping.set()
+            listener.join()
+            self.stopping.clear()
+
+
+@lru_cache
+def load_broker(path):
+    """
+    Create the broker from its import path
+    """
+    return import_string(path)()
+
+
+def get_broker():
+    """
+    The broker chosen by the SMM_EVENT_BROKER setting
+    """
+    return load_broker(getattr(settings, 'SMM_EVENT_BROKER', DEFAULT_EVENT_BROKER))
+
+
+def publish_channel_event(channel, event_type, data):
+    """
+    Publish an event on a channel once the current transaction commits
+
+    data needs to be serializable as json, and small (PostgreSQL limits notifications to 8000 bytes).
+    """
+    transaction.on_commit(partial(get_broker().publish, channel, event_type, data))
+
+
+def publish_event(mission, event_type, **data):
+    """
+    Publish an event for mission (a Mission or its pk) once the current transaction commits
+    """
+    mission_id = getattr(mission, 'pk', mission)
+    if mission_id is None:
+        return
+    publish_channel_event(mission_channel(mission_id), event_type, data)
+
+
+def publish_asset_event(asset_id, event_type, **data):
+    """
+    Publish an event for an asset once the current transaction commits
+    """
+    publish_channel_event(asset_channel(asset_id), event_type, data)
+
+
+def release_db_connection():
+    """
+    Give this thread's database connection back (to the pool), before waiting for events
+
+    Waiting views don't need the database, so they shouldn't hold a connection while they wait.
+    Connections inside a transaction (i.e. in a test case) are kept.
+    """
+    if not connection.in_atomic_block:
+        connection.close()
+
+
+async def arelease_db_connection():
+    """
+    Async version of release_db_connection, for the connection async views use (through sync_to_async)
+    """
+    await sync_to_async(release_db_connection)()
+
+
+def event_messages(events):
+    """
+    The text/event-stream messages for a list of (event_type, data), a keepalive if there aren't any
+    """
+    if not events:
+        return [': keepalive\n\n']
+    return [f'event: {event_type}\ndata: {json.dumps(data)}\n\n' for event_type, data in events]
+
+
+async def event_stream(subscription, duration=EVENT_STREAM_DURATION, keepalive=EVENT_KEEPALIVE):
+    """
+    Generate the text/event-stream for an (async) subscription
+
+    The subscription is closed when the stream finishes, or the client goes away.
+    """
+    try:
+        yield f'retry: {EVENT_RETRY}\n\n'
+        end = time.monotonic() + duration
+        while (remaining := end - time.monotonic()) > 0:
+            for message in event_messages(await subscription.get(timeout=min(keepalive, remaining))):
+                yield message
+    finally:
+        await subscription.close()
+
+
+def sync_event_stream(subscription, duration=EVENT_STREAM_DURATION, keepalive=EVENT_KEEPALIVE):
+    """
+    Generate the text/event-stream for a (sync) subscription, for WSGI servers
+
+    WSGI servers can only stream from a sync iterator, which holds a worker thread until it finishes.
+    """
+    try:
+        yield f'retry: {EVENT_RETRY}\n\n'
+        end = time.monotonic() + duration
+        while (remaining := end - time.monotonic()) > 0:
+            yield from event_messages(subscription.get(timeout=min(keepalive, remaining)))
+    finally:
+        subscription.close()
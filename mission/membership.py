@@ -0,0 +1,72 @@
+"""
+Resolving (and caching) who is a member of a mission
+
+Users are members of a mission directly (a MissionUser), or through an
+organization that is part of the mission. This is checked on nearly every
+request, so the answer is cached for a short time (SMM_MEMBERSHIP_CACHE_TTL seconds).
+
+The versions (see smm.cache_versions) of the mission's members and the user's
+organizations are part of the key, the signals (see mission.signals and
+organization.signals) change them whenever the membership changes. The cache is django's
+default cache, if that is per process (i.e. the default LocMemCache) other
+processes only see the change once the TTL passes.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+from organization.helpers import user_organizations_version
+from organization.models import OrganizationMember
+from smm.cache_versions import cache_version, cache_version_changed
+
+from .models import MissionOrganization, MissionUser
+
+
+DEFAULT_MEMBERSHIP_CACHE_TTL = 30
+
+
+def membership_cache_ttl():
+    """
+    How long (in seconds) to cache membership for
+    """
+    return getattr(settings, 'SMM_MEMBERSHIP_CACHE_TTL', DEFAULT_MEMBERSHIP_CACHE_TTL)
+
+
+def mission_membership_changed(mission_id):
+    """
+    The users/organizations of a mission have changed
+    """
+    cache_version_changed('mission_members', mission_id)
+
+
+def membership_lookup(mission_id, user_id):
+    """
+    Find how the user is a member of the mission from the database
+
+    Returns ('user', fields of the MissionUser), ('organization',) or None
+    """
+    mission_user = MissionUser.objects.filter(mission_id=mission_id, user_id=user_id).values().first()
+    if mission_user is not None:
+        return ('user', mission_user)
+    # One query covers all the (current) organizations of the mission
+    mission_organizations = MissionOrganization.objects.filter(mission_id=mission_id, removed__isnull=True).values('organization_id')
+    if OrganizationMember.objects.filter(user_id=user_id, removed__isnull=True, organization_id__in=mission_organizations).exists():
+        return ('organization',)
+    return None
+
+
+def membership_get(mission_id, user_id):
+    """
+    Find how the user is a member of the mission, using the cache when possible
+
+    See membership_lookup for what is returned
+    """
+    key = f'smm_membership_{int(mission_id)}_{int(user_id)}_{cache_version("mission_members", mission_id)}_{user_organizations_version(user_id)}'
+    membership = cache.get(key)
+    if membership is None:
+        membership = membership_lookup(mission_id, user_id)
+        # Non-members are cached too, as ('none',)
+        cache.set(key, membership or ('none',), membership_cache_ttl())
+    elif membership == ('none',):
+        membership = None
+    return membership
@@ -3,6 +3,7 @@ Models for missions (and mission membership)
 """
 
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 
@@ -36,14 +37,24 @@ class Mission(models.Model):
             'admin': admin,
         }
 
+    @classmethod
+    def user_filter(cls, user, field='pk'):
+        """
+        Filter for field (a mission id) being one of the missions user is a member of (either directly or via an organization)
+
+        The missions are found with subqueries, so this becomes part of the query it is used in
+        """
+        user_missions = MissionUser.objects.filter(user=user).values('mission_id')
+        organization_missions = MissionOrganization.objects.filter(
+            organization_id__in=OrganizationMember.user_current(user).values('organization_id'), removed__isnull=True).values('mission_id')
+        return Q(**{f'{field}__in': user_missions}) | Q(**{f'{field}__in': organization_missions})
+
     @classmethod
     def all_user_missions(cls, user):
         """
         Get all missions the given user is a member of (either directly or via an organization)
         """
-        missions = list(MissionUser.user_missions(user))
-        missions = missions + list(MissionOrganization.mission_user(user))
-        return missions
+        return cls.objects.filter(cls.user_filter(user))
 
 
 class MissionUser(models.Model):
@@ -215,5 +226,5 @@ class MissionOrganization(models.Model):
         """
         Get all the missions a user is in because they are in an organization
         """
-        user_organizations = OrganizationMember.user_current(user)
-        return Mission.objects.filter(missionorganization__organization__in=[user_org.organization for user_org in user_organizations], missionorganization__removed__isnull=True)
+        user_organizations = OrganizationMember.user_current(user).values('organization_id')
+        return Mission.objects.filter(missionorganization__organization__in=user_organizations, missionorganization__removed__isnull=True)
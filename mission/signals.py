@@ -0,0 +1,21 @@
+"""
+Forget the cached membership (see mission.membership) when it changes
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .membership import mission_membership_changed
+from .models import MissionOrganization, MissionUser
+
+
+@receiver(post_save, sender=MissionUser)
+@receiver(post_delete, sender=MissionUser)
+@receiver(post_save, sender=MissionOrganization)
+@receiver(post_delete, sender=MissionOrganization)
+def mission_members_changed(sender, instance, **kwargs):
+    # pylint: disable=W0613
+    """
+    A user/organization has been added to (or removed from) a mission, or their role has changed
+    """
+    mission_membership_changed(instance.mission_id)
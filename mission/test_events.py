@@ -0,0 +1,180 @@
+"""
+Tests for mission events
+"""
+
+import asyncio
+import threading
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.test import AsyncClient, SimpleTestCase, TransactionTestCase
+
+from .events import LocalBroker, PostgresBroker, event_stream, publish_event, get_broker, mission_channel
+from .tests import MissionBaseTestCase
+
+
+class LocalBrokerTestCase(SimpleTestCase):
+    """
+    Test delivering events within a process
+    """
+    def test_publish(self):
+        """
+        Check events only go to subscribers of the mission
+        """
+        broker = LocalBroker()
+        subscription_1 = broker.subscribe('mission_1')
+        subscription_2 = broker.subscribe('mission_2')
+        broker.publish('mission_1', 'created', {'model': 'data.geotimelabel', 'pk': 10})
+        broker.publish('mission_1', 'deleted', {'model': 'data.geotimelabel', 'pk': 10})
+        self.assertEqual(subscription_1.get(timeout=0.1), [('created', {'model': 'data.geotimelabel', 'pk': 10}), ('deleted', {'model': 'data.geotimelabel', 'pk': 10})])
+        self.assertEqual(subscription_1.get(timeout=0.01), [])
+        self.assertEqual(subscription_2.get(timeout=0.01), [])
+        subscription_1.close()
+        subscription_2.close()
+        self.assertEqual(broker.subscribers, {})
+        # Nothing is delivered after closing
+        broker.publish('mission_1', 'created', {'pk': 11})
+        self.assertEqual(subscription_1.get(timeout=0.01), [])
+
+    def test_stream(self):
+        """
+        Check the format of the event stream
+        """
+        broker = LocalBroker()
+
+        async def read_stream():
+            subscription = await broker.asubscribe('mission_1')
+            stream = event_stream(subscription, duration=1, keepalive=0.01)
+            self.assertTrue((await anext(stream)).startswith('retry: '))
+            self.assertEqual(await anext(stream), ': keepalive\n\n')
+            broker.publish('mission_1', 'position', {'model': 'data.assetpointtime', 'asset': 3})
+            self.assertEqual(await anext(stream), 'event: position\ndata: {"model": "data.assetpointtime", "asset": 3}\n\n')
+            await stream.aclose()
+
+        asyncio.run(read_stream())
+        self.assertEqual(broker.subscribers, {})
+
+    def test_subscription_loop_finished(self):
+        """
+        Check an async subscription whose loop has finished is removed
+        """
+        broker = LocalBroker()
+
+        async def subscribe():
+            return await broker.asubscribe('mission_1')
+
+        asyncio.run(subscribe())
+        broker.publish('mission_1', 'created', {'pk': 1})
+        self.assertEqual(broker.subscribers, {})
+
+    def test_async_subscription(self):
+        """
+        Check events published from another thread reach an async subscription
+        """
+        broker = LocalBroker()
+
+        async def wait_for_event():
+            subscription = await broker.asubscribe('asset_1')
+            self.assertEqual(await subscription.get(timeout=0.01), [])
+            publisher = threading.Thread(target=broker.publish, args=('asset_1', 'asset_command', {'pk': 5}))
+            publisher.start()
+            events = await subscription.get(timeout=1)
+            publisher.join()
+            await subscription.close()
+            return events
+
+        self.assertEqual(asyncio.run(wait_for_event()), [('asset_command', {'pk': 5})])
+        self.assertEqual(broker.subscribers, {})
+
+
+class PostgresBrokerTestCase(TransactionTestCase):
+    """
+    Test delivering events through PostgreSQL
+    """
+    def test_one_listener(self):
+        """
+        Check every subscriber in the process shares one connection, and gets only the events for its channel
+        """
+        broker = PostgresBroker()
+        self.addCleanup(broker.stop)
+        subscriptions = [broker.subscribe(mission_channel(1)) for _ in range(10)]
+        other = broker.subscribe(mission_channel(2))
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM pg_stat_activity WHERE datname = current_database() AND query = %s', ['LISTEN smm_events'])
+            self.assertEqual(cursor.fetchone()[0], 1)
+        broker.publish(mission_channel(1), 'created', {'pk': 1})
+        for subscription in subscriptions:
+            self.assertEqual(subscription.get(timeout=5), [('created', {'pk': 1})])
+            subscription.close()
+        self.assertEqual(other.get(timeout=0.1), [])
+        other.close()
+
+
+class MissionEventsTestCase(MissionBaseTestCase):
+    """
+    Test the mission events API
+    """
+    def test_events_published(self):
+        """
+        Check changes in the mission are published once they are committed
+        """
+        mission = self.missions.create_mission('test_events_published')
+        subscription = get_broker().subscribe(mission_channel(mission.mission_pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.smm.client1.post(f'/mission/{mission.mission_pk}/data/pois/create/', {'lat': -43.5, 'lon': 172.5, 'label': 'Event POI'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(subscription.get(timeout=0.01), [])
+        events = subscription.get(timeout=0.1)
+        subscription.close()
+        event_types = [event_type for event_type, _ in events]
+        self.assertTrue('created' in event_types)
+        self.assertTrue('timeline' in event_types)
+        created = events[event_types.index('created')][1]
+        self.assertEqual(created['model'], 'data.geotimelabel')
+        self.assertEqual(str(created['pk']), response.json()['features'][0]['properties']['pk'])
+
+    def test_events_nothing_without_mission(self):
+        """
+        Objects without a mission don't have events
+        """
+        with self.captureOnCommitCallbacks() as callbacks:
+            publish_event(None, 'created', pk=1)
+        self.assertEqual(callbacks, [])
+
+    async def test_events_stream(self):
+        """
+        Check the events are streamed as they happen, and only members can get the event stream
+        """
+        mission = await sync_to_async(self.missions.create_mission)('test_events_stream')
+        events_url = f'/mission/{mission.mission_pk}/events/'
+        client = AsyncClient()
+        await client.aforce_login(self.smm.user1)
+        response = await client.get(events_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(response.is_async)
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await asyncio.wait_for(anext(stream), 5)).startswith(b'retry: '))
+        # The event arrives straight away, long before the stream ends
+        get_broker().publish(mission_channel(mission.mission_pk), 'created', {'model': 'data.geotimelabel', 'pk': 1})
+        self.assertEqual(await asyncio.wait_for(anext(stream), 5), b'event: created\ndata: {"model": "data.geotimelabel", "pk": 1}\n\n')
+        await stream.aclose()
+        await client.alogout()
+        await client.aforce_login(self.smm.user2)
+        self.assertEqual((await client.get(events_url)).status_code, 404)
+        await client.alogout()
+        self.assertEqual((await client.get(events_url)).status_code, 302)
+
+    def test_events_stream_wsgi(self):
+        """
+        Check WSGI servers get a stream they can send as the events happen
+        """
+        mission = self.missions.create_mission('test_events_stream_wsgi')
+        response = self.smm.client1.get(f'/mission/{mission.mission_pk}/events/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.is_async)
+        stream = iter(response.streaming_content)
+        self.assertTrue(next(stream).startswith(b'retry: '))
+        get_broker().publish(mission_channel(mission.mission_pk), 'created', {'model': 'data.geotimelabel', 'pk': 1})
+        self.assertEqual(next(stream), b'event: created\ndata: {"model": "data.geotimelabel", "pk": 1}\n\n')
+        response.close()
@@ -1,8 +1,15 @@
 """
 Tests for Mission interactions with Organizations
 """
+from django.contrib.gis.geos import Point
+from django.test import RequestFactory
+
+from data.models import GeoTimeLabel
+from data.decorators import mission_layers
 from organization.tests import OrganizationFunctions
+from smm.tests import response_json
 
+from .models import Mission
 from .tests import MissionBaseTestCase
 
 
@@ -84,3 +91,50 @@ class MissionOrganizationsTestCase(MissionOrganizationBaseTestCase):
         org1.remove_user(self.smm.user2, client=self.smm.client1)
         mission_list = self.missions.get_mission_list(client=self.smm.client2)
         self.assertEqual(len(mission_list), 0)
+
+    def test_mission_organization_member_access(self):
+        """
+        Check access through an organization follows changes to the organization straight away
+        """
+        org1 = self.orgs.create_organization()
+        mission = self.missions.create_mission('test_mission_org_access', mission_description='test description')
+        self.assertEqual(mission.get_details(client=self.smm.client2).status_code, 404)
+        # Add the organization, then the user to the organization
+        mission.add_organization(org1)
+        self.assertEqual(mission.get_details(client=self.smm.client2).status_code, 404)
+        org1.add_user(self.smm.user2, client=self.smm.client1)
+        self.assertEqual(mission.get_details(client=self.smm.client2).status_code, 200)
+        # Remove the user from the organization, check they can't access it any more
+        org1.remove_user(self.smm.user2, client=self.smm.client1)
+        self.assertEqual(mission.get_details(client=self.smm.client2).status_code, 404)
+
+    def test_mission_organization_all_missions_data(self):
+        """
+        Check data from missions the user is in directly and through an organization is found with one query
+        """
+        mission1 = self.missions.create_mission('test_mission_all_direct')
+        mission1.add_user(user=self.smm.user2)
+        mission2 = self.missions.create_mission('test_mission_all_org')
+        org1 = self.orgs.create_organization()
+        mission2.add_organization(org1)
+        org1.add_user(self.smm.user2, client=self.smm.client1)
+        # The user is in mission3 both ways, it should only appear once
+        mission3 = self.missions.create_mission('test_mission_all_both')
+        mission3.add_user(user=self.smm.user2)
+        mission3.add_organization(org1)
+        self.missions.create_mission('test_mission_all_other')
+        missions = [mission1.get_object(), mission2.get_object(), mission3.get_object()]
+        for mission in missions:
+            GeoTimeLabel.objects.create(geo=Point(172.5, -43.5), label=mission.mission_name, mission=mission, created_by=self.smm.user1, geo_type='poi')
+        self.assertEqual(sorted(mission.pk for mission in Mission.all_user_missions(self.smm.user2)), [mission.pk for mission in missions])
+        with self.assertNumQueries(1):
+            labels = sorted(poi.label for poi in GeoTimeLabel.all_current_user(self.smm.user2))
+        self.assertEqual(labels, ['test_mission_all_both', 'test_mission_all_direct', 'test_mission_all_org'])
+        # The change versions of the layers only need the missions
+        request = RequestFactory().get('/mission/all/data/pois/current/')
+        request.user = self.smm.user2
+        with self.assertNumQueries(1):
+            self.assertEqual(len(mission_layers(GeoTimeLabel)(request)), 3)
+        response = self.smm.client2.get('/mission/all/data/pois/current/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response_json(response)['features']), 3)
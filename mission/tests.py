@@ -2,9 +2,11 @@
 Tests for missions
 """
 
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from smm.tests import SMMTestUsers
+from smm.tests import SMMTestUsers, QueryBudgetMixin, response_metrics
 
 from assets.tests import AssetsHelpers
 
@@ -144,7 +146,7 @@ class MissionBaseTestCase(TestCase):
         self.missions = MissionFunctions(self.smm)
 
 
-class MissionTestCase(MissionBaseTestCase):
+class MissionTestCase(QueryBudgetMixin, MissionBaseTestCase):
     """
     Test Missions API
     """
@@ -198,6 +200,23 @@ class MissionTestCase(MissionBaseTestCase):
         response = mission.get_details(client=self.smm.unauth_client)
         self.assertEqual(response.status_code, 302)
 
+    def test_mission_user_access_cached(self):
+        """
+        Check the membership is only looked up once, until it changes
+        """
+        mission = self.missions.create_mission('test_mission_user_access_cached')
+        mission.add_user(client=self.smm.client1, user=self.smm.user2)
+        with CaptureQueriesContext(connection) as first:
+            self.assertEqual(mission.get_details(client=self.smm.client2).status_code, 200)
+        with CaptureQueriesContext(connection) as second:
+            self.assertEqual(mission.get_details(client=self.smm.client2).status_code, 200)
+        self.assertLess(len(second), len(first))
+        # Make the user an admin, and check they can now close the mission
+        mission.make_admin(client=self.smm.client1, user=self.smm.user2)
+        response = mission.close(client=self.smm.client2)
+        self.assertEqual(response.redirect_chain[0][0], '/')
+        self.assertIsNotNone(mission.get_object().closed)
+
     def test_mission_close(self):
         """
         Check that a mission can be closed
@@ -289,6 +308,18 @@ class MissionTestCase(MissionBaseTestCase):
         self.assertIsNotNone(mission_list[0]['closed'])
         self.assertEqual(mission_list[0]['closed_by'], self.smm.user1.username)
 
+    def test_mission_list_query_budget(self):
+        """
+        Check the number of queries for the mission list doesn't depend on the number of missions
+        """
+        self.missions.create_mission('test_mission_list_budget_1')
+        budget = response_metrics(self.smm.client1.get('/mission/list/'))['queries']
+        self.missions.create_mission('test_mission_list_budget_2')
+        self.missions.create_mission('test_mission_list_budget_3').close()
+        response = self.smm.client1.get('/mission/list/')
+        self.assertEqual(len(response.json()['missions']), 3)
+        self.assertQueryBudget(response, budget)
+
     def test_mission_list_only(self):
         """
         Check the mission list contains missions and only the ones required
@@ -10,6 +10,7 @@ from . import views
 urlpatterns = [
     re_path(r'^mission/(?P<mission_id>\d+)/details/$', views.mission_details, name='mission_details'),
     re_path(r'^mission/(?P<mission_id>\d+)/timeline/$', views.MissionTimelineView.as_view(), name='mission_timeline'),
+    re_path(r'^mission/(?P<mission_id>\d+)/events/$', views.mission_events, name='mission_events'),
     re_path(r'^mission/(?P<mission_id>\d+)/organizations/add/$', views.mission_organization_add, name='mission_organization_add'),
     re_path(r'^mission/(?P<mission_id>\d+)/users/add/$', views.mission_user_add, name='mission_user_add'),
     re_path(r'^mission/(?P<mission_id>\d+)/users/(?P<user_id>\d+)/make/admin/$', views.mission_user_make_admin, name='mission_user_make_admin'),
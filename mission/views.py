@@ -2,12 +2,14 @@
 Mission Create/Management Views.
 """
 
+from asgiref.sync import sync_to_async
 from django.core.exceptions import ObjectDoesNotExist
+from django.core.handlers.asgi import ASGIRequest
 from django.shortcuts import render, redirect, get_object_or_404
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponseRedirect, HttpResponseForbidden, HttpResponseNotFound, HttpResponse
+from django.http import JsonResponse, HttpResponseRedirect, HttpResponseForbidden, HttpResponseNotFound, HttpResponse, StreamingHttpResponse
 from django.db.models import OuterRef, Subquery
 from django.utils import timezone
 from django.utils.decorators import method_decorator
@@ -17,6 +19,8 @@ from django.views.decorators.csrf import ensure_csrf_cookie
 
 from assets.models import Asset, AssetCommand
 from assets.decorators import asset_is_operator
+from data.decorators import data_conditional
+from data.models import ChangeVersion
 from organization.models import OrganizationMember, OrganizationAsset
 from timeline.models import TimeLineEntry
 from timeline.helpers import timeline_record_create, timeline_record_mission_organization_add, timeline_record_mission_user_add, \
@@ -25,6 +29,7 @@ from timeline.helpers import timeline_record_create, timeline_record_mission_org
 from .models import Mission, MissionUser, MissionAsset, MissionAssetType, MissionOrganization, MissionAssetStatus, MissionAssetStatusValue
 from .forms import MissionForm, MissionUserForm, MissionAssetForm, MissionOrganizationForm
 from .decorators import mission_is_member, mission_is_admin
+from .events import arelease_db_connection, event_stream, get_broker, mission_channel, sync_event_stream
 
 
 @login_required
@@ -104,9 +109,10 @@ def mission_list_data(request):
         if only == 'closed':
             exclude_open = True
 
-    user_missions = MissionUser.objects.filter(user=request.user)
-    organization_missions = MissionOrganization.objects.filter(organization__in=[organization_member.organization for organization_member in OrganizationMember.user_current(user=request.user)])
-    organization_missions = organization_missions.exclude(mission__in=[user_mission.mission for user_mission in user_missions])
+    user_missions = MissionUser.objects.filter(user=request.user).select_related('mission__creator', 'mission__closed_by')
+    organization_missions = MissionOrganization.objects.filter(organization__in=OrganizationMember.user_current(user=request.user).values('organization_id'))
+    organization_missions = organization_missions.select_related('mission__creator', 'mission__closed_by')
+    organization_missions = organization_missions.exclude(mission__in=user_missions.values('mission_id'))
     organization_missions = organization_missions.distinct('mission')
     if exclude_closed:
         organization_missions = organization_missions.exclude(mission__closed__isnull=False)
@@ -192,6 +198,30 @@ class MissionTimelineView(View):
         return HttpResponse("Failed")
 
 
+@login_required
+@mission_is_member
+async def mission_events(request, mission_user):
+    """
+    Stream the changes in a mission as server-sent events
+
+    Under ASGI the stream is async, so an open stream doesn't hold a worker thread.
+    WSGI servers can't stream async iterators (django would collect the whole stream
+    before sending any of it), so they get a sync stream instead.
+    Either way, the database connection is given back before streaming.
+    """
+    channel = mission_channel(mission_user.mission.pk)
+    if isinstance(request, ASGIRequest):
+        stream = event_stream(await get_broker().asubscribe(channel))
+    else:
+        stream = sync_event_stream(await sync_to_async(get_broker().subscribe)(channel))
+    await arelease_db_connection()
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx buffering the events
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 @mission_is_admin
 def mission_organization_add(request, mission_user):
@@ -368,9 +398,20 @@ def mission_asset_remove(request, mission_user, asset_id):
     return HttpResponseRedirect(f'/mission/{mission_user.mission.pk}/details/')
 
 
+def mission_asset_status_version_keys(request, mission_user, **kwargs):
+    # pylint: disable=W0613
+    """
+    The change versions that cover the json status of an asset in a mission
+    """
+    if "application/json" not in request.META.get('HTTP_ACCEPT', ''):
+        return None
+    return [ChangeVersion.mission_key(mission_user.mission.pk, model._meta.label_lower) for model in (MissionAsset, MissionAssetStatus)]
+
+
 @method_decorator(login_required, name="dispatch")
 @method_decorator(mission_is_member, name="dispatch")
 @method_decorator(asset_is_operator, name="post")
+@method_decorator(data_conditional(mission_asset_status_version_keys), name="get")
 class MissionAssetStatusView(View):
     """
     View the asset status in this mission
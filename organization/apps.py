@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class OrganisationConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "organization"
+
+    def ready(self):
+        # Connect the signal handlers that keep the cached membership up to date
+        from . import signals  # pylint: disable=C0415,W0611
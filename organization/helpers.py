@@ -1,31 +1,85 @@
+"""
+Checking what users can do because of the organizations they are in
+
+What a user can do for an asset (the capabilities) is cached for a short time
+(SMM_CAPABILITY_CACHE_TTL seconds), the versions (see smm.cache_versions) of the
+user's and asset's organizations are part of the key, and the signals (see
+organization.signals) change them whenever the organizations change.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+from smm.cache_versions import cache_version, cache_version_changed
+
 from .models import OrganizationAsset, OrganizationMember
 
 
+DEFAULT_CAPABILITY_CACHE_TTL = 30
+
+ASSET_RECORDER = 'recorder'
+ASSET_RADIO_OPERATOR = 'radio_operator'
+
+# The roles that give each capability, see OrganizationMember.is_asset_recorder/is_radio_operator
+ASSET_CAPABILITY_ROLES = {
+    ASSET_RECORDER: OrganizationMember.ASSET_RECORDER_ROLES,
+    ASSET_RADIO_OPERATOR: OrganizationMember.RADIO_OPERATOR_ROLES,
+}
+
+
+def user_organizations_version(user_id):
+    """
+    The version of the organizations a user is in
+    """
+    return cache_version('user_organizations', user_id)
+
+
+def user_organizations_changed(user_id):
+    """
+    The organizations a user is in (or their roles) have changed
+    """
+    cache_version_changed('user_organizations', user_id)
+
+
+def asset_organizations_changed(asset_id):
+    """
+    The organizations an asset is in have changed
+    """
+    cache_version_changed('asset_organizations', asset_id)
+
+
+def organization_user_asset_members(user, asset):
+    """
+    The current memberships of the user in the organizations the asset is currently in
+    """
+    asset_organizations = OrganizationAsset.objects.filter(asset=asset, removed__isnull=True).values('organization_id')
+    return OrganizationMember.objects.filter(user=user, removed__isnull=True, organization_id__in=asset_organizations)
+
+
 def organization_user_is_asset_recorder(user, asset):
     """
     Check if given user is has privileges to record as an asset
     """
-    # Find all the organizations that this asset is a member of
-    org_memberships = OrganizationAsset.objects.filter(asset=asset, removed__isnull=True)
-    for org in org_memberships:
-        # see if this user is in the org
-        org_users = OrganizationMember.objects.filter(user=user, organization=org.organization, removed__isnull=True)
-        for org_user in org_users:
-            if org_user.is_asset_recorder():
-                return True
-    return False
+    return organization_user_asset_members(user, asset).filter(role__in=OrganizationMember.ASSET_RECORDER_ROLES).exists()
 
 
 def organization_user_is_asset_radio_operator(user, asset):
     """
     Check if given user is has privileges to act as radio operator for an asset
     """
-    # Find all the organizations that this asset is a member of
-    org_memberships = OrganizationAsset.objects.filter(asset=asset, removed__isnull=True)
-    for org in org_memberships:
-        # see if this user is in the org
-        org_users = OrganizationMember.objects.filter(user=user, organization=org.organization, removed__isnull=True)
-        for org_user in org_users:
-            if org_user.is_radio_operator():
-                return True
-    return False
+    return organization_user_asset_members(user, asset).filter(role__in=OrganizationMember.RADIO_OPERATOR_ROLES).exists()
+
+
+def organization_user_asset_capabilities(user, asset):
+    """
+    Find what the user can do for the asset (ASSET_RECORDER and/or ASSET_RADIO_OPERATOR) because of their organizations
+
+    This is one query for all the capabilities, and the answer is cached.
+    """
+    key = f'smm_asset_capabilities_{int(user.pk)}_{int(asset.pk)}_{user_organizations_version(user.pk)}_{cache_version("asset_organizations", asset.pk)}'
+    capabilities = cache.get(key)
+    if capabilities is None:
+        roles = set(organization_user_asset_members(user, asset).values_list('role', flat=True))
+        capabilities = frozenset(capability for capability, capability_roles in ASSET_CAPABILITY_ROLES.items() if roles.intersection(capability_roles))
+        cache.set(key, capabilities, getattr(settings, 'SMM_CAPABILITY_CACHE_TTL', DEFAULT_CAPABILITY_CACHE_TTL))
+    return capabilities
@@ -53,6 +53,9 @@ class OrganizationMember(models.Model):
     )
     role = models.CharField(max_length=1, choices=USER_ROLE, default='M')
 
+    RADIO_OPERATOR_ROLES = ('A', 'R')
+    ASSET_RECORDER_ROLES = ('A', 'b')
+
     def user_role_name(self):
         """
         Return a human-readable name for this users' role.
@@ -87,10 +90,10 @@ class OrganizationMember(models.Model):
         return self.role == 'A'
 
     def is_radio_operator(self):
-        return self.role in ('A', 'R')
+        return self.role in self.RADIO_OPERATOR_ROLES
 
     def is_asset_recorder(self):
-        return self.role in ('A', 'b')
+        return self.role in self.ASSET_RECORDER_ROLES
 
     @classmethod
     def user_current(cls, user):
@@ -0,0 +1,29 @@
+"""
+Forget the cached membership and capabilities (see organization.helpers, mission.membership) when they change
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .helpers import asset_organizations_changed, user_organizations_changed
+from .models import OrganizationAsset, OrganizationMember
+
+
+@receiver(post_save, sender=OrganizationMember)
+@receiver(post_delete, sender=OrganizationMember)
+def organization_member_changed(sender, instance, **kwargs):
+    # pylint: disable=W0613
+    """
+    A user has joined/left an organization (or changed role), which changes the missions and assets they can use
+    """
+    user_organizations_changed(instance.user_id)
+
+
+@receiver(post_save, sender=OrganizationAsset)
+@receiver(post_delete, sender=OrganizationAsset)
+def organization_asset_changed(sender, instance, **kwargs):
+    # pylint: disable=W0613
+    """
+    An asset has been added to/removed from an organization, which changes who can use it
+    """
+    asset_organizations_changed(instance.asset_id)
@@ -11,6 +11,7 @@ from search.models import Search, SearchParams
 from smm.tests import SMMTestUsers
 from assets.tests import AssetsHelpers
 from mission.tests import MissionFunctions
+from .helpers import organization_user_asset_capabilities, organization_user_is_asset_radio_operator, organization_user_is_asset_recorder, ASSET_RADIO_OPERATOR, ASSET_RECORDER
 from .tests import OrganizationFunctions
 
 
@@ -73,6 +74,26 @@ class RadioOperatorTestCase(TestCase):
         response = self.smm.client2.get(asset_details_url, HTTP_ACCEPT='application/json')
         self.assertEqual(response.status_code, 200)
 
+    def test_0020_asset_capabilities(self):
+        """
+        Check the capabilities for an asset follow the role of the user in the organization
+        """
+        org1 = self.orgs.create_organization(client=self.smm.client1)
+        asset1 = self.assets.create_asset()
+        self.assertEqual(organization_user_asset_capabilities(self.smm.user2, asset1), frozenset())
+        org1.add_asset(asset1)
+        for role, capabilities in (('M', set()), ('R', {ASSET_RADIO_OPERATOR}), ('b', {ASSET_RECORDER}), ('A', {ASSET_RADIO_OPERATOR, ASSET_RECORDER})):
+            org1.add_user(self.smm.user2, role=role)
+            self.assertEqual(organization_user_asset_capabilities(self.smm.user2, asset1), capabilities)
+            self.assertEqual(organization_user_is_asset_radio_operator(self.smm.user2, asset1), ASSET_RADIO_OPERATOR in capabilities)
+            self.assertEqual(organization_user_is_asset_recorder(self.smm.user2, asset1), ASSET_RECORDER in capabilities)
+        # Check the cached capabilities are used
+        with self.assertNumQueries(0):
+            organization_user_asset_capabilities(self.smm.user2, asset1)
+        # Remove the user from the organization
+        org1.remove_user(self.smm.user2)
+        self.assertEqual(organization_user_asset_capabilities(self.smm.user2, asset1), frozenset())
+
     def test_0100_mission_asset_accept_search(self):
         """
         Check that a radio operator can accept a search on behalf of a half an asset
@@ -6,29 +6,22 @@ all inherting from the abstract model (SearchPath)
 """
 import math
 
-from django.db import models, connection as dbconn
+import numpy as np
+from django.db import models
 from django.db.models import Func, Q
 from django.contrib.gis.db.models.functions import Distance
 from django.contrib.auth import get_user_model
-from django.contrib.gis.geos import GEOSGeometry, LineString
+from django.contrib.gis.geos import LineString
 from django.utils import timezone
 
-from data.models import GeoTime, GeoTimeLabel
+from data.models import ChangeVersion, GeoTime, GeoTimeLabel
 from assets.models import AssetType, Asset
 from search.polygon.convex import creep_line_concave as polygon_creep_line
-from search.polygon.convex import conv_lonlat_to_meters, conv_meters_to_lonlat
+from search.polygon.convex import conv_lonlat_to_local, conv_local_to_lonlat
+from smm.geodesy import geodesic_direct, geodesic_inverse, project, project_points
 from timeline.helpers import timeline_record_search_queue, timeline_record_search_begin
 
 
-def dictfetchall(cursor):
-    "Return all rows from a cursor as a dict"
-    columns = [col[0] for col in cursor.description]
-    return [
-        dict(zip(columns, row))
-        for row in cursor.fetchall()
-    ]
-
-
 class SearchParams():
     """
     Basic parameters for a search
@@ -69,6 +62,12 @@ class SearchParams():
         """
         return self._sweep_width
 
+    def preview_key(self):
+        """
+        The parameters (other than the datum) that change the path of the search
+        """
+        return (self._sweep_width,)
+
 
 class FirstPointDistance(Func):
     """
@@ -90,6 +89,7 @@ class Search(GeoTime):
 
     There are a variety of search types we can handle, each one has it's own create function.
     """
+    # pylint: disable=R0904
     created_for = models.ForeignKey(AssetType, on_delete=models.PROTECT)
     sweep_width = models.IntegerField()
     inprogress_at = models.DateTimeField(null=True, blank=True)
@@ -129,6 +129,8 @@ class Search(GeoTime):
         'first_bearing',
         'width', )
 
+    CHANGE_FIELDS = GeoTime.CHANGE_FIELDS + ('inprogress_at', 'completed_at', 'queued_at', )
+
     def distance_from(self, point):
         """
         Calculate the distance (in m) from a point to the start of this search
@@ -136,6 +138,13 @@ class Search(GeoTime):
         annotated_self = self.__class__.objects.annotate(distance=FirstPointDistance('geo', output_field=models.FloatField(), point=point)).get(pk=self.pk)
         return annotated_self.distance
 
+    async def adistance_from(self, point):
+        """
+        Async version of distance_from
+        """
+        annotated_self = await self.__class__.objects.annotate(distance=FirstPointDistance('geo', output_field=models.FloatField(), point=point)).aget(pk=self.pk)
+        return annotated_self.distance
+
     @classmethod
     def all_waiting(cls, mission):
         """
@@ -163,58 +172,47 @@ class Search(GeoTime):
         return objects
 
     @classmethod
-    def all_current(cls, mission, current_at=None, started=False, finished=False):
+    # pylint: disable=R0913,R0917
+    def all_current(cls, mission, current_at=None, area=None, started=False, finished=False):
         """
         Get all the searches that are current and finished as per params
         """
-        objects = super(Search, cls).all_current(mission, current_at=current_at)
+        objects = super(Search, cls).all_current(mission, current_at=current_at, area=area)
         return cls.filter_objects(objects, current_at=current_at, started=started, finished=finished)
 
     @classmethod
     # pylint: disable=R0913,R0917
-    def all_current_user(cls, user, current_at=None, current_only=False, started=False, finished=False):
+    def all_current_user(cls, user, current_at=None, current_only=False, area=None, started=False, finished=False):
         """
         Get all the searches that are current and finished as per params
         """
-        objects = super(Search, cls).all_current_user(user, current_at=current_at, current_only=current_only)
+        objects = super(Search, cls).all_current_user(user, current_at=current_at, current_only=current_only, area=area)
         return cls.filter_objects(objects, current_at=current_at, started=started, finished=finished)
 
     @classmethod
-    def find_closest(cls, mission, asset_type, point):
+    def all_by_distance(cls, mission, asset_type, point):
         """
-        Find the search with the closest starting point
-        Only searches that haven't been started or deleted and are for the right asset type are considered
+        Get the searches for the asset type, closest starting point first
+        Only searches that haven't been started or deleted are considered
         """
-        try:
-            possibles = cls.all_waiting(mission).filter(created_for=asset_type)
-            search = possibles.annotate(distance=Distance('geo', point)).order_by('distance')[0]
-            return search
-        except IndexError:
-            return None
+        possibles = cls.all_waiting(mission).filter(created_for=asset_type)
+        return possibles.annotate(distance=Distance('geo', point)).order_by('distance')
 
     @classmethod
-    def oldest_queued_for_asset(cls, mission, asset):
+    def all_queued_for_asset(cls, mission, asset):
         """
-        Find the oldest queued search for this asset
+        Get the searches queued for this asset, oldest first
         Only entries that haven't already been started/deleted are considered
         """
-        try:
-            search = cls.all_waiting(mission).filter(queued_for_asset=asset).filter(queued_at__isnull=False).order_by('queued_at')[0]
-            return search
-        except IndexError:
-            return None
+        return cls.all_waiting(mission).filter(queued_for_asset=asset).filter(queued_at__isnull=False).order_by('queued_at')
 
     @classmethod
-    def oldest_queued_for_asset_type(cls, mission, asset_type):
+    def all_queued_for_asset_type(cls, mission, asset_type):
         """
-        Find the oldest queued search for this asset_type
+        Get the searches queued for this asset_type, oldest first
         Only entries that haven't already been used/deleted are considered
         """
-        try:
-            search = cls.all_waiting(mission).filter(queued_for_asset__isnull=True).filter(created_for=asset_type).filter(queued_at__isnull=False).order_by('queued_at')[0]
-            return search
-        except IndexError:
-            return None
+        return cls.all_waiting(mission).filter(queued_for_asset__isnull=True).filter(created_for=asset_type).filter(queued_at__isnull=False).order_by('queued_at')
 
     def get_match(self):
         """
@@ -233,10 +231,21 @@ class Search(GeoTime):
         Search.objects.filter(pk=self.pk, inprogress_by__isnull=True, deleted_at__isnull=True, queued_at__isnull=True).update(queued_at=timezone.now(), queued_for_asset=asset)
         self.refresh_from_db()
         if self.queued_for_asset == asset:
+            self.record_change()
             timeline_record_search_queue(mission_user.mission, mission_user.user, self, self.created_for, asset)
             return True
         return False
 
+    def version_keys(self):
+        """
+        Searches are also part of the details of the assets they are queued for/being done by
+        """
+        keys = super().version_keys()
+        for asset_id in (self.queued_for_asset_id, self.inprogress_by_id):
+            if asset_id is not None:
+                keys.append(ChangeVersion.asset_key(asset_id))
+        return keys
+
     def set_inprogress_by(self, asset, user):
         '''
         Set the asset that conducting this search
@@ -244,6 +253,7 @@ class Search(GeoTime):
         Search.objects.filter(pk=self.pk, inprogress_by__isnull=True, deleted_at__isnull=True).update(inprogress_at=timezone.now(), inprogress_by=asset)
         self.refresh_from_db()
         if self.inprogress_by == asset:
+            self.record_change()
             timeline_record_search_begin(self.mission, user, asset, self)
             return True
         return False
@@ -257,7 +267,23 @@ class Search(GeoTime):
         return self.check_and_record_delete(time)
 
     @staticmethod
-    def create_sector_search(params, save=False):
+    def sector_search_geometry(params):
+        """
+        The path of a sector search (see create_sector_search)
+        """
+        # calculate the points on the outside of a circle
+        # that are sweep_width * 3 from the poi
+        # with angles: 30,60,90,120,150,180,210,240,270,300,330,360
+        # this order makes the points in clock-order
+        datum = params.from_geo().geo
+        reference_points = [datum] + project_points(datum.x, datum.y, [30, 60, 90, 120, 150, 180, 210, 240, 270, 300, 330, 0], params.sweep_width() * 3)
+
+        # Create a SectorSector
+        points_order = [0, 12, 2, 8, 10, 4, 6, 0, 1, 3, 9, 11, 5, 7, 0, 2, 4, 10, 12, 6, 8, 0]
+        return LineString([reference_points[point] for point in points_order])
+
+    @staticmethod
+    def create_sector_search(params, save=False, geo=None):
         """
         Create a sector search centered on the given point
 
@@ -281,27 +307,11 @@ class Search(GeoTime):
         240 (6 o'clock)
         000 (datum)
         The next set start offset 30 degrees (030, 150, 270, etc)
-        """
-        # calculate the points on the outside of a circle
-        # that are sweep_width * 3 from the poi
-        # with angles: 30,60,90,120,150,180,210,240,270,300,330,360
-        # this order makes the points in clock-order
-        query = "SELECT geo"
-        for deg in (30, 60, 90, 120, 150, 180, 210, 240, 270, 300, 330, 0):
-            query += ", ST_Project(geo, {sw}, radians({deg})) AS deg_{deg}".format(**{'sw': params.sweep_width() * 3, 'deg': deg})
-        query += f" FROM data_geotimelabel WHERE id = {params.from_geo().pk}"
-        cursor = dbconn.cursor()
-        cursor.execute(query)
-        reference_points = cursor.fetchone()
-
-        # Create a SectorSector
-        points_order = [0, 12, 2, 8, 10, 4, 6, 0, 1, 3, 9, 11, 5, 7, 0, 2, 4, 10, 12, 6, 8, 0]
-        points = []
-        for point in points_order:
-            points.append(GEOSGeometry(reference_points[point]))
 
+        geo is the path from an earlier preview with the same params (if there is one)
+        """
         search = Search(
-            geo=LineString(points),
+            geo=geo if geo is not None else Search.sector_search_geometry(params),
             created_by=params.creator(),
             datum=params.from_geo(),
             created_for=params.asset_type(),
@@ -314,7 +324,24 @@ class Search(GeoTime):
         return search
 
     @staticmethod
-    def create_expanding_box_search(params, save=False):
+    def expanding_box_search_geometry(params):
+        """
+        The path of an expanding box search (see create_expanding_box_search)
+        """
+        datum = params.from_geo().geo
+        first = project(datum, params.sweep_width(), params.first_bearing())
+        origins = []
+        azimuths = []
+        distances = []
+        for i in range(1, params.iterations() + 1):
+            dist = math.sqrt(2) * i * params.sweep_width()
+            origins += [datum, datum, datum, first]
+            azimuths += [45 + params.first_bearing(), 135 + params.first_bearing(), 225 + params.first_bearing(), 315 + params.first_bearing()]
+            distances += [dist] * 4
+        return LineString([datum, first] + project_points([p.x for p in origins], [p.y for p in origins], azimuths, distances))
+
+    @staticmethod
+    def create_expanding_box_search(params, save=False, geo=None):
         """
         An expanding box search from a given point (datum).
 
@@ -344,23 +371,11 @@ class Search(GeoTime):
         The second, third, forth line all end (start direction +) 45, 135, 225 degrees from
         a, and the fifth line ends (start direction +) 315 degrees, all sqrt(2) * i * sweep
         width (where i is the iteration number) from the reference point (a or b respectively).
-        """
-        query = "SELECT p.geo, p.first"
-        for i in range(1, params.iterations() + 1):
-            dist = math.sqrt(2) * i * params.sweep_width()
-            query += f", ST_Project(p.geo, {dist}, radians({45 + params.first_bearing()}))"
-            query += f", ST_Project(p.geo, {dist}, radians({135 + params.first_bearing()}))"
-            query += f", ST_Project(p.geo, {dist}, radians({225 + params.first_bearing()}))"
-            query += f", ST_Project(p.first, {dist}, radians({315 + params.first_bearing()}))"
-
-        query += f" FROM (SELECT geo, ST_Project(geo, {params.sweep_width()}, radians({params.first_bearing()})) AS first FROM data_geotimelabel WHERE id = {params.from_geo().pk}) AS p"
-
-        cursor = dbconn.cursor()
-        cursor.execute(query)
-        points = [GEOSGeometry(p) for p in cursor.fetchone()]
 
+        geo is the path from an earlier preview with the same params (if there is one)
+        """
         search = Search(
-            geo=LineString(points),
+            geo=geo if geo is not None else Search.expanding_box_search_geometry(params),
             created_by=params.creator(),
             datum=params.from_geo(),
             created_for=params.asset_type(),
@@ -415,7 +430,33 @@ class Search(GeoTime):
         return search
 
     @staticmethod
-    def create_track_line_creeping_search(params, save=False):
+    def track_line_creeping_search_geometry(params):
+        """
+        The path of a creeping line ahead search following a line (see create_track_line_creeping_search)
+        """
+        # pylint: disable=R0914
+        line = np.array(params.from_geo().geo.coords, dtype=np.float64)
+        starts = line[:-1]
+        ends = line[1:]
+        # The direction of each segment (like ST_Azimuth on the geometry), and how far along it each pass is
+        directions = np.degrees(np.arctan2(ends[:, 0] - starts[:, 0], ends[:, 1] - starts[:, 1]))
+        lengths, _ = geodesic_inverse(starts[:, 0], starts[:, 1], ends[:, 0], ends[:, 1])
+        # Segments without any length have no direction, so no passes
+        passes = np.where(lengths > 0, np.rint(lengths / params.sweep_width()).astype(int) + 1, 0)
+        segment_index = np.repeat(np.arange(len(starts)), passes)
+        along = (np.arange(passes.sum()) - np.repeat(np.cumsum(passes) - passes, passes)) * params.sweep_width()
+        pass_lons, pass_lats = geodesic_direct(starts[segment_index, 0], starts[segment_index, 1], directions[segment_index], along)
+
+        # Each pass goes from A to B, then the next from B to A
+        side_a = project_points(pass_lons, pass_lats, directions[segment_index] + 90, params.width())
+        side_b = project_points(pass_lons, pass_lats, directions[segment_index] - 90, params.width())
+        points = []
+        for i, (point_a, point_b) in enumerate(zip(side_a, side_b)):
+            points += [point_b, point_a] if i % 2 else [point_a, point_b]
+        return LineString(points)
+
+    @staticmethod
+    def create_track_line_creeping_search(params, save=False, geo=None):
         """
         A creeping line ahead search following a line.
 
@@ -424,37 +465,11 @@ class Search(GeoTime):
         This specific implementation centers the search on a line and runs the search
         perpendicular to the line so that runs half the width either side of the line,
         and steps sweep width along the line for each each pass.
-        """
-        segment_query = \
-            "SELECT ST_PointN(geo::geometry, pos)::geography AS start, ST_PointN(geo::geometry, pos + 1)::geography AS end" \
-            f" FROM data_geotimelabel, generate_series(1, ST_NPoints(geo::geometry) - 1) AS pos WHERE id = {params.from_geo().pk}"
-
-        line_data_query = \
-            f"SELECT segment.start AS start, ST_Azimuth(segment.start::geometry, segment.end::geometry) AS direction, ST_Distance(segment.start, segment.end) AS distance FROM ({segment_query}) AS segment"
-        line_points_query = \
-            f"SELECT direction AS direction, ST_Project(linedata.start, {params.sweep_width()} * i, direction) AS point"\
-            f" FROM ({line_data_query}) AS linedata, generate_series(0, (linedata.distance/{params.sweep_width()})::integer) AS i"
-        query = \
-            f"SELECT ST_Project(point, {params.width()}, direction + PI()/2) AS A, ST_Project(point, {params.width()}, direction - PI()/2) AS B FROM ({line_points_query}) AS linepoints;"
-
-        cursor = dbconn.cursor()
-        cursor.execute(query)
-        db_points = dictfetchall(cursor)
-
-        points = []
-        reverse = False
-        for segment in db_points:
-            if reverse:
-                points.append(GEOSGeometry(segment['b']))
-                points.append(GEOSGeometry(segment['a']))
-                reverse = False
-            else:
-                points.append(GEOSGeometry(segment['a']))
-                points.append(GEOSGeometry(segment['b']))
-                reverse = True
 
+        geo is the path from an earlier preview with the same params (if there is one)
+        """
         search = Search(
-            geo=LineString(points),
+            geo=geo if geo is not None else Search.track_line_creeping_search_geometry(params),
             created_by=params.creator(),
             datum=params.from_geo(),
             created_for=params.asset_type(),
@@ -468,25 +483,32 @@ class Search(GeoTime):
         return search
 
     @staticmethod
-    def create_polygon_creeping_line_search(params, save=False):
+    def polygon_creeping_line_search_geometry(params):
         """
-        A polygon search for a given area (LinearRing).
-
-        Creates a search that sweeps across a polygon
+        The path of a polygon search (see create_polygon_creeping_line_search)
         """
         poly = params.from_geo().geo
         lrng_lonlat = poly[0]
 
-        skew_point = lrng_lonlat[0]
-        lrng_meters = conv_lonlat_to_meters(lrng_lonlat)
+        centre = poly.centroid
+        lrng_meters = conv_lonlat_to_local(lrng_lonlat, centre)
 
         sweep_width = params.sweep_width()
 
         line_meters = polygon_creep_line(lrng_meters, sweep_width)
-        line_lonlat = conv_meters_to_lonlat(line_meters, skew_point)
+        return conv_local_to_lonlat(line_meters, centre)
 
+    @staticmethod
+    def create_polygon_creeping_line_search(params, save=False, geo=None):
+        """
+        A polygon search for a given area (LinearRing).
+
+        Creates a search that sweeps across a polygon
+
+        geo is the path from an earlier preview with the same params (if there is one)
+        """
         search = Search(
-            geo=line_lonlat,
+            geo=geo if geo is not None else Search.polygon_creeping_line_search_geometry(params),
             created_by=params.creator(),
             datum=params.from_geo(),
             created_for=params.asset_type(),
@@ -507,9 +529,9 @@ class Search(GeoTime):
             models.Index(fields=['mission', 'deleted_at', 'replaced_at', 'completed_at', ]),
             # Index for all_waiting
             models.Index(fields=['mission', 'deleted_at', 'replaced_at', 'completed_at', 'inprogress_by', ]),
-            # Index for find_closest
+            # Index for all_by_distance
             models.Index(fields=['mission', 'deleted_at', 'replaced_at', 'completed_at', 'inprogress_by', 'created_for', ]),
-            # Index for oldest_queued_for_asset*
+            # Index for all_queued_for_asset*
             models.Index(fields=['mission', 'deleted_at', 'replaced_at', 'completed_at', 'inprogress_by', 'queued_for_asset', 'created_for', ]),
             # Index for inprogress_by (used to find the search an asset is currently doing)
             models.Index(fields=['inprogress_by']),
@@ -542,6 +564,9 @@ class ExpandingBoxSearchParams(SearchParams):
         """
         return self._first_bearing
 
+    def preview_key(self):
+        return super().preview_key() + (self._iterations, self._first_bearing)
+
 
 class TrackLineCreepingSearchParams(SearchParams):
     """
@@ -560,3 +585,6 @@ class TrackLineCreepingSearchParams(SearchParams):
         (searching will occur width/2 either side of the track)
         """
         return self._width
+
+    def preview_key(self):
+        return super().preview_key() + (self._width,)
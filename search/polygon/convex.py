@@ -2,13 +2,17 @@
 """
 Functions for convex polygons
 
-- Decompose a concave polygon into multiple convex polygons (decomp)
+- Decompose a concave polygon into the fewest convex polygons (decomp)
 - Generate a creeping line search over a convex polygon (creep_line)
 """
 import math
-from django.contrib.gis.geos import Point, LineString, LinearRing
+import struct
+from collections import deque
+from itertools import combinations
+from django.contrib.gis.geos import GEOSGeometry, Point, LineString, LinearRing, Polygon
 import numpy as np
 from haversine import haversine, Unit
+from smm.geodesy import aeqd_forward, aeqd_inverse
 
 
 def pt_relv(pt_a, pt_b):
@@ -81,27 +85,297 @@ def lrng_cross(lrng):
     return [np.float64(x) for x in dirl]
 
 
-def decomp(lrng):
-    """Decompose an arbitrary linear ring into a set of convex linear rings."""
-    min_convex = None
-    ndiags = 0
-    concave_points = lrng_concave_points(lrng)
-    convex_points = lrng_convex_points(lrng)
+def ring_vertices_ccw(lrng):
+    """ Returns the vertices of a linear ring (without the duplicate last point)
+    as an array in anticlockwise order, and whether they had to be reversed """
+    pts = np.array([tuple(pt)[:2] for pt in lrng][:-1], dtype=np.float64)
+    area = np.sum(pts[:, 0] * np.roll(pts[:, 1], -1) - np.roll(pts[:, 0], -1) * pts[:, 1])
+    if area < 0:
+        return pts[::-1].copy(), True
+    return pts, False
+
+
+def turn(pt_a, pt_b, pt_c):
+    """ Cross product of the corner at pt_b, positive for an anticlockwise (left) turn """
+    return (pt_c[1] - pt_a[1]) * (pt_b[0] - pt_a[0]) - (pt_c[0] - pt_a[0]) * (pt_b[1] - pt_a[1])
+
+
+def diagonal_visibility(pts, convex):
+    """ Returns an n x n array, True where the diagonal between vertex i and j
+    lies inside the (anticlockwise) polygon pts without touching any edge.
+
+    Each row is computed in one pass over all the edges. """
+    # pylint: disable=R0914
+    count = len(pts)
+    idx = np.arange(count)
+    next_pts = np.roll(pts, -1, axis=0)
+    edge = next_pts - pts
+
+    def left_of(start, direction, pts_c):
+        """ Is each point in pts_c to the left of the line(s) start + direction """
+        return (direction[:, None, 0] * (pts_c[None, :, 1] - start[:, None, 1]) -
+                direction[:, None, 1] * (pts_c[None, :, 0] - start[:, None, 0])) > 0
+
+    # The diagonal has to leave both vertices into the polygon (inside the cone of their edges)
+    left_prev = left_of(np.roll(pts, 1, axis=0), np.roll(edge, 1, axis=0), pts)
+    left_next = left_of(pts, edge, pts)
+    in_cone = np.where(np.array(convex)[:, None], left_prev & left_next, left_prev | left_next)
+    in_cone &= in_cone.T
+
+    visible = np.zeros((count, count), dtype=bool)
+    for i in range(count - 2):
+        ends = pts[i + 2:]
+        j = idx[i + 2:, None]
+        # Which side of the diagonal each end of each edge is, and which side of each edge the diagonal ends are
+        diag = ends - pts[i]
+        side_start = diag[:, None, 0] * (pts[None, :, 1] - pts[i][1]) - diag[:, None, 1] * (pts[None, :, 0] - pts[i][0])
+        side_end = diag[:, None, 0] * (next_pts[None, :, 1] - pts[i][1]) - diag[:, None, 1] * (next_pts[None, :, 0] - pts[i][0])
+        crosses = side_start * side_end <= 0
+        side_i = edge[None, :, 0] * (pts[i][1] - pts[None, :, 1]) - edge[None, :, 1] * (pts[i][0] - pts[None, :, 0])
+        side_j = edge[None, :, 0] * (ends[:, None, 1] - pts[None, :, 1]) - edge[None, :, 1] * (ends[:, None, 0] - pts[None, :, 0])
+        crosses &= side_i * side_j <= 0
+        # Edges that share a vertex with the diagonal don't count
+        shared = (idx == i) | ((idx + 1) % count == i) | (idx == j) | ((idx + 1) % count == j)
+        visible[i, i + 2:] = ~np.any(crosses & ~shared, axis=1) & in_cone[i, i + 2:]
+    return visible
+
+
+class ConvexDecomposition:
+    """ Minimum convex decomposition of a simple polygon (Keil's algorithm)
+
+    Uses dynamic programming over the sub-polygons cut off by each diagonal
+    (i, j) with i < j. For each one the fewest convex pieces, and the narrowest
+    (first, last) vertices of the piece against the diagonal are kept,
+    so it takes O(n r^2) time for n vertices and r concave vertices. """
+    # pylint: disable=R0903
+    def __init__(self, pts):
+        self.pts = pts.tolist()
+        self.count = len(pts)
+        self.convex = [turn(pts[i - 1], pts[i], pts[(i + 1) % self.count]) > 0 for i in range(self.count)]
+        self.visible = diagonal_visibility(pts, self.convex)
+        self.weight = {}
+        self.pairs = {}
+        # Vertex 0 is treated as concave (so the whole polygon is solved)
+        self.convex[0] = False
+
+    def reflex(self, pt_a, pt_b, pt_c):
+        """ Is the corner a, b, c (vertex indices) a clockwise turn """
+        return turn(self.pts[pt_a], self.pts[pt_b], self.pts[pt_c]) < 0
+
+    def is_visible(self, i, j):
+        """ Can the polygon be cut between vertex i and j (or is it an edge) """
+        return j == i + 1 or (i == 0 and j == self.count - 1) or self.visible[i, j]
+
+    def state_weight(self, i, j):
+        """ The fewest diagonals needed inside the sub-polygon i..j """
+        if j == i + 1:
+            return 0
+        return self.weight.get((i, j), math.inf)
+
+    def update(self, i, k, weight, pair):
+        """ Record a way of decomposing the sub-polygon i..k """
+        current = self.state_weight(i, k)
+        if weight > current or weight == math.inf:
+            return
+        pairs = self.pairs.setdefault((i, k), deque())
+        if weight < current:
+            pairs.clear()
+            self.weight[(i, k)] = weight
+        else:
+            if pairs and pair[0] <= pairs[0][0]:
+                return
+            while pairs and pairs[0][1] >= pair[1]:
+                pairs.popleft()
+        pairs.appendleft(pair)
+
+    def type_a(self, i, j, k):
+        """ Decompose i..k, with i concave, using the piece on diagonal (j, k) """
+        if not self.is_visible(i, j):
+            return
+        top = j
+        weight = self.state_weight(i, j)
+        if k - j > 1:
+            if not self.is_visible(j, k):
+                return
+            weight += self.state_weight(j, k) + 1
+        if j - i > 1:
+            last = None
+            for pair in reversed(self.pairs.get((i, j), ())):
+                if self.reflex(pair[1], j, k):
+                    break
+                last = pair
+            if last is None or self.reflex(k, i, last[0]):
+                weight += 1
+            else:
+                top = last[0]
+        self.update(i, k, weight, (top, j))
+
+    def type_b(self, i, j, k):
+        """ Decompose i..k, with k concave, using the piece on diagonal (i, j) """
+        if not self.is_visible(j, k):
+            return
+        top = j
+        weight = self.state_weight(j, k)
+        if j - i > 1:
+            if not self.is_visible(i, j):
+                return
+            weight += self.state_weight(i, j) + 1
+        if k - j > 1:
+            pairs = self.pairs.get((j, k), ())
+            if pairs and not self.reflex(i, j, pairs[0][0]):
+                last = pairs[0]
+                for pair in pairs:
+                    if self.reflex(i, j, pair[0]):
+                        break
+                    last = pair
+                if self.reflex(last[1], k, i):
+                    weight += 1
+                else:
+                    top = last[1]
+            else:
+                weight += 1
+        self.update(i, k, weight, (j, top))
+
+    def solve(self):
+        """ Fill in the table of sub-polygons, from the smallest """
+        # pylint: disable=R0912
+        for i in range(self.count - 2):
+            if self.visible[i, i + 2]:
+                self.weight[(i, i + 2)] = 0
+                self.pairs[(i, i + 2)] = deque([(i + 1, i + 1)])
+
+        for gap in range(3, self.count):
+            for i in range(self.count - gap):
+                k = i + gap
+                if self.convex[i] or not self.is_visible(i, k):
+                    continue
+                if not self.convex[k]:
+                    for j in range(i + 1, k):
+                        self.type_a(i, j, k)
+                else:
+                    for j in range(i + 1, k - 1):
+                        if not self.convex[j]:
+                            self.type_a(i, j, k)
+                    self.type_a(i, k - 1, k)
+            for k in range(gap, self.count):
+                i = k - gap
+                if self.convex[k] or not self.convex[i] or not self.is_visible(i, k):
+                    continue
+                self.type_b(i, i + 1, k)
+                for j in range(i + 2, k):
+                    if not self.convex[j]:
+                        self.type_b(i, j, k)
+
+    def chosen_pair(self, i, k):
+        """ The pair used for the piece on diagonal (i, k) """
+        pairs = self.pairs.get((i, k))
+        if not pairs:
+            raise ValueError(f"Could not decompose the sub-polygon {i}..{k}")
+        return pairs[0] if self.convex[i] else pairs[-1]
+
+    def keep_pairs(self, i, k, side, vertex):
+        """ Drop the pairs of (i, k) that would be chosen before the one with vertex on side """
+        pairs = self.pairs.get((i, k), deque())
+        while pairs and self.chosen_pair(i, k)[side] != vertex:
+            if self.convex[i]:
+                pairs.popleft()
+            else:
+                pairs.pop()
+        if not pairs:
+            raise ValueError(f"Could not decompose the sub-polygon {i}..{k}")
+
+    def choose(self):
+        """ Settle on one decomposition, trimming the pairs so the pieces agree """
+        diagonals = [(0, self.count - 1)]
+        while diagonals:
+            i, k = diagonals.pop()
+            if k - i <= 1:
+                continue
+            pair = self.chosen_pair(i, k)
+            if not self.convex[i]:
+                j = pair[1]
+                if j - i > 1 and pair[0] != pair[1]:
+                    # The piece continues across (i, j)
+                    self.keep_pairs(i, j, 0, pair[0])
+            else:
+                j = pair[0]
+                if k - j > 1 and pair[0] != pair[1]:
+                    # The piece continues across (j, k)
+                    self.keep_pairs(j, k, 1, pair[1])
+            diagonals.extend(((i, j), (j, k)))
+
+    def pieces(self):
+        """ Returns the vertex indices of each convex piece """
+        self.solve()
+        self.choose()
+        pieces = []
+        diagonals = deque([(0, self.count - 1)])
+        while diagonals:
+            diagonal = diagonals.popleft()
+            if diagonal[1] - diagonal[0] <= 1:
+                continue
+            indices = list(diagonal)
+            inner = deque([diagonal])
+            while inner:
+                i, k = inner.popleft()
+                if k - i <= 1:
+                    continue
+                pair = self.chosen_pair(i, k)
+                # Only the side of the piece that isn't a real diagonal stays in this piece
+                if not self.convex[i]:
+                    j = pair[1]
+                    (diagonals if pair[0] == pair[1] else inner).append((i, j))
+                    diagonals.append((j, k))
+                else:
+                    j = pair[0]
+                    diagonals.append((i, j))
+                    (diagonals if pair[0] == pair[1] else inner).append((j, k))
+                indices.append(j)
+            pieces.append(sorted(indices))
+        return self.merge(pieces)
+
+    def merge(self, pieces):
+        """ Join neighbouring pieces while they are still convex together
+
+        Points in the middle of an edge are treated as concave, as they can be the end
+        of a diagonal, which can leave pieces that could have been one. """
+        merged = True
+        while merged:
+            merged = False
+            for first, second in combinations(range(len(pieces)), 2):
+                if len(set(pieces[first]) & set(pieces[second])) < 2:
+                    continue
+                union = sorted(set(pieces[first]) | set(pieces[second]))
+                if not any(self.reflex(union[pos - 2], union[pos - 1], union[pos]) for pos in range(len(union))):
+                    pieces[first] = union
+                    del pieces[second]
+                    merged = True
+                    break
+        return pieces
 
-    for pt1 in concave_points:
-        for pt0 in convex_points:
-            if cansee(pt0, pt1, lrng):
-                # pylint: disable=W1114
-                left = sublrng(pt0, pt1, lrng)
-                right = sublrng(pt1, pt0, lrng)
-                tmp = decomp(left) + decomp(right)
-                if (len(tmp) < ndiags or ndiags == 0):
-                    min_convex = tmp
-                    ndiags = len(tmp)
 
-    if concave_points:
-        return min_convex
-    return [lrng]
+def decomp(lrng):
+    """Decompose an arbitrary linear ring into the fewest convex linear rings.
+
+    Every piece is made of the ring's own points, in the same direction, and starts
+    and ends on a diagonal it shares with another piece (when it has one)."""
+    if not lrng_concave_points(lrng):
+        return [lrng]
+    pts, reversed_pts = ring_vertices_ccw(lrng)
+    count = len(pts)
+    original = [tuple(pt) for pt in lrng][:-1]
+
+    lrngs = []
+    for piece in ConvexDecomposition(pts).pieces():
+        # Back to the indices (and direction) of the original ring
+        indices = sorted(count - 1 - idx for idx in piece) if reversed_pts else piece
+        # Start at the end of a diagonal, so the closing edge is the diagonal
+        for pos, idx in enumerate(indices):
+            if (idx - indices[pos - 1]) % count != 1:
+                indices = indices[pos:] + indices[:pos]
+                break
+        lrngs.append(LinearRing([original[idx] for idx in indices] + [original[indices[0]]]))
+    return lrngs
 
 
 def lrng_convex_points(lrng):
@@ -155,18 +429,76 @@ def sublrng(pt0, pt1, lrng):
 
 def creep_line(lrng, width):
     """ Return a LineString which represents
-    a creeping path through a convex LinearRing """
+    a creeping path through a convex LinearRing
+
+    The crossings of every stripe with every edge of the ring are found in one
+    pass with numpy, then ordered the way creep_line_geos (GEOS) orders them:
+    alternating directions (boustrophedon), where stripes that only touch a
+    single point don't change the direction. """
+    # pylint: disable=R0914
+    _, ymin, _, ymax = lrng.extent
+    ring = np.array([tuple(pt)[:2] for pt in lrng], dtype=np.float64)
+    y_stripes = np.fromiter(stripe_ys(ymin, width, ymax), dtype=np.float64)[:, None]
+    x_0, y_0 = ring[:-1, 0], ring[:-1, 1]
+    x_1, y_1 = ring[1:, 0], ring[1:, 1]
+
+    # Where each stripe crosses each edge (exactly the vertex when it is at the same y)
+    crosses = (y_stripes >= np.minimum(y_0, y_1)) & (y_stripes <= np.maximum(y_0, y_1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_cross = x_0 + (y_stripes - y_0) * (x_1 - x_0) / (y_1 - y_0)
+    x_cross = np.where(y_stripes == y_0, x_0, np.where(y_stripes == y_1, x_1, x_cross))
+    x_cross = np.sort(np.where(crosses, x_cross, np.nan), axis=1)
+    distinct = ~np.isnan(x_cross)
+    distinct[:, 1:] &= x_cross[:, 1:] != x_cross[:, :-1]
+
+    # Stripes along a horizontal edge are a LineString (ascending), others a MultiPoint (descending) in GEOS
+    along_edge = np.any(crosses & (y_0 == y_1), axis=1)
+    turns = along_edge | (distinct.sum(axis=1) != 1)
+    reverse = turns & ((np.cumsum(turns) - turns) % 2 == 1)
+    ascending = along_edge != reverse
+
+    rows, cols = np.nonzero(distinct)
+    x_pts = x_cross[rows, cols]
+    order = np.lexsort((np.where(ascending[rows], x_pts, -x_pts), rows))
+    return linestring_from_array(np.column_stack((x_pts[order], y_stripes[rows[order], 0])))
+
+
+def linestring_from_array(coords):
+    """ Returns a LineString of an n x 2 array of coordinates
+
+    Built from WKB, which is much faster than setting each point
+    for a LineString with thousands of points """
+    header = struct.pack('<BII', 1, 2, len(coords))
+    return GEOSGeometry(memoryview(header + np.ascontiguousarray(coords, dtype='<f8').tobytes()))
+
+
+def array_from_linestring(geometry):
+    """ Returns the n x 2 array of coordinates of a LineString (or LinearRing)
+
+    Read from WKB, which is much faster than getting each point """
+    wkb = memoryview(geometry.wkb)
+    coords = np.frombuffer(wkb[9:], dtype='<f8' if wkb[0] == 1 else '>f8')
+    return coords.reshape(-1, 3 if geometry.hasz else 2)[:, :2]
+
+
+def stripe_ys(yin, space, ymax):
+    """ Generates ycoord spaced over interval"""
+    while yin < ymax:
+        yield yin
+        yin = yin + space
+    yield ymax
+
+
+def creep_line_geos(lrng, width):
+    """ Return a LineString which represents
+    a creeping path through a convex LinearRing
+
+    Intersects each stripe with the ring in GEOS, one at a time
+    (see creep_line, which gives the same LineString) """
     xmin, ymin, xmax, ymax = lrng.extent
     # xdist = xmax - xmin
     ydist = width
 
-    def step(yin, space, ymax):
-        """ Generates ycoord spaced over interval"""
-        while yin < ymax:
-            yield yin
-            yin = yin + space
-        yield ymax
-
     def stripe(xmin, xmax, yiter):
         """ Generates LineStrings spaced over yiter"""
         for yin in yiter:
@@ -199,7 +531,7 @@ def creep_line(lrng, width):
                 msg = f"{i} is of type {type(i)}"
                 raise TypeError(msg)
 
-    yiter = step(ymin, ydist, ymax)
+    yiter = stripe_ys(ymin, ydist, ymax)
     liter = stripe(xmin, xmax, yiter)
     pts = list(carve(lrng, liter))
 
@@ -304,16 +636,37 @@ def conv_meters_to_lonlat(geometry, skew_point):
     return geometry_in_lonlat
 
 
+def conv_lonlat_to_local(geometry, centre):
+    """ Converts a lonlat LineString (or LinearRing) to meters, in an
+    azimuthal equidistant projection centred on centre
+
+    Unlike conv_lonlat_to_meters the scale is correct across the whole
+    geometry, not just near the skew point. """
+    coords = array_from_linestring(geometry)
+    x, y = aeqd_forward(centre[0], centre[1], coords[:, 0], coords[:, 1])
+    return geometry.__class__(np.column_stack((x, y)))
+
+
+def conv_local_to_lonlat(geometry, centre):
+    """ Converts a meters LineString (from conv_lonlat_to_local) back to a
+    lonlat LineString, the same centre is required """
+    coords = array_from_linestring(geometry)
+    lon, lat = aeqd_inverse(centre[0], centre[1], coords[:, 0], coords[:, 1])
+    line_lonlat = linestring_from_array(np.column_stack((lon, lat)))
+    line_lonlat.srid = 4326
+    return line_lonlat
+
+
 def creep_line_lonlat(lrng_lonlat, width_meters):
     """ Returns a LineString creeping path across a lon/lat set of points"""
-    skew_point = lrng_lonlat[0]
-    lrng_meters = conv_lonlat_to_meters(lrng_lonlat, skew_point=skew_point)
+    centre = Polygon(lrng_lonlat).centroid
+    lrng_meters = conv_lonlat_to_local(LinearRing(lrng_lonlat), centre)
 
     # Create a creeping line search using "normalized coords"
     line_meters = creep_line(lrng_meters, width_meters)
 
     # Convert back to regular lon / lat
-    return conv_meters_to_lonlat(line_meters, skew_point=skew_point)
+    return conv_local_to_lonlat(line_meters, centre)
 
 
 def perimeter_subarray(pts, pt_arr):
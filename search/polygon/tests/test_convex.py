@@ -5,7 +5,10 @@ UnitTests for Convex Polygon module
 
 import unittest
 import math
-from django.contrib.gis.geos import LineString, LinearRing, Point
+import random
+from itertools import combinations
+from time import perf_counter
+from django.contrib.gis.geos import LineString, LinearRing, MultiPoint, MultiPolygon, Point, Polygon
 from search.polygon.convex import (pt_relv,
                                    pt_corner_relv,
                                    vec_cosine_rule,
@@ -16,13 +19,37 @@ from search.polygon.convex import (pt_relv,
                                    sublrng,
                                    decomp,
                                    creep_line,
+                                   creep_line_geos,
                                    perimeter_subarray,
                                    creep_line_concave,
-                                   conv_lonlat_to_meters)
+                                   conv_lonlat_to_meters,
+                                   conv_lonlat_to_local,
+                                   conv_local_to_lonlat)
+from smm.geodesy import geodesic_direct, geodesic_inverse
+
+
+def random_star_ring(rnd, count, radius=10):
+    """ A random simple polygon (star shaped around the origin) with count points,
+    usually around half of them are concave """
+    angles = [(i + rnd.uniform(0, 0.8)) * 2 * math.pi / count for i in range(count)]
+    pts = [(round(math.cos(angle) * length, 6), round(math.sin(angle) * length, 6))
+           for angle in angles
+           for length in [rnd.uniform(radius / 10, radius)]]
+    return LinearRing(pts + [pts[0]])
+
+
+def random_lonlat_ring(rnd, count, size):
+    """ A random lon/lat polygon in Canterbury, with count points up to size/2 (m)
+    from its centre """
+    azimuths = sorted(rnd.uniform(0, 360) for _ in range(count))
+    lons, lats = geodesic_direct(172.5, -43.5, azimuths, [rnd.uniform(size / 4, size / 2) for _ in range(count)])
+    pts = list(zip(lons.tolist(), lats.tolist()))
+    return LinearRing(pts + [pts[0]], srid=4326)
 
 
 class TestConvex(unittest.TestCase):
     """ Test generation of convex linear ring from concave linear ring."""
+    # pylint: disable=R0904
     def setUp(self):
         pass
 
@@ -232,6 +259,52 @@ class TestConvex(unittest.TestCase):
         result0 = decomp(lrng0)
         self.assertEqual(len(result0), 2)
 
+    def assertTiles(self, pieces, lrng):
+        # pylint: disable=C0103
+        """ Check the pieces are convex, only use points of lrng,
+        and exactly cover lrng (without overlapping) """
+        polygon = Polygon(lrng)
+        points = [tuple(pt) for pt in lrng]
+        for piece in pieces:
+            self.assertEqual(lrng_concave_points(piece), [])
+            for point in piece:
+                self.assertIn(tuple(point), points)
+        self.assertAlmostEqual(sum(Polygon(piece).area for piece in pieces), polygon.area, delta=polygon.area * 1e-9)
+        union = MultiPolygon([Polygon(piece) for piece in pieces]).unary_union
+        self.assertAlmostEqual(union.sym_difference(polygon).area, 0, delta=polygon.area * 1e-9)
+
+    def test_decomp_tiles(self):
+        """ Test the decomposition of random polygons (in both directions) tiles the polygon """
+        rnd = random.Random(21)
+        for _ in range(200):
+            lrng = random_star_ring(rnd, rnd.randint(4, 16))
+            self.assertTiles(decomp(lrng), lrng)
+            lrng.reverse()
+            self.assertTiles(decomp(lrng), lrng)
+
+    def test_decomp_collinear(self):
+        """ Test polygons with points in the middle of edges """
+        # Square with a notch, and a point in the middle of each side of the notch
+        lrng0 = LinearRing((
+            (0, 0), (0, 2), (2, 2), (4, 2), (4, 0),
+            (3, 0), (2.5, 0.5), (2, 1), (1.5, 0.5), (1, 0), (0, 0)))
+        result0 = decomp(lrng0)
+        self.assertEqual(len(result0), 2)
+        self.assertTiles(result0, lrng0)
+
+    def test_decomp_many_concave(self):
+        """ Test polygons with many concave points are decomposed quickly """
+        rnd = random.Random(42)
+        lrng0 = random_star_ring(rnd, 60, radius=5000)
+        self.assertGreaterEqual(len(lrng_concave_points(lrng0)), 20)
+        start = perf_counter()
+        result0 = decomp(lrng0)
+        self.assertLess(perf_counter() - start, 10)
+        self.assertTiles(result0, lrng0)
+        # Every piece (other than the first) needs at least one diagonal
+        self.assertLessEqual(len(result0), 2 * len(lrng_concave_points(lrng0)) + 1)
+        creep_line_concave(lrng0, 200)
+
     def test_creep_line(self):
         """ Test creeping line generation over convex LinearRing. """
 
@@ -265,6 +338,25 @@ class TestConvex(unittest.TestCase):
         self.assertEqual(lstr0bbb, lstr0bbb_expected)
         self.assertEqual(lstr1aaa, lstr1aaa_expected)
 
+    def test_creep_line_matches_geos(self):
+        """ Test the numpy creeping line is the same as intersecting each stripe in GEOS """
+        rnd = random.Random(22)
+        for i in range(200):
+            if i % 2:
+                # Small integer coordinates, so stripes hit vertices and horizontal edges
+                pts = [Point(rnd.randint(0, 20), rnd.randint(0, 20)) for _ in range(rnd.randint(3, 12))]
+                width = rnd.choice((0.5, 1, 1.7, 3))
+            else:
+                pts = [Point(rnd.uniform(0, 50000), rnd.uniform(0, 50000)) for _ in range(rnd.randint(3, 30))]
+                width = rnd.choice((1000, 2500))
+            hull = MultiPoint(pts).convex_hull
+            if not isinstance(hull, Polygon):
+                continue
+            lrng = hull[0]
+            if i % 3 == 0:
+                lrng.reverse()
+            self.assertTrue(creep_line(lrng, width).equals_exact(creep_line_geos(lrng, width), 1e-6))
+
     def test_creep_line_lonlat(self):
         """ Test creeping line generation over geographic data"""
         # Triangle
@@ -289,6 +381,27 @@ class TestConvex(unittest.TestCase):
         lrng_meters = conv_lonlat_to_meters(lrng_lonlat)
         creep_line_concave(lrng_meters, width_meters)
 
+    def test_conv_lonlat_to_local(self):
+        """ Test the distances between the points of 1km, 10km and 100km polygons
+        in metres are close to the geodesic distances """
+        rnd = random.Random(24)
+        for size, tolerance in ((1000, 0.001), (10000, 0.01), (100000, 1)):
+            lrng_lonlat = random_lonlat_ring(rnd, 30, size)
+            lrng_meters = conv_lonlat_to_local(lrng_lonlat, Polygon(lrng_lonlat).centroid)
+            self.assertIsInstance(lrng_meters, LinearRing)
+            for (pt_a, pt_b), (mt_a, mt_b) in zip(combinations(lrng_lonlat, 2), combinations(lrng_meters, 2)):
+                distance, _ = geodesic_inverse(*pt_a, *pt_b)
+                self.assertAlmostEqual(math.dist(mt_a, mt_b), distance, delta=tolerance)
+
+    def test_conv_local_to_lonlat(self):
+        """ Test converting to metres and back finds the same points """
+        rnd = random.Random(25)
+        lrng_lonlat = random_lonlat_ring(rnd, 30, 100000)
+        centre = Polygon(lrng_lonlat).centroid
+        line_lonlat = conv_local_to_lonlat(LineString(conv_lonlat_to_local(lrng_lonlat, centre).coords), centre)
+        self.assertEqual(line_lonlat.srid, 4326)
+        self.assertTrue(line_lonlat.equals_exact(LineString(lrng_lonlat.coords), 1e-9))
+
     def test_perimeter_subarray(self):
         """ Test perimetere subarray generation. """
 
@@ -0,0 +1,109 @@
+"""
+Cache of the geometries of search previews
+
+Creating a search first asks for a preview (a GET, every time a parameter changes),
+then creates the same search (a POST). The geometry of each search is kept in a
+bounded LRU cache (SMM_SEARCH_PREVIEW_CACHE_SIZE entries, in each process), so
+creating the search reuses the geometry of the preview with the same inputs.
+
+The key includes the version (see smm.cache_versions) of the datum, which changes
+when the datum is replaced or deleted, so the old geometries are never used again.
+The hits, misses and evictions are included in /metrics/.
+"""
+
+from collections import OrderedDict
+import threading
+
+from django.conf import settings
+
+from smm.cache_versions import cache_version
+from smm.metrics import register_cache
+
+
+DEFAULT_PREVIEW_CACHE_SIZE = 256
+
+
+class PreviewCache:
+    """
+    A bounded LRU cache of search geometries
+    """
+    def __init__(self, size):
+        self.lock = threading.Lock()
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        The geometry for key (or None)
+        """
+        with self.lock:
+            geo = self.entries.get(key)
+            if geo is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return geo.clone()
+
+    def put(self, key, geo):
+        """
+        Remember the geometry for key, forgetting the least recently used geometries when full
+        """
+        with self.lock:
+            self.entries[key] = geo.clone()
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def as_object(self):
+        """
+        The metrics of the cache
+        """
+        with self.lock:
+            return {
+                'size': self.size,
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def reset(self):
+        """
+        Forget the metrics (but keep the geometries)
+        """
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+search_previews = PreviewCache(getattr(settings, 'SMM_SEARCH_PREVIEW_CACHE_SIZE', DEFAULT_PREVIEW_CACHE_SIZE))
+register_cache('search_previews', search_previews)
+
+
+def datum_version(datum_id):
+    """
+    The version of the datum, changed when it's replaced or deleted
+    """
+    return cache_version('geotimelabel', datum_id)
+
+
+def create_search(create, params, save):
+    """
+    Create a search with create (i.e. Search.create_sector_search), reusing the geometry
+    of an earlier preview with the same inputs
+    """
+    datum = params.from_geo()
+    if datum.pk is None:
+        return create(params, save=save)
+    key = (datum.pk, datum_version(datum.pk), create.__name__) + params.preview_key()
+    geo = search_previews.get(key)
+    search = create(params, save=save, geo=geo)
+    if geo is None:
+        search_previews.put(key, search.geo)
+    return search
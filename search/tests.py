@@ -2,17 +2,22 @@
 Tests for search creation/management
 """
 
-from django.test import TestCase
+from datetime import timedelta
+from xml.etree import ElementTree
+
+from django.test import SimpleTestCase, TestCase
 from django.contrib.gis.geos import Point, LineString, Polygon
+from django.utils import timezone
 
 from data.models import GeoTimeLabel
 
-from smm.tests import SMMTestUsers
+from smm.tests import SMMTestUsers, response_json
 
 from assets.tests import AssetsHelpers
 from mission.tests import MissionFunctions
 
 from .models import Search
+from .previews import PreviewCache, search_previews
 
 
 class SearchWrapper:
@@ -433,3 +438,105 @@ class SearchTestCase(TestCase):
         # Check we get the search we expected based on this location
         self.assertEqual(data['object_url'], f'/search/{search2_obj.pk}/')
         self.assertEqual(data['distance'], 0)
+
+    def test_1100_since(self):
+        """
+        Test only getting the searches that changed since the last request
+        """
+        poi = self.create_poi(-43.5, 172.5)
+        search = self.searches.create_sector(poi, 200, self.asset_type1).as_object()
+        Search.objects.update(created_at=timezone.now() - timedelta(hours=1))
+        notstarted_url = f'/mission/{self.mission1.get_object().pk}/search/notstarted/'
+        inprogress_url = f'/mission/{self.mission1.get_object().pk}/search/inprogress/'
+        response = self.smm.client1.get(notstarted_url)
+        self.assertEqual(response.status_code, 200)
+        data = response_json(response)
+        self.assertEqual(len(data['features']), 1)
+        cursor = data['cursor']
+        # Nothing has changed
+        data = response_json(self.smm.client1.get(notstarted_url, {'since': cursor}))
+        self.assertEqual(len(data['features']), 0)
+        self.assertEqual(data['removed'], [])
+        # Start the search, it moves from not started to in progress
+        self.assertTrue(search.set_inprogress_by(self.asset1, self.smm.user1))
+        data = response_json(self.smm.client1.get(notstarted_url, {'since': cursor}))
+        self.assertEqual(len(data['features']), 0)
+        self.assertEqual(data['removed'], [str(search.pk)])
+        data = response_json(self.smm.client1.get(inprogress_url, {'since': cursor}))
+        self.assertEqual(len(data['features']), 1)
+        self.assertEqual(data['features'][0]['properties']['pk'], str(search.pk))
+        self.assertEqual(data['removed'], [])
+        # Check an invalid cursor is rejected
+        self.assertEqual(self.smm.client1.get(notstarted_url, {'since': 'yesterday'}).status_code, 400)
+
+    def test_1200_mission_kml(self):
+        """
+        Test exporting the whole mission as kml, with a folder for each type
+        """
+        poi = self.create_poi(-43.5, 172.5)
+        self.create_line([(172.5, -43.5), (172.6, -43.6)])
+        search = self.searches.create_sector(poi, 200, self.asset_type1).as_object()
+        self.searches.create_sector(poi, 300, self.asset_type1)
+        self.assertTrue(search.set_inprogress_by(self.asset1, self.smm.user1))
+        kml_url = f'/mission/{self.mission1.get_object().pk}/kml/'
+        response = self.smm.client1.get(kml_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.google-earth.kml+xml')
+        document = ElementTree.fromstring(b''.join(response.streaming_content))
+        namespace = {'kml': 'http://www.opengis.net/kml/2.2'}
+        folders = {folder.find('kml:name', namespace).text: folder for folder in document.iterfind('kml:Document/kml:Folder', namespace)}
+        self.assertEqual(len(folders['POIs'].findall('kml:Placemark', namespace)), 1)
+        self.assertEqual(len(folders['Lines'].findall('kml:Placemark', namespace)), 1)
+        self.assertEqual(len(folders['Polygons'].findall('kml:Placemark', namespace)), 0)
+        self.assertEqual(len(folders['Searches (not started)'].findall('kml:Placemark', namespace)), 1)
+        self.assertEqual(len(folders['Searches (in progress)'].findall('kml:Placemark', namespace)), 1)
+        self.assertEqual(folders['Searches (in progress)'].find('kml:Placemark/kml:styleUrl', namespace).text, '#search_inprogress')
+        self.assertEqual(len(folders['Searches (completed)'].findall('kml:Placemark', namespace)), 0)
+        # Only mission members can export the mission
+        self.assertEqual(self.smm.client2.get(kml_url).status_code, 404)
+
+    def test_1300_preview_reused(self):
+        """
+        Test creating a search reuses the geometry of the preview, until the datum is replaced
+        """
+        poi = self.create_poi(-43.5, 172.5)
+        data = {'poi_id': poi.pk, 'asset_type_id': self.asset_type1.pk, 'sweep_width': 200, 'iterations': 3, 'first_bearing': 90}
+        misses = search_previews.misses
+        preview = self.smm.client1.get('/search/expandingbox/create/', data=data)
+        self.assertEqual(preview.status_code, 200)
+        self.assertEqual(search_previews.misses, misses + 1)
+        hits = search_previews.hits
+        created = self.smm.client1.post('/search/expandingbox/create/', data=data)
+        self.assertEqual(search_previews.hits, hits + 1)
+        self.assertEqual(response_json(created)['features'][0]['geometry'], response_json(preview)['features'][0]['geometry'])
+        self.assertIsNotNone(response_json(created)['features'][0]['properties']['pk'])
+        # A different sweep width isn't the same search
+        self.searches.create_expanding_box_search(poi, 300, 3, self.asset_type1, first_bearing=90)
+        self.assertEqual(search_previews.misses, misses + 2)
+        # Once the datum is replaced, the preview isn't used
+        poi.replace(self.create_poi(-43.6, 172.6))
+        self.smm.client1.get('/search/expandingbox/create/', data=data)
+        self.assertEqual(search_previews.misses, misses + 3)
+
+
+class PreviewCacheTestCase(SimpleTestCase):
+    """
+    Tests for the search preview cache
+    """
+    def test_lru(self):
+        """
+        Test the least recently used geometries are evicted
+        """
+        cache = PreviewCache(2)
+        cache.put('a', Point(1, 1))
+        cache.put('b', Point(2, 2))
+        self.assertEqual(cache.get('a'), Point(1, 1))
+        cache.put('c', Point(3, 3))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), Point(3, 3))
+        self.assertEqual(cache.as_object(), {'size': 2, 'entries': 2, 'hits': 2, 'misses': 1, 'evictions': 1})
+        # The cached geometry can't be changed through what get returns
+        cache.get('a').x = 5
+        self.assertEqual(cache.get('a'), Point(1, 1))
+        cache.reset()
+        self.assertEqual(cache.as_object()['hits'], 0)
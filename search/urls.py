@@ -14,6 +14,10 @@ urlpatterns = [
     re_path(r'^mission/(?P<mission_id>\d+)/search/inprogress/kml/$', views.search_inprogress_kml, {'search_class': Search}, name='search_inprogress_kml'),
     re_path(r'^mission/(?P<mission_id>\d+)/search/completed/$', views.search_completed, {'search_class': Search}, name='search_completed'),
     re_path(r'^mission/(?P<mission_id>\d+)/search/completed/kml/$', views.search_completed_kml, {'search_class': Search}, name='search_completed_kml'),
+    re_path(r'^mission/(?P<mission_id>\d+)/tiles/search-notstarted/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.mvt$', views.search_tile, {'search_class': Search, 'started': False, 'finished': False, 'layer': 'search-notstarted'}),
+    re_path(r'^mission/(?P<mission_id>\d+)/tiles/search-inprogress/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.mvt$', views.search_tile, {'search_class': Search, 'started': True, 'finished': False, 'layer': 'search-inprogress'}),
+    re_path(r'^mission/(?P<mission_id>\d+)/tiles/search-completed/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.mvt$', views.search_tile, {'search_class': Search, 'started': True, 'finished': True, 'layer': 'search-completed'}),
+    re_path(r'^mission/(?P<mission_id>\d+)/kml/$', views.mission_kml, {'search_class': Search}, name='mission_kml'),
     re_path(r'^search/(?P<search_id>\d+)/$', views.SearchView.as_view(), name='search_view'),
     re_path(r'^search/(?P<search_id>\d+)/queue/$', views.search_queue, name='search_queue'),
     re_path(r'^search/(?P<search_id>\d+)/begin/$', views.search_begin, {'object_class': Search}, name='search_begin'),
@@ -8,12 +8,26 @@ views work.
 from .models import Search
 
 
+def searches_in_progress(mission, asset):
+    """
+    Get the searches the specified asset has in progress in the specific mission
+    """
+    return Search.objects.filter(inprogress_by=asset, mission=mission).exclude(completed_at__isnull=False)
+
+
 def check_searches_in_progress(mission, asset):
     """
     Check if the specified asset has any searches in progress in the specific mission
     """
-    searches = Search.objects.filter(inprogress_by=asset, mission=mission).exclude(completed_at__isnull=False)
+    searches = searches_in_progress(mission, asset)
     if searches.exists():
         return searches[0]
 
     return None
+
+
+async def acheck_searches_in_progress(mission, asset):
+    """
+    Async version of check_searches_in_progress
+    """
+    return await searches_in_progress(mission, asset).afirst()
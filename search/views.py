@@ -22,15 +22,16 @@ from django.views import View
 
 from assets.models import AssetType, Asset
 from assets.decorators import asset_id_in_get_post
-from data.decorators import data_get_mission_id
+from data.decorators import data_get_mission_id, data_area_time, data_conditional, mission_layers
 from data.models import GeoTimeLabel
-from data.view_helpers import to_kml, to_geojson
+from data.view_helpers import ato_geojson_since, to_kml, to_kml_folders, to_geojson, to_mvt
 from mission.models import Mission, MissionAsset
 from mission.decorators import mission_is_member, mission_asset_get_mission
 from timeline.helpers import timeline_record_search_finished
 from .decorators import search_from_id
 from .models import Search, SearchParams, ExpandingBoxSearchParams, TrackLineCreepingSearchParams
-from .view_helpers import check_searches_in_progress
+from .previews import create_search
+from .view_helpers import acheck_searches_in_progress, check_searches_in_progress
 
 
 def mission_get(mission_id):
@@ -43,7 +44,7 @@ def mission_get(mission_id):
 @login_required
 @asset_id_in_get_post
 @mission_asset_get_mission
-def find_next_search(request, asset, mission):
+async def find_next_search(request, asset, mission):
     """
     Find the next search for this asset
     Order of preference:
@@ -69,30 +70,30 @@ def find_next_search(request, asset, mission):
 
     point = Point(long, lat, srid=4326)
 
-    def search_data(search):
+    async def search_data(search):
         data = {
             'object_url': f"/search/{search.pk}/",
-            'distance': int(search.distance_from(point)),
-            'length': int(search.length()),
+            'distance': int(await search.adistance_from(point)),
+            'length': int(await search.alength()),
             'sweep_width': int(search.sweep_width),
         }
         return JsonResponse(data)
 
     # If this asset already has a search in progress, only offer that
-    search = check_searches_in_progress(mission, asset)
+    search = await acheck_searches_in_progress(mission, asset)
 
     if search is None:
-        search = Search.oldest_queued_for_asset(mission, asset)
+        search = await Search.all_queued_for_asset(mission, asset).afirst()
 
     if search is None:
         # Check for the oldest queue entry for this asset
-        search = Search.oldest_queued_for_asset_type(mission, asset.asset_type)
+        search = await Search.all_queued_for_asset_type(mission, asset.asset_type_id).afirst()
 
     if search is None:
-        search = Search.find_closest(mission, asset.asset_type, point)
+        search = await Search.all_by_distance(mission, asset.asset_type_id, point).afirst()
 
     if search:
-        return search_data(search)
+        return await search_data(search)
 
     return HttpResponseNotFound("No suitable searches exist")
 
@@ -198,19 +199,26 @@ def search_queue(request, search, mission_user):
 
 @login_required
 @mission_is_member
-def search_notstarted(request, mission_user, search_class):
+@data_area_time
+@data_conditional(mission_layers(Search))
+async def search_notstarted(request, mission_user, search_class, area):
     """
     Get a list of all the not started (search_class) searches (as json)
     """
-    return to_geojson(search_class, search_class.all_current(mission_user.mission, started=False, finished=False))
+    return await ato_geojson_since(request, search_class, search_class.all_current(mission_user.mission, started=False, finished=False, area=area),
+                                   search_class.all_in_mission(mission_user.mission, area=area))
 
 
 @login_required
-def search_notstarted_user(request, search_class, current_only):
+@data_area_time
+@data_conditional(mission_layers(Search))
+async def search_notstarted_user(request, search_class, current_only, area):
     """
     Get a list of all the not started (search_class) searches in current missions this user is a member of (as json)
     """
-    return to_geojson(search_class, search_class.all_current_user(request.user, current_only=current_only, started=False, finished=False))
+    user = await request.auser()
+    return await ato_geojson_since(request, search_class, search_class.all_current_user(user, current_only=current_only, started=False, finished=False, area=area),
+                                   search_class.all_in_user_missions(user, current_only=current_only, area=area))
 
 
 def search_notstarted_kml(request, mission_id, search_class):
@@ -218,24 +226,31 @@ def search_notstarted_kml(request, mission_id, search_class):
     Get a list of all the not started (search_type) searches (as kml)
     """
     mission = mission_get(mission_id)
-    return to_kml(search_class, search_class.all_current(mission, started=False, finished=False))
+    return to_kml(search_class, search_class.all_current(mission, started=False, finished=False).select_related('datum', 'created_for'))
 
 
 @login_required
 @mission_is_member
-def search_inprogress(request, mission_user, search_class):
+@data_area_time
+@data_conditional(mission_layers(Search))
+async def search_inprogress(request, mission_user, search_class, area):
     """
     Get a list of all the inprogress (search_class) searches (as json)
     """
-    return to_geojson(search_class, search_class.all_current(mission_user.mission, started=True, finished=False))
+    return await ato_geojson_since(request, search_class, search_class.all_current(mission_user.mission, started=True, finished=False, area=area),
+                                   search_class.all_in_mission(mission_user.mission, area=area))
 
 
 @login_required
-def search_inprogress_user(request, search_class, current_only):
+@data_area_time
+@data_conditional(mission_layers(Search))
+async def search_inprogress_user(request, search_class, current_only, area):
     """
     Get a list of all the inprogress (search_class) searches in current missions this user is a member of (as json)
     """
-    return to_geojson(search_class, search_class.all_current_user(request.user, current_only=current_only, started=True, finished=False))
+    user = await request.auser()
+    return await ato_geojson_since(request, search_class, search_class.all_current_user(user, current_only=current_only, started=True, finished=False, area=area),
+                                   search_class.all_in_user_missions(user, current_only=current_only, area=area))
 
 
 def search_inprogress_kml(request, mission_id, search_class):
@@ -243,24 +258,31 @@ def search_inprogress_kml(request, mission_id, search_class):
     Get a list of all the inprogress (search_type) searches (as kml)
     """
     mission = mission_get(mission_id)
-    return to_kml(search_class, search_class.all_current(mission, started=True, finished=False))
+    return to_kml(search_class, search_class.all_current(mission, started=True, finished=False).select_related('datum', 'created_for'))
 
 
 @login_required
 @mission_is_member
-def search_completed(request, mission_user, search_class):
+@data_area_time
+@data_conditional(mission_layers(Search))
+async def search_completed(request, mission_user, search_class, area):
     """
     Get a list of all the completed (search_class) searches (as json)
     """
-    return to_geojson(search_class, search_class.all_current(mission_user.mission, started=True, finished=True))
+    return await ato_geojson_since(request, search_class, search_class.all_current(mission_user.mission, started=True, finished=True, area=area),
+                                   search_class.all_in_mission(mission_user.mission, area=area))
 
 
 @login_required
-def search_completed_user(request, search_class, current_only):
+@data_area_time
+@data_conditional(mission_layers(Search))
+async def search_completed_user(request, search_class, current_only, area):
     """
     Get a list of all the completed (search_class) searches in all missions this user has been a member of (as json)
     """
-    return to_geojson(search_class, search_class.all_current_user(request.user, current_only=current_only, started=True, finished=True))
+    user = await request.auser()
+    return await ato_geojson_since(request, search_class, search_class.all_current_user(user, current_only=current_only, started=True, finished=True, area=area),
+                                   search_class.all_in_user_missions(user, current_only=current_only, area=area))
 
 
 def search_completed_kml(request, mission_id, search_class):
@@ -268,7 +290,34 @@ def search_completed_kml(request, mission_id, search_class):
     Get a list of all the completed (search_class) searches (as kml)
     """
     mission = mission_get(mission_id)
-    return to_kml(search_class, search_class.all_current(mission, started=True, finished=True))
+    return to_kml(search_class, search_class.all_current(mission, started=True, finished=True).select_related('datum', 'created_for'))
+
+
+@login_required
+@mission_is_member
+def search_tile(request, mission_user, search_class, started, finished, layer, z, x, y):
+    # pylint: disable=R0913,R0917
+    """
+    Get a vector tile of the (started/finished) (search_class) searches
+    """
+    return to_mvt(search_class, search_class.all_current(mission_user.mission, started=started, finished=finished), layer, z, x, y)
+
+
+@login_required
+@mission_is_member
+def mission_kml(request, mission_user, search_class):
+    """
+    Get all the current user data and searches in a mission (as kml), with a folder for each type
+    """
+    mission = mission_user.mission
+    return to_kml_folders([
+        ('POIs', GeoTimeLabel, GeoTimeLabel.all_current_of_geo(mission, geo_type='poi'), 'poi'),
+        ('Lines', GeoTimeLabel, GeoTimeLabel.all_current_of_geo(mission, geo_type='line'), 'line'),
+        ('Polygons', GeoTimeLabel, GeoTimeLabel.all_current_of_geo(mission, geo_type='polygon'), 'polygon'),
+        ('Searches (not started)', search_class, search_class.all_current(mission, started=False, finished=False).select_related('datum', 'created_for'), 'search_notstarted'),
+        ('Searches (in progress)', search_class, search_class.all_current(mission, started=True, finished=False).select_related('datum', 'created_for'), 'search_inprogress'),
+        ('Searches (completed)', search_class, search_class.all_current(mission, started=True, finished=True).select_related('datum', 'created_for'), 'search_completed'),
+    ])
 
 
 @login_required
@@ -292,7 +341,7 @@ def sector_search_create(request):
     poi = get_object_or_404(GeoTimeLabel, pk=poi_id, geo_type='poi')
     asset_type = get_object_or_404(AssetType, pk=asset_type_id)
 
-    search = Search.create_sector_search(SearchParams(poi, asset_type, request.user, sweep_width), save=save)
+    search = create_search(Search.create_sector_search, SearchParams(poi, asset_type, request.user, sweep_width), save)
 
     return to_geojson(Search, [search])
 
@@ -328,7 +377,7 @@ def expanding_box_search_create(request):
     except TypeError:
         first_bearing = 0
 
-    search = Search.create_expanding_box_search(ExpandingBoxSearchParams(poi, asset_type, request.user, sweep_width, iterations, first_bearing), save=save)
+    search = create_search(Search.create_expanding_box_search, ExpandingBoxSearchParams(poi, asset_type, request.user, sweep_width, iterations, first_bearing), save)
 
     return to_geojson(Search, [search])
 
@@ -408,7 +457,7 @@ def track_creeping_line_search_create(request):
     line = get_object_or_404(GeoTimeLabel, pk=line_id, geo_type='line')
     asset_type = get_object_or_404(AssetType, pk=asset_type_id)
 
-    search = Search.create_track_line_creeping_search(TrackLineCreepingSearchParams(line, asset_type, request.user, sweep_width, width), save=save)
+    search = create_search(Search.create_track_line_creeping_search, TrackLineCreepingSearchParams(line, asset_type, request.user, sweep_width, width), save)
 
     return to_geojson(Search, [search])
 
@@ -434,7 +483,7 @@ def polygon_creeping_line_search_create(request):
     poly = get_object_or_404(GeoTimeLabel, pk=poly_id, geo_type='polygon')
     asset_type = get_object_or_404(AssetType, pk=asset_type_id)
 
-    search = Search.create_polygon_creeping_line_search(SearchParams(poly, asset_type, request.user, sweep_width), save=save)
+    search = create_search(Search.create_polygon_creeping_line_search, SearchParams(poly, asset_type, request.user, sweep_width), save)
 
     return to_geojson(Search, [search])
 
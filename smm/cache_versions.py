@@ -0,0 +1,51 @@
+"""
+Versions for cached answers about an object (i.e. who is a member of a mission)
+
+The version is part of the cache keys, so changing it (when the answers change)
+means the old answers are never used again, without having to find and delete them.
+The versions are kept in django's default cache.
+"""
+
+from functools import partial
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def cache_version_key(name, object_id):
+    """
+    The cache key for the version
+    """
+    return f'smm_version_{name}_{int(object_id)}'
+
+
+def cache_version(name, object_id):
+    """
+    The current version of the cached answers called name for an object
+    """
+    key = cache_version_key(name, object_id)
+    version = cache.get(key)
+    if version is None:
+        # Use a new random version, so an old version that was culled from the cache is never reused
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def cache_version_bump(name, object_id):
+    """
+    Change the version, so the cached answers aren't used any more
+    """
+    cache.set(cache_version_key(name, object_id), uuid.uuid4().hex, timeout=None)
+
+
+def cache_version_changed(name, object_id):
+    """
+    The cached answers called name for an object have changed, stop using them
+
+    The version is changed now, and again once the transaction commits, which
+    catches anything another request cached from before the commit.
+    """
+    cache_version_bump(name, object_id)
+    transaction.on_commit(partial(cache_version_bump, name, object_id))
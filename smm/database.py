@@ -0,0 +1,31 @@
+"""
+Database settings that are shared by the local_settings files
+"""
+
+import os
+
+
+# Defaults for the size of the connection pool in each worker process
+DEFAULT_POOL_MIN_SIZE = 2
+DEFAULT_POOL_MAX_SIZE = 10
+
+# How long (in seconds) a request waits for a connection from the pool before failing
+DEFAULT_POOL_TIMEOUT = 10
+
+
+def pool_options(environ=None):
+    """
+    The options for psycopg's connection pool (DATABASES OPTIONS['pool'])
+
+    Every worker process has its own pool, sized by the environment variables
+    SMM_DB_POOL_MIN_SIZE and SMM_DB_POOL_MAX_SIZE, so the database needs to
+    allow (max size * workers) connections. SMM_DB_POOL_TIMEOUT is how long
+    a request waits for a connection when they are all in use.
+    """
+    if environ is None:
+        environ = os.environ
+    return {
+        'min_size': int(environ.get('SMM_DB_POOL_MIN_SIZE', DEFAULT_POOL_MIN_SIZE)),
+        'max_size': int(environ.get('SMM_DB_POOL_MAX_SIZE', DEFAULT_POOL_MAX_SIZE)),
+        'timeout': float(environ.get('SMM_DB_POOL_TIMEOUT', DEFAULT_POOL_TIMEOUT)),
+    }
@@ -0,0 +1,288 @@
+"""
+Per view metrics: the number of queries, time spent in the database, and time spent serializing
+
+MetricsMiddleware measures every request, and adds them up for each view
+(by the name of the url/view), they can be fetched (by staff) from /metrics/.
+When DEBUG (or SMM_METRICS_HEADERS) is on, each response also has the metrics
+in the Server-Timing and X-SMM-Queries headers.
+
+Serializing is the time spent producing a streamed response (i.e. geojson) after the view
+has returned, other than in the database. Responses that aren't streamed (i.e. JsonResponse)
+are serialized in the view, so that time is part of the view time.
+
+SMM_QUERY_BUDGETS sets the most queries a view should make ({view name: queries}),
+views that make more are logged as warnings (see assertQueryBudget for tests).
+Caches in each process (see register_cache) add their hits, misses and evictions.
+The metrics are kept in each process, so with multiple workers each one has its own.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logging
+import threading
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.http import JsonResponse
+
+
+logger = logging.getLogger(__name__)
+
+# The metrics of the request being handled (if any)
+current_metrics = ContextVar('smm_request_metrics', default=None)
+
+
+def query_timer(execute, sql, params, many, context):
+    """
+    Count the query, and how long it took, for the current request
+    """
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += perf_counter() - start
+
+
+def install_query_timer(db_connection):
+    """
+    Time all the queries made with db_connection
+    """
+    if query_timer not in db_connection.execute_wrappers:
+        db_connection.execute_wrappers.append(query_timer)
+
+
+def connection_created_handler(sender, connection, **kwargs):
+    # pylint: disable=W0613,W0621
+    """
+    Time the queries on new connections
+    """
+    install_query_timer(connection)
+
+
+class RequestMetrics:
+    """
+    The metrics for a single request
+    """
+    def __init__(self):
+        self.start = perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.time = None
+
+    @contextmanager
+    def active(self):
+        """
+        Count queries made in this block for this request
+        """
+        token = current_metrics.set(self)
+        try:
+            yield
+        finally:
+            current_metrics.reset(token)
+
+    def finish(self):
+        """
+        The request has been completely handled
+        """
+        self.time = perf_counter() - self.start
+
+    def as_object(self):
+        """
+        Convert the metrics to an object that is suitable for returning via JsonResponse (times in ms)
+        """
+        return {
+            'queries': self.queries,
+            'db_ms': self.db_time * 1000,
+            'serialize_ms': self.serialize_time * 1000,
+            'time_ms': (self.time if self.time is not None else perf_counter() - self.start) * 1000,
+        }
+
+    def server_timing(self):
+        """
+        The metrics so far, as a Server-Timing header
+        """
+        return f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries", total;dur={(perf_counter() - self.start) * 1000:.1f}'
+
+    def stream(self, content, done):
+        """
+        Time producing the (sync) content of a streamed response, calling done when it's finished
+        """
+        try:
+            iterator = iter(content)
+            while True:
+                with self.active(), self.serializing():
+                    chunk = next(iterator, None)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            done()
+
+    async def astream(self, content, done):
+        """
+        Time producing the (async) content of a streamed response, calling done when it's finished
+        """
+        try:
+            iterator = aiter(content)
+            while True:
+                with self.active(), self.serializing():
+                    chunk = await anext(iterator, None)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            done()
+
+    @contextmanager
+    def serializing(self):
+        """
+        Count the time in this block (other than queries) as serializing
+        """
+        start = perf_counter()
+        db_time = self.db_time
+        try:
+            yield
+        finally:
+            self.serialize_time += perf_counter() - start - (self.db_time - db_time)
+
+
+class ViewMetrics:
+    """
+    The metrics of all the requests to each view in this process
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def record(self, view_name, metrics):
+        """
+        Add the metrics of a request to the view
+        """
+        with self.lock:
+            view = self.views.setdefault(view_name, {'requests': 0, 'queries': 0, 'max_queries': 0, 'db_ms': 0.0, 'serialize_ms': 0.0, 'time_ms': 0.0, 'max_time_ms': 0.0})
+            request = metrics.as_object()
+            view['requests'] += 1
+            view['queries'] += request['queries']
+            view['max_queries'] = max(view['max_queries'], request['queries'])
+            view['db_ms'] += request['db_ms']
+            view['serialize_ms'] += request['serialize_ms']
+            view['time_ms'] += request['time_ms']
+            view['max_time_ms'] = max(view['max_time_ms'], request['time_ms'])
+
+    def as_object(self):
+        """
+        The totals, and the means per request, for each view
+        """
+        with self.lock:
+            views = {name: dict(view) for name, view in self.views.items()}
+        for view in views.values():
+            for field in ('queries', 'db_ms', 'serialize_ms', 'time_ms'):
+                view[f'mean_{field}'] = view[field] / view['requests']
+        return views
+
+    def reset(self):
+        """
+        Forget all the metrics
+        """
+        with self.lock:
+            self.views = {}
+
+
+view_metrics = ViewMetrics()
+
+# The caches (name: cache) whose metrics are included, see register_cache
+caches = {}
+
+
+def register_cache(name, cache):
+    """
+    Include the metrics of cache (an object with as_object and reset) in the metrics
+    """
+    caches[name] = cache
+
+
+def query_budget(view_name):
+    """
+    The most queries the view should make (None if it doesn't have a budget)
+    """
+    return getattr(settings, 'SMM_QUERY_BUDGETS', {}).get(view_name)
+
+
+class MetricsMiddleware:
+    """
+    Measure each request, see the module documentation
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        connection_created.connect(connection_created_handler, dispatch_uid='smm_metrics_query_timer')
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        install_query_timer(connection)
+        request.metrics = RequestMetrics()
+        with request.metrics.active():
+            response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        request.metrics = RequestMetrics()
+        with request.metrics.active():
+            response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    @staticmethod
+    def process_response(request, response):
+        """
+        Add the headers, and record the metrics once the response is finished
+        """
+        metrics = request.metrics
+        resolver_match = getattr(request, 'resolver_match', None)
+
+        def done():
+            metrics.finish()
+            if resolver_match is None:
+                return
+            view_metrics.record(resolver_match.view_name, metrics)
+            budget = query_budget(resolver_match.view_name)
+            if budget is not None and metrics.queries > budget:
+                logger.warning('%s made %d queries, its budget is %d', resolver_match.view_name, metrics.queries, budget)
+
+        if getattr(settings, 'SMM_METRICS_HEADERS', settings.DEBUG):
+            # Streamed responses are only measured up to when they start
+            response['Server-Timing'] = metrics.server_timing()
+            response['X-SMM-Queries'] = str(metrics.queries)
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = metrics.astream(response.streaming_content, done)
+            else:
+                response.streaming_content = metrics.stream(response.streaming_content, done)
+        else:
+            done()
+        return response
+
+
+@staff_member_required
+def metrics_view(request):
+    """
+    Get the metrics of each view, and each cache (as json), for this process
+    """
+    if request.method == 'POST':
+        view_metrics.reset()
+        for cache in caches.values():
+            cache.reset()
+    return JsonResponse({'views': view_metrics.as_object(), 'caches': {name: cache.as_object() for name, cache in caches.items()}})
@@ -0,0 +1,116 @@
+"""
+Tests for the geodesic calculations
+"""
+
+import numpy as np
+from django.contrib.gis.geos import GEOSGeometry, Point
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from .geodesy import aeqd_forward, aeqd_inverse, geodesic_direct, geodesic_inverse, project, project_points
+
+
+def dms(degrees, minutes, seconds):
+    """
+    Convert degrees, minutes and seconds to degrees
+    """
+    return np.sign(degrees) * (abs(degrees) + minutes / 60 + seconds / 3600)
+
+
+class GeodesyTestCase(SimpleTestCase):
+    """
+    Test the geodesic calculations against known values
+    """
+    # Vincenty's example, Flinders Peak to Buninyong
+    FLINDERS_PEAK = (dms(144, 25, 29.52440), dms(-37, 57, 3.72030))
+    BUNINYONG = (dms(143, 55, 35.38390), dms(-37, 39, 10.15610))
+    AZIMUTH = dms(306, 52, 5.37)
+    DISTANCE = 54972.271
+
+    def test_direct(self):
+        """
+        Check the direct solution is within a millimetre
+        """
+        lon, lat = geodesic_direct(*self.FLINDERS_PEAK, self.AZIMUTH, self.DISTANCE)
+        distance, _ = geodesic_inverse(lon, lat, *self.BUNINYONG)
+        self.assertLess(distance, 0.001)
+
+    def test_inverse(self):
+        """
+        Check the inverse solution is within a millimetre
+        """
+        distance, azimuth = geodesic_inverse(*self.FLINDERS_PEAK, *self.BUNINYONG)
+        self.assertAlmostEqual(distance, self.DISTANCE, delta=0.001)
+        self.assertAlmostEqual(azimuth, self.AZIMUTH, delta=1 / 3600 / 100)
+        # 10 degrees along the equator
+        distance, azimuth = geodesic_inverse(10, 0, 20, 0)
+        self.assertAlmostEqual(distance, 1113194.908, delta=0.001)
+        self.assertAlmostEqual(azimuth, 90)
+        distance, _ = geodesic_inverse(172.5, -43.5, 172.5, -43.5)
+        self.assertEqual(distance, 0)
+
+    def test_round_trip(self):
+        """
+        Check going to many points, and back, finds the same distance and azimuth
+        """
+        rng = np.random.default_rng(23)
+        lons = rng.uniform(-180, 180, 1000)
+        lats = rng.uniform(-85, 85, 1000)
+        azimuths = rng.uniform(0, 360, 1000)
+        distances = rng.uniform(0, 500000, 1000)
+        end_lons, end_lats = geodesic_direct(lons, lats, azimuths, distances)
+        distance, azimuth = geodesic_inverse(lons, lats, end_lons, end_lats)
+        self.assertLess(np.max(np.abs(distance - distances)), 0.001)
+        self.assertLess(np.max(np.abs((azimuth - azimuths + 180) % 360 - 180)), 1e-6)
+
+    def test_project(self):
+        """
+        Check the points are geographic Points
+        """
+        point = project(Point(172.5, -43.5), 1000, 0)
+        self.assertEqual(point.srid, 4326)
+        self.assertEqual(point.x, 172.5)
+        self.assertGreater(point.y, -43.5)
+        points = project_points(172.5, -43.5, [0, 90, 180, 270], 1000)
+        self.assertEqual(len(points), 4)
+        self.assertAlmostEqual(points[1].y, points[3].y)
+        self.assertAlmostEqual(points[1].x - 172.5, 172.5 - points[3].x)
+
+    def test_aeqd(self):
+        """
+        Check the projection keeps the distance and azimuth from the centre, and the inverse finds the points
+        """
+        x, y = aeqd_forward(*self.FLINDERS_PEAK, *self.BUNINYONG)
+        self.assertAlmostEqual(np.hypot(x, y), self.DISTANCE, delta=0.001)
+        self.assertAlmostEqual(np.degrees(np.arctan2(x, y)) % 360, self.AZIMUTH, delta=1 / 3600 / 100)
+        lon, lat = aeqd_inverse(*self.FLINDERS_PEAK, x, y)
+        distance, _ = geodesic_inverse(lon, lat, *self.BUNINYONG)
+        self.assertLess(distance, 0.001)
+        x, y = aeqd_forward(*self.FLINDERS_PEAK, *self.FLINDERS_PEAK)
+        self.assertEqual((x, y), (0, 0))
+
+
+class GeodesyPostGISTestCase(TestCase):
+    """
+    Test the geodesic calculations agree with PostGIS
+    """
+    def test_project_matches_postgis(self):
+        """
+        Check the points are within a centimetre of ST_Project
+        """
+        rng = np.random.default_rng(24)
+        lons = rng.uniform(-180, 180, 200)
+        lats = rng.uniform(-80, 80, 200)
+        azimuths = rng.uniform(0, 360, 200)
+        distances = rng.uniform(0, 200000, 200)
+        end_lons, end_lats = geodesic_direct(lons, lats, azimuths, distances)
+        with connection.cursor() as cursor:
+            for i in range(200):
+                cursor.execute(
+                    "SELECT ST_Project(ST_SetSRID(ST_Point(%s, %s), 4326)::geography, %s, radians(%s))::geometry, ST_Distance(ST_SetSRID(ST_Point(%s, %s), 4326)::geography, ST_SetSRID(ST_Point(%s, %s), 4326)::geography)",
+                    [lons[i], lats[i], distances[i], azimuths[i], lons[i], lats[i], end_lons[i], end_lats[i]])
+                postgis_point, postgis_distance = cursor.fetchone()
+                postgis_point = GEOSGeometry(postgis_point)
+                difference, _ = geodesic_inverse(postgis_point.x, postgis_point.y, end_lons[i], end_lats[i])
+                self.assertLess(difference, 0.01)
+                self.assertAlmostEqual(postgis_distance, distances[i], delta=0.01)
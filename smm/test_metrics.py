@@ -0,0 +1,89 @@
+"""
+Tests for the per view metrics
+"""
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import ResolverMatch
+
+from .metrics import MetricsMiddleware, RequestMetrics, ViewMetrics, query_timer, view_metrics
+
+
+class MetricsTestCase(SimpleTestCase):
+    """
+    Test measuring requests
+    """
+    def setUp(self):
+        view_metrics.reset()
+
+    @staticmethod
+    def make_request():
+        """
+        Create a request that has been resolved to the test view
+        """
+        request = RequestFactory().get('/metrics/test/')
+        request.resolver_match = ResolverMatch(lambda request: None, (), {}, url_name='metrics_test')
+        return request
+
+    @override_settings(SMM_METRICS_HEADERS=True)
+    def test_response(self):
+        """
+        Check a response is recorded against its view, with the headers
+        """
+        middleware = MetricsMiddleware(lambda request: HttpResponse('ok'))
+        response = middleware(self.make_request())
+        self.assertEqual(response['X-SMM-Queries'], '0')
+        self.assertTrue(response['Server-Timing'].startswith('db;dur=0.0;desc="0 queries"'))
+        views = view_metrics.as_object()
+        self.assertEqual(views['metrics_test']['requests'], 1)
+        self.assertEqual(views['metrics_test']['queries'], 0)
+
+    @override_settings(SMM_METRICS_HEADERS=False)
+    def test_streaming_response(self):
+        """
+        Check a streamed response is only recorded once it has been sent, including the time to serialize it
+        """
+        middleware = MetricsMiddleware(lambda request: StreamingHttpResponse(iter(['a', 'b'])))
+        request = self.make_request()
+        response = middleware(request)
+        self.assertFalse(response.has_header('X-SMM-Queries'))
+        self.assertEqual(view_metrics.as_object(), {})
+        self.assertEqual(b''.join(response.streaming_content), b'ab')
+        views = view_metrics.as_object()
+        self.assertEqual(views['metrics_test']['requests'], 1)
+        self.assertIsNotNone(request.metrics.time)
+        self.assertGreaterEqual(request.metrics.serialize_time, 0)
+
+    def test_view_metrics(self):
+        """
+        Check the metrics are added up for each view
+        """
+        metrics = ViewMetrics()
+        for queries in (2, 4):
+            request = RequestMetrics()
+            request.queries = queries
+            request.db_time = 0.001 * queries
+            request.finish()
+            metrics.record('view', request)
+        view = metrics.as_object()['view']
+        self.assertEqual(view['requests'], 2)
+        self.assertEqual(view['queries'], 6)
+        self.assertEqual(view['max_queries'], 4)
+        self.assertEqual(view['mean_queries'], 3)
+        self.assertAlmostEqual(view['mean_db_ms'], 3)
+
+    def test_query_timer(self):
+        """
+        Check queries are only counted for the active request
+        """
+        metrics = RequestMetrics()
+
+        def execute(sql, params, many, context):
+            # pylint: disable=W0613
+            return 'result'
+
+        self.assertEqual(query_timer(execute, 'SELECT 1', None, False, {}), 'result')
+        with metrics.active():
+            self.assertEqual(query_timer(execute, 'SELECT 1', None, False, {}), 'result')
+        self.assertEqual(metrics.queries, 1)
+        self.assertGreaterEqual(metrics.db_time, 0)
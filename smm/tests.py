@@ -2,10 +2,47 @@
 Base test functionality for all of SMM
 """
 
+import json
+
 from django.test import Client
 from django.contrib.auth import get_user_model
 
 
+def response_json(response):
+    """
+    Get the json from a response, this also works for streaming responses (i.e. geojson)
+    """
+    if response.streaming:
+        return json.loads(b''.join(response.streaming_content))
+    return response.json()
+
+
+def response_metrics(response):
+    """
+    Get the metrics (see smm.metrics) of the request a response is for
+
+    Streaming responses are read first (so the queries made while streaming are included),
+    the content is kept so the response can still be used.
+    """
+    if response.streaming:
+        content = b''.join(response.streaming_content)
+        response.streaming_content = [content]
+    return response.wsgi_request.metrics.as_object()
+
+
+class QueryBudgetMixin:
+    """
+    Check views stay within a budget for the number of queries they make
+    """
+    def assertQueryBudget(self, response, budget):
+        # pylint: disable=C0103
+        """
+        Check the request for response made no more than budget queries
+        """
+        queries = response_metrics(response)['queries']
+        self.assertLessEqual(queries, budget, f'{response.wsgi_request.resolver_match.view_name} made {queries} queries, its budget is {budget}')
+
+
 class SMMTestUsers:
     """
     Class that creates test users for SMM
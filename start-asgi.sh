@@ -0,0 +1,6 @@
+#!/bin/bash
+
+source venv/bin/activate
+
+./manage.py migrate
+uvicorn smm.asgi:application --host 127.0.0.1 --port 8080
@@ -2,9 +2,17 @@
 Helper functions for recording timeline activities
 """
 
+from mission.events import publish_event
 from .models import TimeLineEntry
 
 
+def object_event(obj):
+    """
+    Describe an object in an event
+    """
+    return {'model': obj._meta.label_lower, 'pk': obj.pk}
+
+
 def timeline_record_create(mission, user, obj):
     """
     Create a timeline entry for an object being created
@@ -13,6 +21,7 @@ def timeline_record_create(mission, user, obj):
     url = ""
     entry = TimeLineEntry(mission=mission, user=user, event_type='add', message=message, url=url)
     entry.save()
+    publish_event(mission, 'created', **object_event(obj))
 
 
 def timeline_record_delete(mission, user, obj):
@@ -23,6 +32,7 @@ def timeline_record_delete(mission, user, obj):
     url = ""
     entry = TimeLineEntry(mission=mission, user=user, event_type='del', message=message, url=url)
     entry.save()
+    publish_event(mission, 'deleted', **object_event(obj))
 
 
 def timeline_record_update(mission, user, obj, replaces):
@@ -33,6 +43,7 @@ def timeline_record_update(mission, user, obj, replaces):
     url = ""
     entry = TimeLineEntry(mission=mission, user=user, event_type='upd', message=message, url=url)
     entry.save()
+    publish_event(mission, 'replaced', replaces=replaces.pk, **object_event(obj))
 
 
 def timeline_record_search_begin(mission, user, asset, obj):
@@ -43,6 +54,7 @@ def timeline_record_search_begin(mission, user, asset, obj):
     url = ""
     entry = TimeLineEntry(mission=mission, user=user, event_type='sbg', message=message, url=url)
     entry.save()
+    publish_event(mission, 'search_begun', asset=asset.pk, **object_event(obj))
 
 
 def timeline_record_search_finished(mission, user, asset, obj):
@@ -53,6 +65,7 @@ def timeline_record_search_finished(mission, user, asset, obj):
     url = ""
     entry = TimeLineEntry(mission=mission, user=user, event_type='snd', message=message, url=url)
     entry.save()
+    publish_event(mission, 'search_finished', asset=asset.pk, **object_event(obj))
 
 
 def timeline_record_mission_organization_add(mission, actioner, organization):
@@ -113,6 +126,7 @@ def timeline_record_image_priority_changed(mission, user, image):
     url = ""
     entry = TimeLineEntry(mission=mission, user=user, event_type='ipc', message=message, url=url)
     entry.save()
+    publish_event(mission, 'updated', **object_event(image))
 
 
 def timeline_record_search_queue(mission, user, search, assettype, asset):
@@ -126,6 +140,7 @@ def timeline_record_search_queue(mission, user, search, assettype, asset):
     url = ""
     entry = TimeLineEntry(mission=mission, user=user, event_type='que', message=message, url=url)
     entry.save()
+    publish_event(mission, 'search_queued', asset=asset.pk if asset else None, **object_event(search))
 
 
 def timeline_record_mission_asset_status(mission, user, asset, status):
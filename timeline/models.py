@@ -6,6 +6,7 @@ from django.db import models
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 
+from mission.events import publish_event
 from mission.models import Mission
 
 
@@ -50,6 +51,13 @@ class TimeLineEntry(models.Model):
 
     url = models.TextField(blank=True, null=True)
 
+    # pylint: disable=W0221
+    def save(self, *args, **kwargs):
+        created = self.pk is None
+        super().save(*args, **kwargs)
+        if created:
+            publish_event(self.mission_id, 'timeline', pk=self.pk, entry_type=self.event_type)
+
     def as_object(self):
         """
         Return the timeline entry as an object